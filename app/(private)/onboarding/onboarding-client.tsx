@@ -10,10 +10,32 @@ import { toast } from "sonner";
 import { MissionFlow } from "./mission-flow";
 import { InspirationStep } from "./inspiration-step";
 import { ProgressIndicator } from "./components/progress-indicator";
-import { saveInspirationAndCompleteOnboardingAction } from "@/lib/actions/onboarding";
+import { saveInspirationAndCompleteOnboardingAction, getCurationStatusAction } from "@/lib/actions/onboarding";
 
 type OnboardingStep = "mission" | "inspiration" | "complete";
 
+// How often, and for how long at most, to check on curation before opening the Museboard
+const CURATION_POLL_MS = 1000;
+const CURATION_MAX_WAIT_MS = 15000;
+
+/**
+ * Polls the curation job until its first items are on the Museboard (or it finished,
+ * failed, or took too long), so the board doesn't open empty. Returns how many there are.
+ */
+async function waitForFirstCuration(jobId: string): Promise<number> {
+  const deadline = Date.now() + CURATION_MAX_WAIT_MS;
+  while (Date.now() < deadline) {
+    const result = await getCurationStatusAction(jobId);
+    if (!result.success || !result.data) return 0;
+
+    const { status, content } = result.data;
+    if (content.length > 0 || status === "completed" || status === "failed") return content.length;
+
+    await new Promise((resolve) => setTimeout(resolve, CURATION_POLL_MS));
+  }
+  return 0;
+}
+
 interface OnboardingClientProps {
   user: User;
   existingMission?: { mission_statement: string } | null;
@@ -40,12 +62,21 @@ export function OnboardingClient({ user, existingMission }: OnboardingClientProp
       const result = await saveInspirationAndCompleteOnboardingAction(heroes, interests);
       
       if (result.success && result.data) {
+        const toastId = toast.loading("🎉 Welcome to your Museboard!", {
+          description: "Shadow is curating inspiration just for you...",
+        });
+
+        const curated = await waitForFirstCuration(result.data.curation_job_id);
+
         toast.success("🎉 Welcome to your Museboard!", {
-          description: `${result.data.items_added} pieces of inspiration curated just for you.`,
+          id: toastId,
+          description: curated > 0
+            ? "Your first inspiration is on your board; Shadow keeps adding more."
+            : "Shadow is still curating inspiration for you. It will appear on your board in a moment.",
           duration: 4000,
         });
-        
-        setTimeout(() => router.push('/museboard'), 2000);
+
+        router.push('/museboard');
       } else {
         toast.error("Setup Failed", { description: result.error });
       }
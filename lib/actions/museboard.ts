@@ -3,6 +3,7 @@
 "use server";
 
 import { createServer } from "@/lib/supabase/server";
+import { notifyItemsChanged } from "@/lib/ai-service";
 import { revalidatePath } from "next/cache";
 import { z } from "zod";
 import { redirect } from "next/navigation";
@@ -84,6 +85,7 @@ export async function createMuseItem(input: MuseItemInput): Promise<ActionResult
 
     if (error) throw error;
 
+    await notifyItemsChanged(user.id, [data.id]);
     revalidatePath("/museboard");
     return { success: true, data: { id: data.id } };
   } catch (error) {
@@ -106,14 +108,20 @@ export async function updateMuseItem(
   try {
     const { user, supabase } = await getAuthenticatedUser();
 
-    const { error } = await supabase
+    const { data: updated, error } = await supabase
       .from("muse_items")
       .update(input)
       .eq("id", id)
-      .eq("user_id", user.id);
+      .eq("user_id", user.id)
+      .select("id");
 
     if (error) throw error;
 
+    // Only the rows the update matched, since the ID comes from the client; an empty
+    // list would ask the service to rebuild the user's whole index
+    if (updated.length > 0) {
+      await notifyItemsChanged(user.id, updated.map((item) => item.id));
+    }
     revalidatePath("/museboard");
     return { success: true };
   } catch (error) {
@@ -133,14 +141,18 @@ export async function softDeleteMuseItems(itemIds: string[]): Promise<ActionResu
   try {
     const { user, supabase } = await getAuthenticatedUser();
 
-    const { error } = await supabase
+    const { data: trashed, error } = await supabase
       .from("muse_items")
       .update({ deleted_at: new Date().toISOString() })
       .in("id", validation.data)
-      .eq("user_id", user.id);
+      .eq("user_id", user.id)
+      .select("id");
 
     if (error) throw error;
 
+    if (trashed.length > 0) {
+      await notifyItemsChanged(user.id, trashed.map((item) => item.id));
+    }
     revalidatePath("/museboard");
     revalidatePath("/trash");
 
@@ -162,14 +174,18 @@ export async function restoreMuseItems(itemIds: string[]): Promise<ActionResult>
   try {
     const { user, supabase } = await getAuthenticatedUser();
 
-    const { error } = await supabase
+    const { data: restored, error } = await supabase
       .from("muse_items")
       .update({ deleted_at: null })
       .in("id", validation.data)
-      .eq("user_id", user.id);
+      .eq("user_id", user.id)
+      .select("id");
 
     if (error) throw error;
 
+    if (restored.length > 0) {
+      await notifyItemsChanged(user.id, restored.map((item) => item.id));
+    }
     revalidatePath("/museboard");
     revalidatePath("/trash");
 
@@ -215,14 +231,18 @@ export async function permanentlyDeleteMuseItems(itemIds: string[]): Promise<Act
     }
 
     // Delete the database records
-    const { error: deleteError } = await supabase
+    const { data: deleted, error: deleteError } = await supabase
       .from("muse_items")
       .delete()
       .in("id", validation.data)
-      .eq("user_id", user.id);
+      .eq("user_id", user.id)
+      .select("id");
 
     if (deleteError) throw deleteError;
 
+    if (deleted.length > 0) {
+      await notifyItemsChanged(user.id, deleted.map((item) => item.id));
+    }
     revalidatePath("/trash");
     return { success: true };
   } catch (error) {
@@ -340,6 +360,7 @@ export async function addContentToMuseboardAction(
       throw new Error(`Database insert failed: ${insertError.message}`);
     }
 
+    await notifyItemsChanged(user.id, [insertData.id]);
     revalidatePath("/museboard");
 
     return {
@@ -69,12 +69,14 @@ export async function getInspirationSuggestionsAction(mission: string): Promise<
 
 
 /**
- * NEW: Saves heroes/interests, populates the Museboard, and completes onboarding.
+ * NEW: Saves heroes/interests, queues Museboard curation, and completes onboarding.
+ * Curation runs in the AI service's background worker, so this returns as soon as
+ * the job is queued; the curated items appear on the Museboard as they are generated.
  */
 export async function saveInspirationAndCompleteOnboardingAction(
   heroes: string[],
   interests: string[]
-): Promise<ActionResult<{ items_added: number }>> {
+): Promise<ActionResult<{ curation_job_id: string }>> {
   const supabase = await createServer();
   const { data: { user }, error: userError } = await supabase.auth.getUser();
 
@@ -103,11 +105,12 @@ export async function saveInspirationAndCompleteOnboardingAction(
 
     if (updateError) throw updateError;
 
-    // 3. Call AI Service to get curated content
+    // 3. Queue content curation; the AI service inserts the curated items into muse_items
     const response = await fetch(`${AI_SERVICE_BASE_URL}/onboarding/content/curate`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({
+        user_id: user.id,
         mission: missionData.mission_statement,
         heroes: heroes,
         interests: interests
@@ -116,23 +119,9 @@ export async function saveInspirationAndCompleteOnboardingAction(
 
     if (!response.ok) throw new Error('AI content curation failed.');
 
-    const curatedResult = await response.json();
-    const contentItems = curatedResult.content.map((item: any) => ({
-      user_id: user.id,
-      content: item.content,
-      content_type: "text",
-      description: item.source,
-      ai_status: "completed",
-      ai_categories: [item.category],
-      ai_summary: item.relevance_reason,
-      ai_relevance_score: 0.9,
-    }));
-
-    // 4. Insert curated content into muse_items
-    const { error: insertError } = await supabase.from("muse_items").insert(contentItems);
-    if (insertError) throw insertError;
-
-    // 5. Mark onboarding as complete
+    const { job_id: curationJobId } = await response.json();
+
+    // 4. Mark onboarding as complete
     const { error: completeError } = await supabase
       .from("user_missions")
       .update({ onboarding_completed: true })
@@ -140,11 +129,11 @@ export async function saveInspirationAndCompleteOnboardingAction(
 
     if (completeError) throw completeError;
 
-    // 6. Revalidate paths and return success
+    // 5. Revalidate paths and return success
     revalidatePath("/museboard");
     revalidatePath("/onboarding");
 
-    return { success: true, data: { items_added: contentItems.length } };
+    return { success: true, data: { curation_job_id: curationJobId } };
 
   } catch (error) {
     console.error("Error in final onboarding step:", error);
@@ -153,6 +142,40 @@ export async function saveInspirationAndCompleteOnboardingAction(
   }
 }
 
+/**
+ * NEW: Polls a curation job. `content` holds the items curated so far, and grows
+ * while `status` is "pending" or "processing".
+ */
+export async function getCurationStatusAction(jobId: string): Promise<ActionResult<{
+  status: string;
+  content: { type: string; content: string; source: string; category: string; relevance_reason: string }[];
+}>> {
+  const supabase = await createServer();
+  const { data: { user }, error: userError } = await supabase.auth.getUser();
+
+  if (userError || !user) {
+    return { success: false, error: "Authentication required" };
+  }
+
+  try {
+    const params = new URLSearchParams({ user_id: user.id });
+    const response = await fetch(`${AI_SERVICE_BASE_URL}/onboarding/content/curate/${jobId}?${params}`, {
+      cache: "no-store",
+    });
+
+    if (!response.ok) {
+      throw new Error(`AI service failed with status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return { success: true, data: { status: data.status, content: data.content || [] } };
+
+  } catch (error) {
+    console.error("Error fetching curation status:", error);
+    return { success: false, error: "Could not check on your Museboard curation." };
+  }
+}
+
 // Add these new functions to your existing lib/actions/onboarding.ts
 
 export async function generateMissionAction(userInput: string): Promise<ActionResult<{ mission: string }>> {
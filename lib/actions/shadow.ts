@@ -3,7 +3,7 @@
 "use server";
 
 import { createServer } from "@/lib/supabase/server";
-import { getShadowContext, getOrCreateActiveConversation } from "@/lib/actions";
+import { getOrCreateActiveConversation } from "@/lib/actions";
 import type { ActionResult, MuseItem } from "@/lib/types";
 
 // The base URL for your Python AI service.
@@ -29,11 +29,6 @@ export async function chatWithShadowAction(
   }
 
   try {
-    const shadowContext = await getShadowContext();
-    if (!shadowContext) {
-      return { success: false, error: "Could not retrieve user context." };
-    }
-
     const activeConversation = await getOrCreateActiveConversation();
     if (!activeConversation) {
         return { success: false, error: "Could not establish a conversation." };
@@ -44,8 +39,10 @@ export async function chatWithShadowAction(
       headers: {
         "Content-Type": "application/json",
       },
+      // The AI service keeps the conversation and builds the context itself,
+      // so only the new message is sent
       body: JSON.stringify({
-        context: shadowContext,
+        user_id: user.id,
         user_message: userMessage,
         conversation_id: activeConversation.id
       }),
@@ -3,6 +3,7 @@
 "use server";
 
 import { createServer } from "@/lib/supabase/server";
+import { notifyItemsChanged } from "@/lib/ai-service";
 import { revalidatePath } from "next/cache";
 import { v4 as uuidv4 } from "uuid";
 import type { MissionResult } from "@/lib/types";
@@ -70,6 +71,7 @@ export async function uploadOnboardingFileAction(formData: FormData): Promise<Mi
       };
     }
 
+    await notifyItemsChanged(user.id);
     revalidatePath("/onboarding");
     revalidatePath("/museboard");
     
@@ -166,6 +168,7 @@ export async function uploadFileToMuseboardAction(formData: FormData) {
         throw new Error(`Database insert failed: ${insertError.message}`);
       }
 
+      await notifyItemsChanged(user.id, [insertData.id]);
       revalidatePath("/museboard");
 
       return {
@@ -0,0 +1,30 @@
+// lib/ai-service.ts
+
+// Server-side helpers for talking to the Python AI service outside of a
+// user-facing request. Import these from server actions only.
+
+const AI_SERVICE_BASE_URL = process.env.AI_SERVICE_URL || "http://127.0.0.1:8000/api/v1";
+
+/**
+ * Tells the AI service that a user's muse items were created, edited or
+ * deleted, so its search indexes and profile of the user pick the change up
+ * on their next request. Without item IDs the user's indexes are rebuilt.
+ *
+ * Best effort: the service also rebuilds its indexes periodically, so a
+ * failed notification only delays the change. It never fails the action.
+ */
+export async function notifyItemsChanged(userId: string, itemIds: string[] = []): Promise<void> {
+  try {
+    const response = await fetch(`${AI_SERVICE_BASE_URL}/items/changed`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ user_id: userId, item_ids: itemIds }),
+      signal: AbortSignal.timeout(2000),
+    });
+    if (!response.ok) {
+      console.warn(`AI service rejected an items-changed notification: ${response.status}`);
+    }
+  } catch (error) {
+    console.warn("Could not notify the AI service of changed items:", error);
+  }
+}
@@ -1,78 +1,330 @@
 # museboard-ai-service/backfill_embeddings.py
 
+import argparse
+import asyncio
+import json
 import os
 import time
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient
 import openai
 
+from core.embedding_cache import EmbeddingCache
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# OpenAI embedding request limits. The per-request token cap is enforced with a
+# conservative chars-per-token estimate, since we don't tokenize up front.
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+MAX_TOKENS_PER_INPUT = 8191
+CHARS_PER_TOKEN_ESTIMATE = 3
+
+DEFAULT_CHECKPOINT_PATH = ".backfill_checkpoint.json"
+
 def setup_clients():
     """Loads environment variables and sets up Supabase and OpenAI clients."""
     load_dotenv()
-    
-    # Configure and create an OpenAI client instance
-    openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-    # Configure and create a Supabase client instance
+    # Configure and create an OpenAI client instance. Retries are disabled
+    # because the backfill applies its own adaptive, Retry-After driven backoff.
+    openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+    # Supabase connection details; the async client itself is created inside the event loop
     supabase_url: str = os.environ.get("SUPABASE_URL")
     supabase_key: str = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-    supabase: Client = create_client(supabase_url, supabase_key)
-    
-    return openai_client, supabase
 
-def generate_embedding(text: str, client: openai.OpenAI):
-    """Generates an embedding for a given text using the OpenAI API."""
+    return openai_client, supabase_url, supabase_key
+
+def build_embedding_text(item: dict) -> str:
+    """
+    Builds the text we embed for a muse_item.
+    The ingestion worker embeds new items with it too, so both paths produce identical vectors.
+    """
+    text = f"Content: {item.get('content', '') or ''}\n\nDescription: {item.get('description', '') or ''}"
     # OpenAI recommends replacing newlines with a space for better performance.
     text = text.replace("\n", " ")
-    response = client.embeddings.create(
-        input=[text],
-        model="text-embedding-3-small"
+    # Over-long inputs fail the whole request, so clip them to the model's input limit.
+    return text[:MAX_TOKENS_PER_INPUT * CHARS_PER_TOKEN_ESTIMATE]
+
+async def generate_embeddings(texts: list, client: openai.AsyncOpenAI) -> list:
+    """Generates embeddings for a batch of texts in a single OpenAI API call."""
+    response = await client.embeddings.create(
+        input=texts,
+        model=EMBEDDING_MODEL
+    )
+    # The API documents results in input order, but sort by index to be safe
+    return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+def make_batches(items: list, max_inputs: int) -> list:
+    """Splits a page of items into embedding requests that respect the API's input and token limits."""
+    batches, current, current_tokens = [], [], 0
+    for item in items:
+        tokens = len(item["text"]) // CHARS_PER_TOKEN_ESTIMATE + 1
+        if current and (len(current) >= max_inputs or current_tokens + tokens > MAX_TOKENS_PER_REQUEST):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class AdaptiveRateLimiter:
+    """
+    Bounds concurrent embedding requests and adapts to rate limits.
+    A 429 halves the allowed concurrency and pauses every worker until the
+    server's Retry-After has elapsed; a run of successes raises it back by one.
+    """
+
+    def __init__(self, max_concurrency: int, recovery_successes: int = 10):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.recovery_successes = recovery_successes
+        self._in_flight = 0
+        self._successes = 0
+        self._resume_at = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        while True:
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            async with self._condition:
+                if self._resume_at > time.monotonic():
+                    continue
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    return
+                await self._condition.wait()
+
+    async def release(self):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    async def on_success(self):
+        async with self._condition:
+            self._successes += 1
+            if self._successes >= self.recovery_successes and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    async def on_rate_limited(self, retry_after: float):
+        async with self._condition:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+            self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+
+
+def retry_after_seconds(error: openai.APIStatusError, attempt: int) -> float:
+    """Reads the server's Retry-After hint, falling back to exponential backoff."""
+    headers = error.response.headers if error.response is not None else {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return min(60.0, 2 ** attempt)
+
+
+class Checkpoint:
+    """
+    Persists the keyset cursor so an interrupted run resumes after the last
+    fully written page. Items that failed permanently are recorded too, so a
+    resumed run doesn't keep retrying them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.last_id = None
+        self.processed = 0
+        self.failed_ids = []
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            self.last_id = state.get("last_id")
+            self.processed = state.get("processed", 0)
+            self.failed_ids = state.get("failed_ids", [])
+        return self
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"last_id": self.last_id, "processed": self.processed, "failed_ids": self.failed_ids}, f)
+        # Atomic rename, so a crash mid-write never corrupts the checkpoint
+        os.replace(tmp_path, self.path)
+
+
+class Progress:
+    """Prints throughput and an ETA for the items remaining."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+
+    def advance(self, count: int):
+        self.done += count
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total - self.done)
+        eta = f"{remaining / rate / 60:.1f} min" if rate > 0 else "unknown"
+        print(f"Progress: {self.done}/{self.total} items | {rate:.1f} items/sec | ETA {eta}")
+
+
+class EmbeddingFailed(Exception):
+    """Raised when a batch could not be embedded after all retries."""
+
+
+async def embed_texts(texts: list, openai_client, limiter: AdaptiveRateLimiter, max_retries: int) -> list:
+    """Embeds one batch of texts, retrying on rate limits and transient errors."""
+    for attempt in range(max_retries + 1):
+        await limiter.acquire()
+        try:
+            embeddings = await generate_embeddings(texts, openai_client)
+            await limiter.on_success()
+            return embeddings
+        except openai.RateLimitError as e:
+            await limiter.on_rate_limited(retry_after_seconds(e, attempt))
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            print(f"Transient error embedding batch (attempt {attempt + 1}): {e}")
+            await asyncio.sleep(min(60.0, 2 ** attempt))
+        except Exception as e:
+            raise EmbeddingFailed(f"An unexpected error occurred embedding a batch of {len(texts)} texts: {e}") from e
+        finally:
+            await limiter.release()
+    raise EmbeddingFailed(f"Giving up on a batch of {len(texts)} texts after {max_retries + 1} attempts.")
+
+async def write_embeddings(supabase: AsyncClient, batch: list, embeddings: list):
+    """
+    Writes a batch of embeddings back with a single bulk update (the
+    set_item_embeddings RPC). Only the embedding and ai_status change, so an
+    item edited or deleted since its page was read isn't reverted or recreated.
+    """
+    await supabase.rpc("set_item_embeddings", {
+        "p_items": [{"id": item["id"], "embedding": embedding} for item, embedding in zip(batch, embeddings)],
+    }).execute()
+
+async def fetch_page(supabase: AsyncClient, after_id, page_size: int) -> list:
+    """Keyset-paginated read of items that still need an embedding."""
+    query = (
+        supabase.from_("muse_items")
+        .select("id, content, description")
+        .is_("embedding", "null")
+        .order("id")
+        .limit(page_size)
     )
-    return response.data[0].embedding
+    if after_id is not None:
+        query = query.gt("id", after_id)
+    response = await query.execute()
+    return response.data
 
-def backfill():
+async def backfill(page_size: int, batch_size: int, concurrency: int, checkpoint_path: str, max_retries: int,
+                   cache: EmbeddingCache):
     """
-    Fetches all muse_items without an embedding, generates one, and updates the record.
+    Streams muse_items without an embedding through batched, concurrent
+    embedding requests and writes them back in bulk, one page at a time.
     """
     print("Starting backfill process...")
-    openai_client, supabase = setup_clients()
+    openai_client, supabase_url, supabase_key = setup_clients()
+    supabase = await acreate_client(supabase_url, supabase_key)
+
+    checkpoint = Checkpoint(checkpoint_path).load()
+    if checkpoint.last_id is not None:
+        print(f"Resuming after item {checkpoint.last_id} ({checkpoint.processed} items already processed).")
 
     try:
-        response = supabase.from_("muse_items").select("id, content, description").is_("embedding", "NULL").execute()
-        items_to_process = response.data
+        count_query = supabase.from_("muse_items").select("id", count="exact", head=True).is_("embedding", "null")
+        if checkpoint.last_id is not None:
+            count_query = count_query.gt("id", checkpoint.last_id)
+        total_items = (await count_query.execute()).count or 0
     except Exception as e:
-        print(f"FATAL: Could not fetch items from the database. Error: {e}")
+        print(f"FATAL: Could not count items in the database. Error: {e}")
         return
 
-    total_items = len(items_to_process)
-    
     if total_items == 0:
         print("No items to process. All existing items appear to have embeddings.")
         return
 
     print(f"Found {total_items} items to process.")
 
-    for index, item in enumerate(items_to_process):
-        item_id = item['id']
-        text_to_embed = f"Content: {item.get('content', '') or ''}\n\nDescription: {item.get('description', '') or ''}"
-        
-        print(f"Processing item {index + 1}/{total_items} (ID: {item_id})...", end="")
-        
+    limiter = AdaptiveRateLimiter(concurrency)
+    progress = Progress(total_items)
+    batch_size = min(batch_size, MAX_INPUTS_PER_REQUEST)
+
+    async def embed_missing(texts):
+        return await embed_texts(texts, openai_client, limiter, max_retries)
+
+    async def process_batch(batch):
+        # Duplicate content (e.g. the same link saved by many users) is served
+        # from the cache and only unique, unseen texts reach the API.
+        try:
+            embeddings = await cache.aembed(EMBEDDING_MODEL, [item["text"] for item in batch], embed_missing)
+        except EmbeddingFailed as e:
+            print(e)
+            return [item["id"] for item in batch]
         try:
-            # Generate the embedding vector using our new helper function
-            embedding = generate_embedding(text_to_embed, openai_client)
-            
-            # Update the specific item in the database
-            supabase.from_("muse_items").update({"embedding": embedding}).eq("id", item_id).execute()
-            print(" -> Done")
-            
-            # A small delay to respect API rate limits and prevent overwhelming the service
-            time.sleep(0.05) 
+            await write_embeddings(supabase, batch, embeddings)
+        except Exception as e:
+            print(f"Failed to write a batch of {len(batch)} embeddings: {e}")
+            return [item["id"] for item in batch]
+        progress.advance(len(batch))
+        return []
 
+    while True:
+        try:
+            page = await fetch_page(supabase, checkpoint.last_id, page_size)
         except Exception as e:
-            print(f" -> An unexpected error occurred: {e}")
+            print(f"FATAL: Could not fetch items from the database. Error: {e}")
+            return
+        if not page:
+            break
+
+        for item in page:
+            item["text"] = build_embedding_text(item)
+
+        results = await asyncio.gather(*(process_batch(batch) for batch in make_batches(page, batch_size)))
+        failed = [item_id for batch_failures in results for item_id in batch_failures]
+
+        # The whole page has been attempted, so the cursor can move past it
+        checkpoint.last_id = page[-1]["id"]
+        checkpoint.processed += len(page) - len(failed)
+        checkpoint.failed_ids.extend(failed)
+        checkpoint.save()
 
-    print("\nBackfill process completed!")
+    stats = cache.stats()
+    print(f"\nBackfill process completed! {checkpoint.processed} items embedded, {len(checkpoint.failed_ids)} failed.")
+    print(f"Embedding cache: {stats['memory_hits'] + stats['persistent_hits']} hits, {stats['misses']} misses.")
+    if checkpoint.failed_ids:
+        print(f"Failed item IDs are listed in {checkpoint.path}; rerun with --restart to retry them.")
 
 if __name__ == "__main__":
-    backfill()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Backfill embeddings for muse_items that don't have one yet.")
+    parser.add_argument("--page-size", type=int, default=1000, help="Rows read from the database per keyset page.")
+    parser.add_argument("--batch-size", type=int, default=256, help=f"Inputs per embedding request (max {MAX_INPUTS_PER_REQUEST}).")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum embedding requests in flight.")
+    parser.add_argument("--max-retries", type=int, default=8, help="Retries per batch on rate limits and transient errors.")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_PATH, help="Path of the resume checkpoint file.")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint and start from the beginning.")
+    parser.add_argument("--embedding-cache", default=os.getenv("EMBEDDING_CACHE_PATH"),
+                        help="SQLite file for the persistent embedding cache (shared with the API service).")
+    parser.add_argument("--embedding-cache-mb", type=int, default=256, help="Size of the in-process embedding cache.")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    cache = EmbeddingCache(max_bytes=args.embedding_cache_mb * 1024 * 1024, persist_path=args.embedding_cache)
+    try:
+        asyncio.run(backfill(args.page_size, args.batch_size, args.concurrency, args.checkpoint, args.max_retries, cache))
+    finally:
+        cache.close()
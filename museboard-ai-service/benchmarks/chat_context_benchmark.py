@@ -0,0 +1,122 @@
+# museboard-ai-service/benchmarks/chat_context_benchmark.py
+
+"""
+Per-turn cost of Shadow chat context: the client-supplied context against
+the service's own user profiles (core/user_profile.py).
+
+  context   the request carries what lib/actions/ai.ts getShadowContext()
+            assembles: the mission, the 50 most recent items, the item
+            count, the top categories and the last 20 messages. The client
+            runs five queries for it before every turn.
+  user_id   the request carries the user and conversation IDs only. The
+            service builds the user's profile on their first turn and then
+            keeps it current from items-changed events; each turn reads the
+            conversation's latest messages.
+
+Reports request size, queries per turn on each side and latency, for the
+first turn, later turns, and a turn after one item changed.
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.chat_context_benchmark --items 2000 --turns 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from benchmarks.stubs import install_stubs
+
+# Queries getShadowContext() makes: mission, recent items, item count, active conversation, messages
+CLIENT_QUERIES_PER_TURN = 5
+
+
+def legacy_body(db, user_id: str, turn: int):
+    """The context lib/actions/ai.ts sends, rebuilt from the stub tables."""
+    items = sorted((item for item in db.items if item["user_id"] == user_id), key=lambda i: i["created_at"],
+                   reverse=True)
+    recent = [{k: v for k, v in item.items() if k != "embedding"} for item in items[:50]]
+    counts = {}
+    for item in recent:
+        for category in item["ai_categories"]:
+            counts[category] = counts.get(category, 0) + 1
+    messages = [m for m in db.tables["ai_messages"] if m["conversation_id"] == f"conv-{user_id}"][-20:]
+    return {
+        "context": {
+            "mission": "Build calm software",
+            "recentItems": recent,
+            "totalItems": len(items),
+            "topCategories": sorted(counts, key=counts.get, reverse=True)[:10],
+            "userPreferences": {"contentTypes": ["text"], "categories": sorted(counts), "sources": []},
+            "conversationHistory": messages,
+        },
+        "user_message": f"What should I focus on today? ({turn})",
+        "conversation_id": f"conv-{user_id}",
+    }
+
+
+def profile_body(user_id: str, turn: int):
+    return {
+        "user_id": user_id, "conversation_id": f"conv-{user_id}",
+        "user_message": f"What should I focus on today? ({turn})",
+    }
+
+
+async def turn(client, db, body):
+    queries = db.queries
+    payload = json.dumps(body).encode()
+    started = time.perf_counter()
+    response = await client.post("/api/v1/shadow/chat", content=payload, headers={"content-type": "application/json"})
+    response.raise_for_status()
+    return len(payload), db.queries - queries, time.perf_counter() - started
+
+
+async def main(args, stubs):
+    import httpx
+    from main import app
+
+    db = stubs.db
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://service", timeout=None) as client:
+        # Loads DSPy and the modules, so the first measured turn doesn't include them
+        await turn(client, db, profile_body("user-warmup", 0))
+
+        print(f"{args.items} items per user, {args.turns} turns\n")
+        print(f"{'mode':<10}{'turn':<14}{'request bytes':>15}{'client queries':>16}{'service queries':>17}"
+              f"{'p50 ms':>9}")
+        for mode in ("context", "user_id"):
+            user_id = f"user-{0 if mode == 'context' else 1}"
+            make = (lambda t: legacy_body(db, user_id, t)) if mode == "context" else (lambda t: profile_body(user_id, t))
+            client_queries = CLIENT_QUERIES_PER_TURN if mode == "context" else 0
+
+            phases = {"first": [await turn(client, db, make(0))]}
+            phases["later"] = [await turn(client, db, make(t)) for t in range(1, args.turns)]
+            # One item edited, announced the way the ingestion worker does
+            changed = next(item for item in db.items if item["user_id"] == user_id)
+            changed["ai_categories"] = ["leadership"]
+            await client.post("/api/v1/items/changed", json={"user_id": user_id, "item_ids": [changed["id"]]})
+            phases["after change"] = [await turn(client, db, make(args.turns))]
+
+            for phase, samples in phases.items():
+                sizes, queries, latencies = zip(*samples)
+                print(f"{mode:<10}{phase:<14}{np.mean(sizes):>15.0f}{client_queries:>16}{np.mean(queries):>17.1f}"
+                      f"{np.percentile(latencies, 50) * 1000:>9.1f}")
+
+        profile = (await client.get("/api/v1/users/user-1/profile")).json()
+        print(f"\nProfile of user-1: {profile['total_items']} items, top categories {profile['top_categories']}, "
+              f"{len(profile['recent_items'])} recent items, {profile['embedded_items']} embeddings in the centroid")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2000, help="Items per user.")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--lm-latency", type=float, default=0.01)
+    parser.add_argument("--db-latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    stubs = install_stubs(lm_latency=args.lm_latency, embed_latency=0.001, db_latency=args.db_latency,
+                          seed_users=2, items_per_user=args.items)
+    asyncio.run(main(args, stubs))
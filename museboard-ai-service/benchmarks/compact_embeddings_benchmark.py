@@ -0,0 +1,120 @@
+# museboard-ai-service/benchmarks/compact_embeddings_benchmark.py
+
+"""
+Recall, memory and latency of compact embeddings in the local vector index.
+
+Each configuration indexes the same corpus and answers the same queries.
+Recall@k is measured against an exact float32 search. Reported per
+configuration:
+
+  resident   bytes held in memory per vector (codes, scales and, when
+             rescoring, the full vectors)
+  scanned    bytes read per vector by a query's full pass over the index
+  recall     share of the exact top-k that the configuration returns
+  p50 / p99  single-query search latency
+
+The synthetic corpus is clustered, and its variance decays across
+dimensions. That mimics how text-embedding-3 puts most of an embedding's
+meaning in its first components. Pass --corpus with an (n, 1536) .npy file
+of real embeddings for numbers that hold for our data. Queries are
+perturbed copies of corpus rows.
+
+The database column is also shown for reference: a 512-bit code, 64 bytes,
+next to the 6 KB vector(1536).
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.compact_embeddings_benchmark --items 50000 --queries 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from core.quantization import CompactCodec
+from core.vector_index import UserVectorIndex
+
+# (scheme, dims, rescore multiplier); None is the full float32 index
+CONFIGURATIONS = [
+    (None, 1536, 0),
+    ("int8", 1536, 0),
+    ("int8", 512, 0),
+    ("int8", 256, 0),
+    ("int8", 512, 4),
+    ("int8", 256, 4),
+    ("binary", 512, 4),
+    ("binary", 512, 10),
+    ("binary", 1536, 10),
+]
+
+
+def synthetic_corpus(items: int, dim: int, topics: int, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    decay = (1 / np.sqrt(1 + np.arange(dim) / 128)).astype(np.float32)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    matrix = np.empty((items, dim), dtype=np.float32)
+    for start in range(0, items, 10_000):
+        count = min(10_000, items - start)
+        chunk = centers[rng.integers(0, topics, count)] + rng.standard_normal((count, dim)).astype(np.float32)
+        matrix[start:start + count] = chunk * decay
+    return matrix
+
+
+def make_queries(corpus: np.ndarray, count: int, seed: int = 11) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows = corpus[rng.integers(0, len(corpus), count)]
+    scale = np.linalg.norm(rows, axis=1, keepdims=True) / np.sqrt(corpus.shape[1])
+    return rows + 0.6 * scale * rng.standard_normal(rows.shape).astype(np.float32)
+
+
+def scanned_bytes(codec, dim: int) -> int:
+    return dim * 4 if codec is None else codec.bytes_per_vector
+
+
+def run(name, codec, rescore, corpus, queries, truth, k):
+    items = [{"id": i} for i in range(len(corpus))]
+    index = UserVectorIndex(dim=corpus.shape[1], capacity=len(corpus), codec=codec, rescore_multiplier=rescore)
+    index.bulk_load(items, corpus)
+
+    found, samples = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results = index.search(query, k, -1.0)
+        samples.append(time.perf_counter() - started)
+        found.append({item["id"] for item in results})
+    recall = np.mean([len(expected & got) / k for expected, got in zip(truth, found)])
+    latencies = np.asarray(samples) * 1000
+    print(f"{name:<26}{index.nbytes / len(corpus):>10.0f}{scanned_bytes(codec, corpus.shape[1]):>10}"
+          f"{recall:>9.3f}{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--topics", type=int, default=200, help="Clusters in the synthetic corpus.")
+    parser.add_argument("--corpus", help="An (n, dim) .npy file of real embeddings to use instead.")
+    args = parser.parse_args()
+
+    corpus = np.load(args.corpus).astype(np.float32) if args.corpus else synthetic_corpus(args.items, 1536, args.topics)
+    queries = make_queries(corpus, args.queries)
+    exact = UserVectorIndex(dim=corpus.shape[1], capacity=len(corpus))
+    exact.bulk_load([{"id": i} for i in range(len(corpus))], corpus)
+    truth = [{item["id"] for item in results} for results in exact.search_many(queries, args.k, -1.0)]
+
+    print(f"{len(corpus)} vectors of {corpus.shape[1]} dims, {args.queries} queries, recall@{args.k}\n")
+    print(f"{'index':<26}{'resident':>10}{'scanned':>10}{'recall':>9}{'p50 ms':>10}{'p99 ms':>10}")
+    for scheme, dims, rescore in CONFIGURATIONS:
+        if scheme is None:
+            run("float32 (exact)", None, 0, corpus, queries, truth, args.k)
+            continue
+        name = f"{scheme} {dims}d" + (f" + rescore x{rescore}" if rescore else "")
+        run(name, CompactCodec(dims=dims, scheme=scheme), rescore, corpus, queries, truth, args.k)
+    print(f"\nDatabase: embedding_compact bit(512) is {512 // 8} bytes per row next to "
+          f"{corpus.shape[1] * 4} for the full vector; match_muse_items_compact reads the full "
+          "vector only for the rescored candidates.")
+
+
+if __name__ == "__main__":
+    main()
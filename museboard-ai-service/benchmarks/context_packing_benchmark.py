@@ -0,0 +1,125 @@
+# museboard-ai-service/benchmarks/context_packing_benchmark.py
+
+"""
+Compares the search answer context built by the ContextPacker against the
+previous fixed formatting (each retrieved item's first 500 characters, top
+5 items, no budget).
+
+Each query retrieves five items of mixed sizes, from one-line notes to
+saved articles several thousand characters long. One of them holds the
+fact that answers the query, anywhere in its content, and some result
+lists contain the same item saved twice. Reported per strategy:
+
+  tokens    prompt tokens of the context (mean and p95)
+  answer    share of queries whose answering sentence made it into the context
+  ms        time to build the context
+
+The answer rate is a proxy for answer quality: the LM can't use a fact
+that was cut from its context.
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.context_packing_benchmark --queries 500
+"""
+
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+# The tokenizer is loaded through LiteLLM; keep it from fetching its model price map over the network
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from core.context_builder import count_tokens
+from core.context_packer import ContextPacker
+
+SUBJECTS = "The team|My mentor|The author|This essay|The podcast guest|Our coach|The designer|A founder".split("|")
+VERBS = "argues|notes|suggests|explains|shows|claims|reminds us|points out".split("|")
+OBJECTS = [
+    "that small habits compound over years",
+    "that constraints make for better creative work",
+    "that sleep matters more than any supplement",
+    "that writing clarifies muddled thinking",
+    "that the best products solve one problem well",
+    "that rest is part of training, not a break from it",
+    "that curiosity is a skill you can practice",
+    "that most meetings could be a short document",
+]
+
+
+def filler_sentence(rng: random.Random) -> str:
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)}."
+
+
+def make_item(rng: random.Random, item_id: str, sentences: int, fact: str = None):
+    body = [filler_sentence(rng) for _ in range(sentences)]
+    if fact is not None:
+        body.insert(rng.randrange(len(body) + 1), fact)
+    return {
+        "id": item_id,
+        "content": " ".join(body),
+        "content_type": rng.choice(["text", "article", "link"]),
+        "description": f"Saved {rng.choice(['note', 'article', 'clip'])} about {rng.choice(OBJECTS)[5:]}",
+    }
+
+
+def build_case(rng: random.Random, case: int):
+    """A query, its five retrieved items (best first) and the sentence that answers it."""
+    keyword = f"zephyr{case}"
+    fact = f"The {keyword} framework recommends reviewing goals every Sunday evening."
+    query = f"what does the {keyword} framework recommend"
+    sizes = [rng.choice([1, 2, 6, 20, 60]) for _ in range(5)]
+    items = [make_item(rng, f"case{case}-item{i}", size) for i, size in enumerate(sizes)]
+    target = rng.randrange(5)
+    items[target] = make_item(rng, f"case{case}-item{target}", sizes[target], fact)
+    if rng.random() < 0.3:
+        # The same content saved twice, e.g. a link and its clipped article
+        duplicate = rng.choice([i for i in range(5) if i != target])
+        original = items[(duplicate + 1) % 5] if (duplicate + 1) % 5 != target else items[(duplicate + 2) % 5]
+        items[duplicate] = {**original, "id": f"case{case}-dup"}
+    for rank, item in enumerate(items):
+        item["similarity"] = 0.9 - 0.03 * rank
+    return query, items, fact
+
+
+def legacy_context(items):
+    return "\n\n---\n\n".join([
+        f"Type: {item['content_type']}\nContent: {item['content'][:500]}\nDescription: {item.get('description', '') or 'N/A'}"
+        for item in items
+    ])
+
+
+def measure(name, build, cases):
+    tokens, answered, samples = [], [], []
+    for query, items, fact in cases:
+        started = time.perf_counter()
+        context = build(query, items)
+        samples.append(time.perf_counter() - started)
+        tokens.append(count_tokens(context))
+        answered.append(fact in context)
+    latencies = np.asarray(samples) * 1000
+    print(f"{name:<24}{np.mean(tokens):>10.0f}{np.percentile(tokens, 95):>10.0f}{np.mean(answered):>10.3f}"
+          f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--budget", type=int, default=500, help="Packer token budget.")
+    parser.add_argument("--item-cap", type=int, default=200, help="Packer per-item token cap.")
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    cases = [build_case(rng, case) for case in range(args.queries)]
+    packer = ContextPacker(token_budget=args.budget, item_token_cap=args.item_cap)
+    count_tokens("warm up the tokenizer")
+
+    print(f"{args.queries} queries, 5 retrieved items each; packer budget {args.budget}, item cap {args.item_cap}\n")
+    print(f"{'strategy':<24}{'tokens':>10}{'p95':>10}{'answer':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    measure("first 500 chars", lambda query, items: legacy_context(items), cases)
+    measure("context packer", lambda query, items: packer.pack(query, items).text, cases)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# museboard-ai-service/benchmarks/conversation_store_benchmark.py
+
+"""
+Per-turn cost of a growing Shadow conversation: the client sending the whole
+history against the service's conversation store (core/conversation_store.py).
+
+  client   each request carries the conversation so far in
+           context.conversationHistory, as lib/actions/shadow.ts did, and
+           the service rebuilds the context from it
+  store    each request carries the user and conversation IDs and the new
+           message; the turns, the rolling summary and the referenced item
+           IDs are kept server-side and written behind the request path
+
+Reported at a few points of the conversation, averaged over the turns since
+the previous point:
+
+  request bytes   size of the chat request body
+  queries         database queries during the request (the store's writes
+                  happen in the background and are counted separately)
+  prompt tok      prompt tokens of the chat call
+  stable tok      prefix shared with the previous turn's prompt: what a
+                  provider's prompt cache can reuse within the conversation
+  p50 ms          request latency
+
+With the same turns, store-mode prompts are larger by roughly 190-230
+tokens: the context builds its items summary from the user's profile (the
+latest items with their types, up to CHAT_ITEMS_TOKEN_BUDGET), where the
+client sent a one-line count and three themes.
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.conversation_store_benchmark --turns 80
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from benchmarks.stubs import install_stubs
+
+REPORT_AT = (5, 10, 20, 40, 80, 160)
+MESSAGE = ("What should I focus on today? I keep jumping between the newsletter, the prototype and the "
+           "talk I promised to give next month. ({})")
+
+
+def conversation_id(user_id: str) -> str:
+    # Not the stub's seeded "conv-<user>" conversation, so both modes start from the same empty history
+    return f"bench-{user_id}"
+
+
+def client_body(user_id: str, history, turn: int):
+    return {
+        "context": {
+            "mission": "Build calm software", "totalItems": 200,
+            "topCategories": ["focus", "writing", "product"], "conversationHistory": list(history),
+        },
+        "user_message": MESSAGE.format(turn),
+        "conversation_id": conversation_id(user_id),
+    }
+
+
+def store_body(user_id: str, history, turn: int):
+    return {"user_id": user_id, "conversation_id": conversation_id(user_id), "user_message": MESSAGE.format(turn)}
+
+
+def chat_prompt(lm, calls: int) -> str:
+    for entry in reversed(lm.history[calls:]):
+        text = "\n".join(str(message.get("content", "")) for message in entry["messages"] or [])
+        if "CONVERSATION HISTORY" in text:
+            return text
+    return ""
+
+
+async def turn(client, stubs, body):
+    queries, calls = stubs.db.queries, len(stubs.lm.history)
+    payload = json.dumps(body).encode()
+    started = time.perf_counter()
+    response = await client.post("/api/v1/shadow/chat", content=payload, headers={"content-type": "application/json"})
+    response.raise_for_status()
+    latency = time.perf_counter() - started
+    return response.json()["response"], len(payload), stubs.db.queries - queries, chat_prompt(stubs.lm, calls), latency
+
+
+async def main(args, stubs):
+    import httpx
+    from core.config import conversation_store
+    from core.context_builder import count_tokens
+    from main import app
+
+    flusher = asyncio.create_task(conversation_store.run())
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://service", timeout=None) as client:
+        # Loads DSPy and the modules, so the first measured turn doesn't include them
+        await turn(client, stubs, store_body("user-warmup", [], 0))
+
+        points = [t for t in REPORT_AT if t <= args.turns]
+        print(f"{args.turns} turns\n")
+        print(f"{'mode':<8}{'turns':>7}{'request bytes':>15}{'queries':>9}{'prompt tok':>12}{'stable tok':>12}"
+              f"{'p50 ms':>9}")
+        for index, (mode, make) in enumerate((("client", client_body), ("store", store_body))):
+            user_id, history, previous, samples = f"user-{index}", [], "", []
+            for t in range(1, args.turns + 1):
+                body = make(user_id, history, t)
+                response, size, queries, prompt, latency = await turn(client, stubs, body)
+                stable = count_tokens(os.path.commonprefix([previous, prompt])) if previous else 0
+                samples.append((size, queries, count_tokens(prompt), stable, latency))
+                history += [{"role": "user", "content": body["user_message"]},
+                            {"role": "assistant", "content": response}]
+                previous = prompt
+                if t in points:
+                    sizes, queries, tokens, stables, latencies = zip(*samples)
+                    print(f"{mode:<8}{t:>7}{np.mean(sizes):>15.0f}{np.mean(queries):>9.1f}{np.mean(tokens):>12.0f}"
+                          f"{np.mean(stables):>12.0f}{np.percentile(latencies, 50) * 1000:>9.1f}")
+                    samples = []
+                # Lets background summaries land between turns, as they would between a user's messages
+                await asyncio.sleep(args.think_time)
+
+    conversation_store.stop()
+    await flusher
+    stats = conversation_store.stats()
+    print(f"\nStore: {stats['conversations']} conversations, {stats['hits']} hits, "
+          f"{stats['remote_loads']} loads, {stats['messages_written']} messages written in "
+          f"{stats['flushes']} background flushes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=80)
+    parser.add_argument("--lm-latency", type=float, default=0.01)
+    parser.add_argument("--db-latency", type=float, default=0.002)
+    parser.add_argument("--think-time", type=float, default=0.02, help="Seconds between a user's turns.")
+    args = parser.parse_args()
+
+    stubs = install_stubs(lm_latency=args.lm_latency, embed_latency=0.001, db_latency=args.db_latency,
+                          seed_users=2, items_per_user=200)
+    asyncio.run(main(args, stubs))
@@ -0,0 +1,114 @@
+# museboard-ai-service/benchmarks/curation_benchmark.py
+
+"""
+Onboarding content curation as a background job (curation_worker.py),
+against the stub LM and Supabase.
+
+Before, the final onboarding step waited for curation inside the request.
+Now the request only queues a job. The client then polls
+/api/v1/onboarding/content/curate/{job_id} until the job completes. The stub
+LM takes --lm-latency plus --item-latency per content item requested, so
+one call that writes the whole list takes longest.
+
+For each slice count, --signups users finish onboarding at once. Reported
+per run (medians over the signups):
+
+  signup ms       the POST that queues the job: what the user waits for
+  first item ms   until a poll returns the first curated item
+  complete ms     until the job is completed and every item is on the board
+  items           curated items the last poll returned, per signup
+  on board        muse_items rows written, per signup
+  lm calls        curator calls made
+
+With one slice, "complete" is what the old inline request took. More slices
+run in parallel, and each writes fewer items.
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.curation_benchmark --slices 1,2,4 --signups 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.load_test import free_port
+from benchmarks.stubs import install_stubs
+
+
+async def signup(client, user_id: str, poll_interval: float):
+    body = {
+        "user_id": user_id, "mission": "Build calm software that helps people focus",
+        "heroes": ["Ada Lovelace", "Dieter Rams", "Grace Hopper"],
+        "interests": ["Systems Thinking", "Industrial Design", "Deep Work"],
+    }
+    started = time.perf_counter()
+    response = await client.post("/api/v1/onboarding/content/curate", json=body)
+    response.raise_for_status()
+    queued = time.perf_counter() - started
+    job_id = response.json()["job_id"]
+
+    first_item = None
+    while True:
+        job = (await client.get(f"/api/v1/onboarding/content/curate/{job_id}", params={"user_id": user_id})).json()
+        elapsed = time.perf_counter() - started
+        if first_item is None and job["content"]:
+            first_item = elapsed
+        if job["status"] in ("completed", "failed"):
+            return queued, first_item or elapsed, elapsed, len(job["content"]), job["status"]
+        await asyncio.sleep(poll_interval)
+
+
+async def main(args, stubs):
+    import httpx
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=free_port(), log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    print(f"{args.signups} signups at once, LM {args.lm_latency * 1000:.0f}ms + {args.item_latency * 1000:.0f}ms "
+          f"per item, {args.items} items per signup\n")
+    print(f"{'slices':>7}{'signup ms':>11}{'first item ms':>15}{'complete ms':>13}{'items':>7}{'on board':>10}"
+          f"{'lm calls':>10}{'failed':>8}")
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.config.port}", timeout=None) as client:
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.05)
+        while getattr(app.state, "curation_worker", None) is None:
+            await asyncio.sleep(0.05)
+        worker = app.state.curation_worker
+        worker.items = args.items
+        worker.concurrency = args.signups
+
+        for run, slices in enumerate(args.slices):
+            worker.slices = slices
+            lm_calls = stubs.lm.calls
+            results = await asyncio.gather(*(
+                signup(client, f"new-user-{run}-{i}", args.poll_interval) for i in range(args.signups)
+            ))
+            queued, first, complete, items, status = zip(*results)
+            users = {f"new-user-{run}-{i}" for i in range(args.signups)}
+            on_board = sum(item["user_id"] in users for item in stubs.db.items) / args.signups
+            print(f"{slices:>7}{statistics.median(queued) * 1000:>11.1f}{statistics.median(first) * 1000:>15.0f}"
+                  f"{statistics.median(complete) * 1000:>13.0f}{statistics.median(items):>7.0f}{on_board:>10.1f}"
+                  f"{stubs.lm.calls - lm_calls:>10}{sum(s != 'completed' for s in status):>8}")
+
+    server.should_exit = True
+    await serve_task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slices", type=lambda s: [int(n) for n in s.split(",")], default=[1, 2, 4])
+    parser.add_argument("--signups", type=int, default=8)
+    parser.add_argument("--items", type=int, default=12)
+    parser.add_argument("--lm-latency", type=float, default=0.3)
+    parser.add_argument("--item-latency", type=float, default=0.15)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    stubs = install_stubs(lm_latency=args.lm_latency, embed_latency=0.005, db_latency=0.002,
+                          lm_item_latency=args.item_latency)
+    asyncio.run(main(args, stubs))
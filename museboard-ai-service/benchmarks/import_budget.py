@@ -0,0 +1,73 @@
+# museboard-ai-service/benchmarks/import_budget.py
+
+"""
+Import-time budget check for the service.
+
+Imports `main` in a fresh interpreter and fails (exit code 1) if it takes
+longer than the budget or if any of the heavy SDKs was imported eagerly.
+Those are loaded by the service container on first use or by the startup
+warm-up, so a worker can answer its health check right away.
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.import_budget --budget-ms 800
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Modules that must not be imported by `import main`
+HEAVY_MODULES = ("dspy", "litellm", "openai", "supabase", "tiktoken")
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure(runs: int):
+    env = dict(os.environ)
+    # No credentials are needed just to import the app
+    for name in ("OPENAI_API_KEY", "SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY"):
+        env.pop(name, None)
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], capture_output=True, text=True, check=True, env=env,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=800.0)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time; the median is checked.")
+    args = parser.parse_args()
+
+    samples = measure(args.runs)
+    times = sorted(sample["ms"] for sample in samples)
+    median = times[len(times) // 2]
+    heavy = sorted({module for sample in samples for module in sample["heavy"]})
+
+    print(f"import main: median {median:.0f}ms over {args.runs} runs (min {times[0]:.0f}ms, max {times[-1]:.0f}ms), "
+          f"budget {args.budget_ms:.0f}ms")
+    ok = True
+    if median > args.budget_ms:
+        print("FAIL: import time is over budget")
+        ok = False
+    if heavy:
+        print(f"FAIL: imported eagerly: {', '.join(heavy)}")
+        ok = False
+    if ok:
+        print("OK")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# museboard-ai-service/benchmarks/ingestion_benchmark.py
+
+"""
+Measures the embedding ingestion worker against the per-row edge function
+it replaces, using the stub embeddings API and Supabase from stubs.py.
+
+  bulk import   N items inserted at once. The edge function path makes
+                one embeddings request and one update per row, all fired
+                at once as the database webhooks would, and loses every row
+                whose request is rate limited. The worker path queues N
+                jobs and lets the worker drain them.
+  bad inputs    the bulk import again, with a few items the embeddings API
+                rejects; only those should be dead-lettered.
+  short lease   two workers sharing the queue, with a lease shorter than
+                it takes to drain what the first one claims: without lease
+                renewal its queued jobs are claimed and embedded again.
+  trickle       items arriving steadily, one at a time; reports how long an
+                item waits from insert to embedding with the batching window.
+
+The stub embeddings API answers 429 above --rps requests per second.
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.ingestion_benchmark --items 5000 --rps 20
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from benchmarks.stubs import FakeAsyncOpenAI, FakeAsyncSupabase
+from backfill_embeddings import EMBEDDING_MODEL, build_embedding_text
+from ingestion_worker import IngestionWorker
+
+USER_ID = "bench-user"
+BAD_MARKER = "\u0000bad"
+
+
+def add_items(db: FakeAsyncSupabase, count: int, start: int = 0, bad: int = 0):
+    items = []
+    for i in range(start, start + count):
+        content = f"Imported bookmark {i} about focus and craft"
+        if i - start < bad:
+            content += BAD_MARKER
+        item = {
+            "id": f"item-{i:06d}", "user_id": USER_ID, "content": content, "content_type": "link",
+            "description": f"Bookmark {i}", "deleted_at": None, "embedding": None, "ai_status": "pending",
+        }
+        db.items.append(item)
+        items.append(item)
+    return items
+
+
+async def edge_function_import(items: int, args):
+    """One invocation per row, each with its own embeddings request and update, and no retries."""
+    db = FakeAsyncSupabase(latency=args.db_latency)
+    openai = FakeAsyncOpenAI(latency=args.embed_latency, requests_per_second=args.rps)
+    rows = add_items(db, items)
+
+    async def invoke(item):
+        try:
+            response = await openai.embeddings.create(input=build_embedding_text(item), model=EMBEDDING_MODEL)
+            await db.from_("muse_items").update({
+                "embedding": response.data[0].embedding, "ai_status": "completed",
+            }).eq("id", item["id"]).execute()
+        except Exception:
+            pass
+
+    started = time.perf_counter()
+    await asyncio.gather(*(invoke(item) for item in rows))
+    elapsed = time.perf_counter() - started
+    embedded = sum(1 for item in rows if item["embedding"] is not None)
+    return {"seconds": elapsed, "requests": openai.calls, "rate_limited": openai.rate_limited,
+            "embedded": embedded, "missing": items - embedded, "dead_lettered": 0}
+
+
+async def drain(db: FakeAsyncSupabase, worker: IngestionWorker):
+    runner = asyncio.create_task(worker.run())
+    while any(job["status"] in ("pending", "processing") for job in db.jobs):
+        await asyncio.sleep(0.02)
+    worker.stop()
+    await runner
+
+
+def make_worker(db, openai, args, **overrides):
+    settings = dict(batch_size=args.batch_size, max_wait=args.max_wait_ms / 1000, concurrency=args.concurrency,
+                    max_attempts=3, poll_interval=0.05, backoff_seconds=0)
+    settings.update(overrides)
+    return IngestionWorker(db, openai, **settings)
+
+
+async def worker_import(items: int, args, bad: int = 0):
+    db = FakeAsyncSupabase(latency=args.db_latency)
+    openai = FakeAsyncOpenAI(latency=args.embed_latency, requests_per_second=args.rps, reject_marker=BAD_MARKER)
+    for item in add_items(db, items, bad=bad):
+        db.enqueue_embedding_job(item)
+    worker = make_worker(db, openai, args)
+
+    started = time.perf_counter()
+    await drain(db, worker)
+    elapsed = time.perf_counter() - started
+    embedded = sum(1 for item in db.items if item["embedding"] is not None)
+    return {"seconds": elapsed, "requests": openai.calls, "rate_limited": openai.rate_limited,
+            "embedded": embedded, "missing": items - embedded, "dead_lettered": worker.dead_lettered}
+
+
+async def shared_queue(args, renew: bool):
+    db = FakeAsyncSupabase(latency=args.db_latency)
+    openai = FakeAsyncOpenAI(latency=args.embed_latency, requests_per_second=args.rps)
+    for item in add_items(db, args.lease_items):
+        db.enqueue_embedding_job(item)
+    workers = [make_worker(db, openai, args, batch_size=64, lease_seconds=args.lease_seconds) for _ in range(2)]
+    if not renew:
+        for worker in workers:
+            worker._renew_loop = lambda: asyncio.sleep(0)
+
+    started = time.perf_counter()
+    runners = [asyncio.create_task(worker.run()) for worker in workers]
+    while any(job["status"] in ("pending", "processing") for job in db.jobs):
+        await asyncio.sleep(0.02)
+    for worker in workers:
+        worker.stop()
+    await asyncio.gather(*runners)
+    elapsed = time.perf_counter() - started
+    reclaimed = sum(1 for job in db.jobs if job["attempts"] > 1)
+    embedded = sum(worker.embedded for worker in workers)
+    return elapsed, reclaimed, embedded - args.lease_items, openai.calls
+
+
+async def trickle(args):
+    db = FakeAsyncSupabase(latency=args.db_latency)
+    openai = FakeAsyncOpenAI(latency=args.embed_latency, requests_per_second=args.rps)
+    inserted_at, waits = {}, []
+
+    def on_embedded(user_id, item_ids):
+        now = time.perf_counter()
+        waits.extend(now - inserted_at[item_id] for item_id in item_ids)
+
+    worker = make_worker(db, openai, args, on_embedded=on_embedded)
+    runner = asyncio.create_task(worker.run())
+    count = int(args.trickle_rate * args.trickle_seconds)
+    for i in range(count):
+        item = add_items(db, 1, start=i)[0]
+        inserted_at[item["id"]] = time.perf_counter()
+        db.enqueue_embedding_job(item)
+        await asyncio.sleep(1 / args.trickle_rate)
+    while len(waits) < count:
+        await asyncio.sleep(0.02)
+    worker.stop()
+    await runner
+    return np.asarray(waits) * 1000, openai.calls, count
+
+
+def report(name, result):
+    print(f"{name:<24}{result['seconds']:>9.1f}{result['requests']:>10}{result['rate_limited']:>10}"
+          f"{result['embedded']:>10}{result['missing']:>10}{result['dead_lettered']:>8}")
+
+
+async def run(args):
+    print(f"{args.items} items; embeddings API {args.embed_latency * 1000:.0f}ms, {args.rps} req/s limit; "
+          f"worker batch {args.batch_size}, window {args.max_wait_ms:.0f}ms, concurrency {args.concurrency}\n")
+    print(f"{'path':<24}{'seconds':>9}{'requests':>10}{'429s':>10}{'embedded':>10}{'missing':>10}{'dead':>8}")
+    report("edge function per row", await edge_function_import(args.items, args))
+    report("ingestion worker", await worker_import(args.items, args))
+    report(f"worker, {args.bad_items} bad inputs", await worker_import(args.items, args, bad=args.bad_items))
+
+    print(f"\nShort lease: {args.lease_items} items, two workers, {args.lease_seconds:g}s lease\n")
+    print(f"{'path':<24}{'seconds':>9}{'reclaimed':>11}{'re-embedded':>13}{'requests':>10}")
+    for name, renew in (("no lease renewal", False), ("lease renewal", True)):
+        elapsed, reclaimed, duplicates, requests = await shared_queue(args, renew)
+        print(f"{name:<24}{elapsed:>9.1f}{reclaimed:>11}{duplicates:>13}{requests:>10}")
+
+    waits, requests, count = await trickle(args)
+    print(f"\nTrickle: {count} items at {args.trickle_rate:.0f}/s -> {requests} embedding requests; "
+          f"insert-to-embedded p50 {np.percentile(waits, 50):.0f}ms, p95 {np.percentile(waits, 95):.0f}ms")
+
+
+def main():
+    # The bad-inputs run logs every failed job; the table reports them
+    logging.getLogger("ingestion_worker").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--rps", type=int, default=20, help="Embeddings API requests per second before 429s.")
+    parser.add_argument("--embed-latency", type=float, default=0.15)
+    parser.add_argument("--db-latency", type=float, default=0.01)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--bad-items", type=int, default=3)
+    parser.add_argument("--lease-items", type=int, default=2000)
+    parser.add_argument("--lease-seconds", type=float, default=1.5)
+    parser.add_argument("--trickle-rate", type=float, default=50, help="Items inserted per second in the trickle run.")
+    parser.add_argument("--trickle-seconds", type=float, default=4)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
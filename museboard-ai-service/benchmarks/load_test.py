@@ -0,0 +1,317 @@
+# museboard-ai-service/benchmarks/load_test.py
+
+"""
+Offline load test for every FastAPI endpoint, against the stub LM,
+embeddings and Supabase in benchmarks/stubs.py. No OpenAI or Supabase
+credentials are needed and nothing leaves the machine.
+
+Fires a fixed number of requests per client at increasing concurrency levels
+and reports throughput, p50/p95/p99 latency, time to first byte, LM calls
+made and process memory. With the async request path, throughput should rise
+roughly linearly with concurrency until the per-endpoint limit is reached;
+a blocking handler would stay flat at ~1 / LM latency.
+
+--distinct-inputs N draws request bodies from a pool of N inputs instead,
+to simulate popular missions repeating during a signup spike; the "lm calls"
+column then shows how many LM calls were actually made.
+
+--output writes the results to JSON, and --compare checks a run against a
+previous JSON file, exiting non-zero if any endpoint got slower than
+--tolerance allows. Together they catch regressions between commits:
+
+    git checkout main && python -m benchmarks.load_test --output base.json
+    git checkout my-branch && python -m benchmarks.load_test --compare base.json
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.load_test --endpoint search --lm-latency 0.5
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.stubs import install_stubs
+
+def chat_body(i):
+    return {
+        "context": {"mission": "Build calm software", "totalItems": 12, "topCategories": ["focus"],
+                    "conversationHistory": [{"role": "user", "content": "hello"}]},
+        "user_message": f"What should I focus on today? ({i})",
+        "conversation_id": f"conv-{i}",
+    }
+
+def chat_profile_body(i):
+    # The context comes from the service's profile of the user and the stored conversation
+    return {
+        "user_id": f"user-{i % 4}", "conversation_id": f"conv-user-{i % 4}",
+        "user_message": f"What should I focus on today? ({i})",
+    }
+
+def search_body(i):
+    return {"query": f"notes about focus {i}", "user_id": f"user-{i % 4}", "match_threshold": 0.0}
+
+# Queries per batch search request, as fired by a dashboard panel
+BATCH_QUERIES = 8
+
+def batch_search_body(answer_mode):
+    def body(i):
+        return {
+            "queries": [f"notes about focus {i} topic {j}" for j in range(BATCH_QUERIES)],
+            "user_id": f"user-{i % 4}", "match_threshold": 0.0, "answer_mode": answer_mode,
+        }
+    return body
+
+def curate_body(i):
+    return {
+        "user_id": f"user-{i % 4}", "mission": f"become a better leader {i}",
+        "heroes": ["Ada Lovelace"], "interests": ["Systems Thinking"],
+    }
+
+# name -> (method, path, body factory)
+ENDPOINTS = {
+    "health": ("GET", "/", None),
+    "chat": ("POST", "/api/v1/shadow/chat", chat_body),
+    "chat_profile": ("POST", "/api/v1/shadow/chat", chat_profile_body),
+    "chat_stream": ("POST", "/api/v1/shadow/chat/stream", chat_body),
+    "search": ("POST", "/api/v1/shadow/search", search_body),
+    "search_stream": ("POST", "/api/v1/shadow/search/stream", search_body),
+    "search_batch": ("POST", "/api/v1/shadow/search/batch", batch_search_body("combined")),
+    "search_batch_separate": ("POST", "/api/v1/shadow/search/batch", batch_search_body("separate")),
+    "search_batch_none": ("POST", "/api/v1/shadow/search/batch", batch_search_body("none")),
+    "mission_enhance": ("POST", "/api/v1/onboarding/mission/enhance", lambda i: {"user_input": f"help founders {i}"}),
+    "suggestions": ("POST", "/api/v1/onboarding/suggestions", lambda i: {"mission": f"become a better leader {i}"}),
+    "curate": ("POST", "/api/v1/onboarding/content/curate", curate_body),
+    "items_changed": ("POST", "/api/v1/items/changed", lambda i: {"user_id": f"user-{i % 4}", "item_ids": []}),
+}
+
+
+# By default every request gets a distinct body so caches don't flatter the numbers
+_request_ids = itertools.count()
+
+
+def percentile(samples, q):
+    return float(np.percentile(np.asarray(samples) * 1000, q)) if samples else float("nan")
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process (server and load generator together)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+async def run_level(client, endpoint: str, concurrency: int, requests_per_client: int, distinct_inputs: int = 0):
+    import httpx
+
+    method, path, make_body = ENDPOINTS[endpoint]
+    latencies = []
+    first_bytes = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for _ in range(requests_per_client):
+            request_id = next(_request_ids)
+            if distinct_inputs:
+                request_id %= distinct_inputs
+            body = make_body(request_id) if make_body else None
+            started = time.perf_counter()
+            try:
+                async with client.stream(method, path, json=body) as response:
+                    content = b""
+                    async for chunk in response.aiter_bytes():
+                        if not content:
+                            first_bytes.append(time.perf_counter() - started)
+                        content += chunk
+            except httpx.TransportError:
+                # e.g. a connection reset by a worker that was shutting down
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if not response.is_success or b"event: error" in content:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "ttfb_ms": percentile(first_bytes, 50),
+        "rss_mb": rss_mb(),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+HEADER = (f"{'endpoint':<22}{'conc':>6}{'reqs':>7}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'ttfb ms':>10}{'lm calls':>10}{'rss MB':>9}")
+
+
+def format_row(result) -> str:
+    return (f"{result['endpoint']:<22}{result['concurrency']:>6}{result['requests']:>7}{result['errors']:>8}"
+            f"{result['throughput']:>10.2f}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+            f"{result['ttfb_ms']:>10.1f}{result['lm_calls']:>10}{result['rss_mb']:>9.0f}")
+
+
+async def main(args, stubs):
+    import httpx
+    import uvicorn
+    from main import app
+
+    # A real server on the same event loop: unlike httpx's ASGI transport it
+    # streams response bodies, so time-to-first-byte is measured faithfully.
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    started = time.perf_counter()
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    results = []
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+        startup = await wait_until_ready(client, started)
+        print(f"Startup: healthy after {startup['healthy_ms']:.0f}ms, ready after {startup['ready_ms']:.0f}ms\n")
+        print(HEADER)
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                lm_calls = stubs.lm.calls
+                result = await run_level(client, endpoint, concurrency, args.requests_per_client, args.distinct_inputs)
+                result["lm_calls"] = stubs.lm.calls - lm_calls
+                results.append(result)
+                print(format_row(result))
+
+    server.should_exit = True
+    await serve_task
+    return startup, results
+
+
+async def wait_until_ready(client, started: float, timeout: float = 120.0):
+    """Polls / and /ready so measurements start once the service is warm, and reports both times."""
+    healthy_ms = None
+    while time.perf_counter() - started < timeout:
+        if healthy_ms is None and (await client.get("/")).status_code == 200:
+            healthy_ms = (time.perf_counter() - started) * 1000
+        if (await client.get("/ready")).status_code == 200:
+            return {"healthy_ms": healthy_ms, "ready_ms": (time.perf_counter() - started) * 1000}
+        await asyncio.sleep(0.01)
+    raise TimeoutError(f"Service not ready after {timeout}s: {(await client.get('/ready')).json()}")
+
+
+# --- Saving and Comparing Runs ---
+
+def save_results(path: str, args, startup, results):
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "peak_rss_mb": peak_rss_mb(),
+            "startup": startup,
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {path}")
+
+
+def compare_results(path: str, results, tolerance: float) -> bool:
+    """
+    Prints throughput and p95 changes against a previous run. Returns False if
+    any endpoint/concurrency pair lost more than `tolerance` of its throughput
+    or gained more than `tolerance` of p95 latency.
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+
+    print(f"\nCompared with {path} (commit {baseline['meta'].get('commit', 'unknown')}):")
+    print(f"{'endpoint':<22}{'conc':>6}{'req/s':>10}{'p95':>10}")
+    ok = True
+    for result in results:
+        before = previous.get((result["endpoint"], result["concurrency"]))
+        if before is None:
+            continue
+        throughput_change = result["throughput"] / before["throughput"] - 1
+        p95_change = result["p95_ms"] / before["p95_ms"] - 1
+        regressed = throughput_change < -tolerance or p95_change > tolerance
+        ok = ok and not regressed
+        print(f"{result['endpoint']:<22}{result['concurrency']:>6}{throughput_change:>+10.1%}{p95_change:>+10.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", dest="endpoints", action="append", choices=sorted(ENDPOINTS),
+                        help="Endpoint to exercise (repeatable). Defaults to all.")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument("--lm-latency", type=float, default=0.5)
+    parser.add_argument("--completion-words", type=int, default=40,
+                        help="Length of the stub LM's free-text outputs.")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    parser.add_argument("--users", type=int, default=4, help="Users seeded into the in-memory muse_items table.")
+    parser.add_argument("--items-per-user", type=int, default=50)
+    parser.add_argument("--distinct-inputs", type=int, default=0,
+                        help="Cycle request bodies through this many distinct inputs (0 = all distinct).")
+    parser.add_argument("--output", help="Write results to this JSON file.")
+    parser.add_argument("--compare", help="Compare results against a JSON file from a previous run.")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative throughput loss or p95 increase tolerated by --compare.")
+    args = parser.parse_args()
+    args.endpoints = args.endpoints or list(ENDPOINTS)
+
+    stubs = install_stubs(
+        lm_latency=args.lm_latency, embed_latency=args.embed_latency, db_latency=args.db_latency,
+        seed_users=args.users, items_per_user=args.items_per_user, completion_words=args.completion_words,
+    )
+    startup, results = asyncio.run(main(args, stubs))
+
+    if args.output:
+        save_results(args.output, args, startup, results)
+    if args.compare and not compare_results(args.compare, results, args.tolerance):
+        sys.exit(1)
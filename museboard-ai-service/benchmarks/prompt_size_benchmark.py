@@ -0,0 +1,205 @@
+# museboard-ai-service/benchmarks/prompt_size_benchmark.py
+
+"""
+Prompt size of the onboarding programs, against the stub LM.
+
+MissionEnhancer and InterestSuggester used to paste a long instruction
+block into their input field, around the user's text. Now the instructions
+live in the signatures, and compile_programs.py can add optimized demos,
+both ahead of the user's input. Three variants, each over the same
+--requests distinct inputs per endpoint:
+
+  before     the old prompt-in-the-input modules (reproduced below)
+  signature  the current modules as written
+  compiled   compiled with BootstrapFewShot against the stub, saved and
+             loaded back the way the service does at startup
+
+Reported per endpoint and variant:
+
+  prompt tok   median prompt tokens per call (tiktoken, as in core.context_builder)
+  stable tok   the prefix every call's prompt shares: what a provider's
+               prompt cache can reuse across users (OpenAI caches prefixes
+               of 1024 tokens or more)
+  user tok     what follows it and differs per request
+  p50 ms       call latency; the stub adds --prompt-latency per 1000 prompt tokens
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.prompt_size_benchmark --requests 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import dspy
+
+from benchmarks.stubs import install_stubs
+
+USER_INPUTS = [
+    "I want to start a podcast about local history",
+    "help nurses avoid burnout",
+    "Run a marathon before I turn 40",
+    "design furniture that lasts generations",
+    "make open source easier for beginners",
+    "I teach high school physics and want kids to love it",
+    "build a studio that makes cozy games",
+    "Help immigrants find their first job",
+    "grow food for my whole street",
+    "learn Japanese and move to Kyoto",
+    "make city data open for everyone",
+    "write music that helps people sleep",
+]
+
+
+# --- The old modules, as they were before the prompts moved into the signatures ---
+
+class LegacyMissionEnhancer(dspy.Module):
+    def __init__(self):
+        super().__init__()
+        self.enhance = dspy.ChainOfThought("user_input -> mission")
+        self.enhance_fast = dspy.Predict("user_input -> mission")
+
+    def _build_prompt(self, user_input: str) -> str:
+        return f"""
+        You are Shadow, an AI muse for MuseboardLM. Your job is to take a user's raw input about their goals/dreams and craft it into a clear, inspiring mission statement.
+
+        User's input: "{user_input}"
+
+        Rules:
+        - Keep it under 20 words when possible
+        - Make it inspiring and personal
+        - Focus on the outcome/impact they want to create
+        - Use active language
+        - If their input is already clear, you can return it with minor refinements
+        - If it's vague, ask ONE clarifying question max and then enhance based on what they gave you
+
+        Examples:
+        Input: "Help solo founders succeed" → Mission: "Help solo founders build profitable products"
+        Input: "I want to be a better leader" → Mission: "Become a leader who inspires teams to achieve extraordinary results"
+        Input: "Create art" → Mission: "Create meaningful art that moves people and sparks conversations"
+
+        Return the enhanced mission statement.
+        """
+
+    async def aforward(self, user_input: str, fast: bool = False):
+        enhance = self.enhance_fast if fast else self.enhance
+        return await enhance.acall(user_input=self._build_prompt(user_input))
+
+
+class LegacyInterestSuggester(dspy.Module):
+    def __init__(self):
+        super().__init__()
+        self.suggest_interests = dspy.Predict(dspy.Signature(
+            {"mission_statement": dspy.InputField(desc="The user's refined mission statement"),
+             "suggestions_json": dspy.OutputField(
+                 desc="A single, valid JSON object containing lists of suggested heroes and interests.")},
+            "Suggests heroes and interests based on user's mission and outputs them as a single JSON object.",
+        ))
+
+    def _build_prompt(self, mission_statement: str) -> str:
+        return f"""
+            Analyze the user's mission: "{mission_statement}"
+
+            Your task is to generate a list of 8-10 inspiring figures (heroes) and 5-6 broad interest categories relevant to this mission.
+
+            You MUST format your entire response as a single, valid JSON object, structured exactly like this:
+            {{
+              "heroes": [
+                {{"name": "Person Name", "reason": "A brief explanation of why they are relevant."}},
+                ...
+              ],
+              "interests": [
+                {{"category": "Category Name", "description": "A brief explanation of its relevance."}},
+                ...
+              ]
+            }}
+
+            Ensure the JSON is perfectly formed. Do not include any text, explanations, or markdown backticks outside of the JSON object itself.
+            """
+
+    async def aforward(self, mission_statement: str):
+        return await self.suggest_interests.acall(mission_statement=self._build_prompt(mission_statement))
+
+
+# --- Measurement ---
+
+def prompt_text(entry) -> str:
+    return "\n".join(str(message.get("content", "")) for message in entry["messages"] or [])
+
+
+async def measure(lm, call, inputs):
+    from core.context_builder import count_tokens
+
+    prompts, latencies = [], []
+    for text in inputs:
+        calls = len(lm.history)
+        started = time.perf_counter()
+        await call(text)
+        latencies.append(time.perf_counter() - started)
+        prompts.extend(prompt_text(entry) for entry in lm.history[calls:])
+    stable = count_tokens(os.path.commonprefix(prompts))
+    tokens = statistics.median(count_tokens(prompt) for prompt in prompts)
+    return tokens, stable, tokens - stable, statistics.median(latencies)
+
+
+def compiled_programs(lm, max_demos: int, max_demo_tokens: int):
+    import compile_programs
+    from dspy_modules.compiled import compiled_path, load_compiled
+    from dspy_modules.mission_enhance import MissionEnhancer
+    from dspy_modules.onboarding import InterestSuggester
+
+    directory = tempfile.mkdtemp(prefix="compiled-")
+    with dspy.context(lm=lm):
+        for name in ("mission_enhancer", "interest_suggester"):
+            program = compile_programs.compile_program(name, max_demos, max_demo_tokens)
+            program.save(compiled_path(directory, name))
+    mission_enhancer, interest_suggester = MissionEnhancer(), InterestSuggester()
+    load_compiled(mission_enhancer, "mission_enhancer", directory)
+    load_compiled(interest_suggester, "interest_suggester", directory)
+    return mission_enhancer, interest_suggester
+
+
+async def main(args, stubs):
+    from dspy_modules.mission_enhance import MissionEnhancer
+    from dspy_modules.onboarding import InterestSuggester
+
+    lm = stubs.lm
+    inputs = (USER_INPUTS * (args.requests // len(USER_INPUTS) + 1))[:args.requests]
+    variants = {
+        "before": (LegacyMissionEnhancer(), LegacyInterestSuggester()),
+        "signature": (MissionEnhancer(), InterestSuggester()),
+        "compiled": compiled_programs(lm, args.max_demos, args.max_demo_tokens),
+    }
+
+    print(f"{args.requests} requests per endpoint, LM {args.lm_latency * 1000:.0f}ms "
+          f"+ {args.prompt_latency * 1000:.0f}ms per 1000 prompt tokens, compiled with up to {args.max_demos} demos "
+          f"in {args.max_demo_tokens} tokens\n")
+    print(f"{'endpoint':<22}{'variant':<11}{'prompt tok':>11}{'stable tok':>12}{'user tok':>10}{'p50 ms':>9}")
+    with dspy.context(lm=lm):
+        for endpoint in ("mission_enhance", "mission_enhance_fast", "suggestions"):
+            for variant, (mission_enhancer, interest_suggester) in variants.items():
+                if endpoint == "suggestions":
+                    call = lambda text: interest_suggester.acall(mission_statement=text)
+                else:
+                    fast = endpoint == "mission_enhance_fast"
+                    call = lambda text: mission_enhancer.acall(user_input=text, fast=fast)
+                tokens, stable, user, latency = await measure(lm, call, inputs)
+                print(f"{endpoint:<22}{variant:<11}{tokens:>11.0f}{stable:>12}{user:>10.0f}{latency * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--lm-latency", type=float, default=0.3)
+    parser.add_argument("--prompt-latency", type=float, default=0.08)
+    # compile_programs.py's defaults; it is imported only once the stubs are installed
+    parser.add_argument("--max-demos", type=int, default=2)
+    parser.add_argument("--max-demo-tokens", type=int, default=120)
+    args = parser.parse_args()
+
+    stubs = install_stubs(lm_latency=args.lm_latency, embed_latency=0.005, db_latency=0.002)
+    stubs.lm.prompt_latency = args.prompt_latency
+    asyncio.run(main(args, stubs))
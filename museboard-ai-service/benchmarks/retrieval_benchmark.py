@@ -0,0 +1,167 @@
+# museboard-ai-service/benchmarks/retrieval_benchmark.py
+
+"""
+Measures retrieval recall and latency of vector-only search against hybrid
+(vector + BM25, fused by reciprocal rank fusion) with and without the
+reranker, through the RAG module's own retrieval path.
+
+The corpus is synthetic and labelled: every item is built from a topic's
+vocabulary plus one made-up name, and a share of items has no embedding
+yet, as while the backfill is catching up. Two kinds of query target one
+item each:
+
+  topic   a few words from the item's content (what embeddings are good at)
+  exact   the item's name plus one topic word (e.g. a person, tag or product)
+
+Embeddings come from the stub embeddings API, a bag of per-word random
+vectors, so absolute recall says little about production; the differences
+between modes are what this measures. Supabase is the in-memory stub with
+no simulated latency, so the timings are the in-process retrieval cost.
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.retrieval_benchmark --items 5000 --queries 400
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import numpy as np
+
+# Retrieval runs against the in-process indexes, warmed from the stub Supabase
+os.environ["LOCAL_VECTOR_INDEX"] = "true"
+os.environ["HYBRID_RETRIEVAL"] = "true"
+
+from benchmarks.stubs import FakeAsyncOpenAI, FakeAsyncSupabase, fake_embedding
+
+USER_ID = "bench-user"
+
+TOPICS = {
+    "design": "typography layout grid color palette contrast spacing sketch wireframe",
+    "fitness": "running strength mobility recovery sleep protein interval endurance",
+    "startup": "founder pitch investor runway hiring product market traction",
+    "cooking": "recipe ferment sourdough braise spice knife broth roast",
+    "writing": "essay draft outline edit voice narrative chapter metaphor",
+    "music": "melody chord rhythm synth tempo harmony record mix",
+    "learning": "practice memory spaced repetition notes curiosity mentor deliberate",
+    "travel": "itinerary train hostel museum hike coast passport map",
+}
+FILLER = "idea thought today later maybe really useful interesting good new".split()
+SYLLABLES = "ka lo mi ra zu te vo ni sha gel dor fin".split()
+MODES = ("vector", "hybrid", "hybrid+rerank")
+
+
+def make_name(rng: random.Random, taken: set, syllables: int = 5) -> str:
+    while True:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(syllables))
+        if name not in taken:
+            taken.add(name)
+            return name
+
+
+def build_corpus(items: int, unembedded: float, seed: int = 5):
+    rng = random.Random(seed)
+    names: set = set()
+    # Each topic gets extra made-up jargon so a few topic words pick out few items
+    vocabulary = {topic: words.split() + [make_name(rng, names, 3) for _ in range(24)] for topic, words in TOPICS.items()}
+    corpus = []
+    for i in range(items):
+        topic = rng.choice(list(TOPICS))
+        words = rng.sample(vocabulary[topic], 6) + rng.sample(FILLER, 3)
+        rng.shuffle(words)
+        name = make_name(rng, names)
+        content = f"{' '.join(words[:4])} {name.capitalize()} {' '.join(words[4:])}"
+        corpus.append({
+            "id": f"item-{i:06d}",
+            "user_id": USER_ID,
+            "content": content,
+            "content_type": "text",
+            "description": f"Saved note on {topic}",
+            "source_url": None,
+            "ai_categories": [topic],
+            "created_at": "2026-01-01T00:00:00Z",
+            "deleted_at": None,
+            "embedding": None if rng.random() < unembedded else fake_embedding(content),
+            "_name": name,
+            "_words": words,
+        })
+    return corpus
+
+
+def build_queries(corpus, count: int, seed: int = 9):
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        item = rng.choice(corpus)
+        topic_words = [word for word in item["_words"] if word not in FILLER]
+        if i % 2:
+            queries.append(("exact", f"what did I save about {item['_name']} {rng.choice(topic_words)}", item["id"]))
+        else:
+            queries.append(("topic", " ".join(rng.sample(topic_words, 3)), item["id"]))
+    return queries
+
+
+async def run_mode(rag, search_module, lexical_index, mode, queries, k, threshold):
+    search_module.local_lexical_index = None if mode == "vector" else lexical_index
+    search_module.HYBRID_RERANK_ENABLED = mode == "hybrid+rerank"
+
+    hits = {"topic": [], "exact": []}
+    samples = []
+    for kind, query, target in queries:
+        started = time.perf_counter()
+        _, sources = await rag.aretrieve(query, USER_ID, threshold, k)
+        samples.append(time.perf_counter() - started)
+        hits[kind].append(any(item["id"] == target for item in sources))
+    return hits, samples
+
+
+async def run(args):
+    from core.config import services, local_vector_index, local_lexical_index
+    import dspy_modules.search as search_module
+    from dspy_modules.search import RAG
+
+    corpus = build_corpus(args.items, args.unembedded)
+    db = FakeAsyncSupabase(latency=0)
+    db.items.extend({key: value for key, value in item.items() if not key.startswith("_")} for item in corpus)
+    services.override(async_openai=FakeAsyncOpenAI(latency=0), async_supabase=db)
+    queries = build_queries(corpus, args.queries)
+
+    started = time.perf_counter()
+    await local_vector_index.get_index(USER_ID)
+    vector_warm = time.perf_counter() - started
+    started = time.perf_counter()
+    await local_lexical_index.get_index(USER_ID)
+    lexical_warm = time.perf_counter() - started
+    print(f"Corpus: {args.items} items, {args.unembedded:.0%} without embeddings; {len(queries)} queries")
+    print(f"Index warm-up: vector {vector_warm * 1000:.0f}ms, lexical {lexical_warm * 1000:.0f}ms")
+
+    rag = RAG()
+    # Fills the embedding cache, so every mode is timed without embedding work
+    await run_mode(rag, search_module, local_lexical_index, "vector", queries, args.k, args.threshold)
+
+    print(f"\nrecall@{args.k}, threshold {args.threshold}")
+    print(f"{'mode':<16}{'topic':>8}{'exact':>8}{'all':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode in MODES:
+        hits, samples = await run_mode(rag, search_module, local_lexical_index, mode, queries, args.k, args.threshold)
+        every = hits["topic"] + hits["exact"]
+        latencies = np.asarray(samples) * 1000
+        print(f"{mode:<16}{np.mean(hits['topic']):>8.3f}{np.mean(hits['exact']):>8.3f}{np.mean(every):>8.3f}"
+              f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Vector match threshold. The stub embeddings score lower than real ones.")
+    parser.add_argument("--unembedded", type=float, default=0.1, help="Share of items without an embedding yet.")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# museboard-ai-service/benchmarks/structured_output_benchmark.py
+
+"""
+Structured output for onboarding suggestions, against the stub LM with
+injected faults (see StubLM.malformed_fraction).
+
+Before, InterestSuggester's suggestions_json went through json.loads, and
+any malformed answer was a 500 that the user retried, a whole new GPT-4o
+call. DSPy's ChatAdapter also silently re-asked the LM through its JSON
+adapter whenever the field markers were missing. Now SuggestionsParser
+validates each hero and interest as it streams, repairs or salvages what it
+can, and only a reply with nothing usable in it costs another call.
+
+Four parts:
+
+  faults     each kind of malformed answer once, old path vs new: whether it
+             produced suggestions, and the LM calls it took
+  retries    --requests missions with --malformed-fraction of answers
+             malformed, each retried until it succeeds (as a user would):
+             first-try success and LM calls per successful answer
+  lm cache   the endpoint with the LM's response cache on, as dspy.LM has
+             it by default: each mission's first answer is cut off, then
+             it is asked again. A cut-off answer isn't kept in the
+             suggestions cache, but unless the retry skips the LM cache too,
+             it replays the same cut-off completion
+  streaming  the SSE endpoint over HTTP: time to the first hero and first
+             interest versus the whole answer, at --streams at once
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.structured_output_benchmark --requests 200 --malformed-fraction 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.load_test import free_port
+from benchmarks.stubs import SUGGESTION_FAULTS, install_stubs
+
+MAX_ATTEMPTS = 5
+# Requests per mission after its cut-off first answer, in the lm cache part
+CACHE_REPEATS = 3
+
+
+async def legacy_suggest(program, mission: str):
+    """The old path: the default adapter (with its JSON fallback), then json.loads."""
+    prediction = await program.acall(mission_statement=mission)
+    suggestions = json.loads(prediction.suggestions_json)
+    return suggestions.get("heroes", []), suggestions.get("interests", [])
+
+
+async def structured_suggest(suggester, mission: str):
+    prediction = await suggester.acall(mission_statement=mission)
+    return prediction.heroes, prediction.interests
+
+
+async def attempt(lm, suggest, mission: str):
+    """(heroes, interests, LM calls), with heroes None on failure."""
+    calls = lm.calls
+    try:
+        heroes, interests = await suggest(mission)
+    except Exception:
+        return None, None, lm.calls - calls
+    return heroes, interests, lm.calls - calls
+
+
+async def faults(stubs, paths):
+    lm = stubs.lm
+    print(f"{'answer':<16}" + "".join(f"{name + ' result':>26}{'calls':>7}" for name in paths))
+    for fault in (None,) + SUGGESTION_FAULTS:
+        lm.malformed_fraction = 0.0 if fault is None else 1.0
+        lm.fault_kinds = (fault,) if fault else SUGGESTION_FAULTS
+        row = f"{fault or 'well-formed':<16}"
+        for suggest in paths.values():
+            heroes, interests, calls = await attempt(lm, suggest, "Build calm software that helps people focus")
+            result = "error" if heroes is None else f"{len(heroes)} heroes, {len(interests)} interests"
+            row += f"{result:>26}{calls:>7}"
+        print(row)
+
+
+async def retries(stubs, paths, requests: int, fraction: float):
+    lm = stubs.lm
+    lm.malformed_fraction = fraction
+    lm.fault_kinds = SUGGESTION_FAULTS
+    print(f"\n{requests} missions, {fraction:.0%} of answers malformed, retried until they succeed "
+          f"(up to {MAX_ATTEMPTS} attempts)\n")
+    print(f"{'path':<12}{'first try ok':>14}{'gave up':>9}{'lm calls':>10}{'calls/success':>15}{'wasted':>8}")
+    for name, suggest in paths.items():
+        first_try = gave_up = total_calls = 0
+        for i in range(requests):
+            for n in range(MAX_ATTEMPTS):
+                heroes, _, calls = await attempt(lm, suggest, f"Mission {i}")
+                total_calls += calls
+                if heroes is not None:
+                    first_try += n == 0
+                    break
+            else:
+                gave_up += 1
+        successes = requests - gave_up
+        print(f"{name:<12}{first_try / requests:>14.1%}{gave_up:>9}{total_calls:>10}"
+              f"{total_calls / max(successes, 1):>15.2f}{total_calls - successes:>8}")
+
+
+async def lm_cache(stubs, missions: int):
+    import httpx
+    import main as service
+
+    lm = stubs.lm
+    lm.response_cache = True
+    lm.fault_kinds = ("truncated",)
+    needs_fresh = service._needs_fresh_suggestions
+    print(f"\nLM response cache on, {missions} missions, each first answered cut off and then asked "
+          f"{CACHE_REPEATS} more times\n")
+    print(f"{'retry':<16}{'complete answers':>18}{'lm cache hits':>15}{'lm calls':>10}")
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://service", timeout=None) as client:
+        for variant, bypass in (("replays cache", False), ("skips cache", True)):
+            service._needs_fresh_suggestions = needs_fresh if bypass else (lambda key: False)
+            hits, calls, complete = lm.cache_hits, lm.calls, 0
+            for i in range(missions):
+                mission = f"Mission {i} ({variant})"
+                lm.malformed_fraction = 1.0
+                await client.post("/api/v1/onboarding/suggestions", json={"mission": mission})
+                lm.malformed_fraction = 0.0
+                for _ in range(CACHE_REPEATS):
+                    response = await client.post("/api/v1/onboarding/suggestions", json={"mission": mission})
+                    complete += response.json()["complete"]
+            print(f"{variant:<16}{f'{complete}/{missions * CACHE_REPEATS}':>18}{lm.cache_hits - hits:>15}"
+                  f"{lm.calls - calls:>10}")
+    service._needs_fresh_suggestions = needs_fresh
+    lm.response_cache = False
+    lm.fault_kinds = SUGGESTION_FAULTS
+
+
+async def read_stream(client, mission: str):
+    started = time.perf_counter()
+    first = {}
+    async with client.stream("POST", "/api/v1/onboarding/suggestions/stream", json={"mission": mission}) as response:
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+                first.setdefault(event, time.perf_counter() - started)
+    return first.get("hero"), first.get("interest"), first.get("done"), "error" in first
+
+
+async def streaming(args):
+    import httpx
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=free_port(), log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.config.port}", timeout=None) as client:
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            client.post("/api/v1/onboarding/suggestions", json={"mission": f"Warm-up {i}"}) for i in range(args.streams)
+        ))
+        blocking = time.perf_counter() - started
+        results = await asyncio.gather(*(read_stream(client, f"Streamed mission {i}") for i in range(args.streams)))
+
+    hero, interest, done, errors = zip(*results)
+    print(f"\nStreaming, {args.streams} at once, LM {args.lm_latency * 1000:.0f}ms, well-formed answers\n")
+    print(f"  non-streaming response      {blocking * 1000:>7.0f} ms")
+    print(f"  first hero event (median)   {statistics.median(hero) * 1000:>7.0f} ms")
+    print(f"  first interest (median)     {statistics.median(interest) * 1000:>7.0f} ms")
+    print(f"  done event (median)         {statistics.median(done) * 1000:>7.0f} ms")
+    print(f"  error events                {sum(errors):>7}")
+
+    server.should_exit = True
+    await serve_task
+
+
+async def main(args, stubs):
+    import dspy
+    from dspy_modules.onboarding import InterestSuggester, InterestSuggestionSignature
+
+    legacy = dspy.Predict(InterestSuggestionSignature)
+    suggester = InterestSuggester()
+    paths = {
+        "old": lambda mission: legacy_suggest(legacy, mission),
+        "structured": lambda mission: structured_suggest(suggester, mission),
+    }
+    with dspy.context(lm=stubs.lm):
+        await faults(stubs, paths)
+        await retries(stubs, paths, args.requests, args.malformed_fraction)
+    await lm_cache(stubs, args.cache_missions)
+
+    stubs.lm.malformed_fraction = 0.0
+    stubs.lm.latency = args.lm_latency
+    stubs.fallback_lm.latency = args.lm_latency / 4
+    await streaming(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--malformed-fraction", type=float, default=0.25)
+    parser.add_argument("--lm-latency", type=float, default=0.6)
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--cache-missions", type=int, default=20)
+    args = parser.parse_args()
+
+    # The faults and retries parts only count calls, so they run with a short latency
+    stubs = install_stubs(lm_latency=0.005, embed_latency=0.005, db_latency=0.002)
+    asyncio.run(main(args, stubs))
@@ -0,0 +1,23 @@
+# museboard-ai-service/benchmarks/stub_app.py
+
+"""
+The API wired to the stubs in benchmarks/stubs.py, as an import string for
+servers that start their own worker processes:
+
+    STUB_LM_LATENCY=0.05 python serve.py --app benchmarks.stub_app:app --workers 4
+
+Every worker gets its own stubs, seeded identically. Stub latencies come
+from STUB_LM_LATENCY, STUB_EMBED_LATENCY and STUB_DB_LATENCY (seconds).
+"""
+
+import os
+
+from benchmarks.stubs import install_stubs
+
+install_stubs(
+    lm_latency=float(os.getenv("STUB_LM_LATENCY", "0.5")),
+    embed_latency=float(os.getenv("STUB_EMBED_LATENCY", "0.05")),
+    db_latency=float(os.getenv("STUB_DB_LATENCY", "0.02")),
+)
+
+from main import app  # noqa: E402
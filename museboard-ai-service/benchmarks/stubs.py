@@ -0,0 +1,627 @@
+# museboard-ai-service/benchmarks/stubs.py
+
+"""
+Offline stand-ins for the LM, the OpenAI embeddings API and Supabase.
+They let the service be exercised under load without network access or cost:
+every stub sleeps for a configurable latency and returns deterministic data.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import uuid
+import warnings
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Harmless credentials, so any client the stubs don't replace can still be
+# constructed without real ones.
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+os.environ.setdefault("SUPABASE_URL", "http://stub.supabase.local")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "stub-service-role-key")
+# Keep LiteLLM from fetching its model price map over the network on import
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+# Per-request log lines would drown out benchmark output
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import dspy
+
+from core.quantization import CompactCodec
+
+# StubLM uses the BaseLM.forward/aforward interface on purpose: it is the one
+# every DSPy 3.x release understands.
+warnings.filterwarnings("ignore", message="Implementing custom LMs", category=DeprecationWarning)
+
+EMBEDDING_DIM = 1536
+
+STUB_SUGGESTIONS = {
+    "heroes": [
+        {"name": "Ada Lovelace", "reason": "Pioneered a new field from first principles."},
+        {"name": "Dieter Rams", "reason": "Showed how restraint makes products humane."},
+        {"name": "Grace Hopper", "reason": "Made computing accessible to everyone."},
+        {"name": "Cal Newport", "reason": "Writes about focus as a competitive advantage."},
+        {"name": "Donella Meadows", "reason": "Taught how to see and shift whole systems."},
+        {"name": "Jony Ive", "reason": "Obsessed over the details people feel but don't see."},
+        {"name": "Seneca", "reason": "Wrote on living deliberately with limited time."},
+        {"name": "Annie Dillard", "reason": "Reminds us that how we spend our days is how we spend our lives."},
+    ],
+    "interests": [
+        {"category": "Systems Thinking", "description": "Seeing how the parts of a mission connect."},
+        {"category": "Industrial Design", "description": "Form that serves the person using it."},
+        {"category": "Deep Work", "description": "Protecting the attention meaningful work needs."},
+        {"category": "Stoicism", "description": "Calm in the face of what you can't control."},
+        {"category": "Human-Computer Interaction", "description": "Technology shaped around people."},
+    ],
+}
+
+# Ways a real LM's suggestions_json goes wrong, injected by StubLM(malformed_fraction=...)
+SUGGESTION_FAULTS = ("fenced", "trailing_comma", "truncated", "unmarked", "prose")
+
+
+# --- Stub Language Model ---
+
+class StubLM(dspy.BaseLM):
+    """
+    A dspy LM that sleeps for `latency` seconds and answers every output field
+    the service's signatures use. The sync path blocks the calling thread, the
+    async path only suspends the coroutine, exactly like a real network call.
+    Under dspy.streamify the async path emits the completion in chunks, with
+    the first one arriving after `ttft_fraction` of the latency.
+
+    `slow_fraction` of calls, drawn from a seeded generator, take
+    `slow_latency` instead, to inject the long tail a provider shows under load.
+    A curation call takes `item_latency` longer per content item it asks for,
+    since a real completion's duration grows with its length. Every call
+    takes `prompt_latency` longer per 1000 prompt tokens, for prefill.
+
+    `malformed_fraction` of the suggestions it writes, also seeded, get one
+    of SUGGESTION_FAULTS: a preamble and ``` fence, trailing commas, a
+    completion cut off by the token limit, JSON without the adapter's field
+    markers, or prose instead of JSON (drawn from `fault_kinds`). `faults`
+    counts them.
+
+    With `response_cache`, answers are reused for identical prompts the way
+    dspy.LM's cache=True reuses them, faults included, unless the call passes
+    cache=False or a new rollout_id. `cache_hits` counts the reuses.
+    """
+
+    def __init__(self, latency: float = 0.5, completion_words: int = 40, ttft_fraction: float = 0.2,
+                 slow_fraction: float = 0.0, slow_latency: float = 0.0, model: str = "stub/gpt-4o", seed: int = 3,
+                 item_latency: float = 0.0, malformed_fraction: float = 0.0, prompt_latency: float = 0.0,
+                 response_cache: bool = False):
+        super().__init__(model=model, cache=False)
+        self.response_cache = response_cache
+        self._responses: Dict[str, Any] = {}
+        self.cache_hits = 0
+        self.latency = latency
+        self.ttft_fraction = ttft_fraction
+        self.completion_words = completion_words
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.item_latency = item_latency
+        self.prompt_latency = prompt_latency
+        self.malformed_fraction = malformed_fraction
+        self.fault_kinds = SUGGESTION_FAULTS
+        self.faults: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.slow_calls = 0
+
+    def _latency(self) -> float:
+        # Counted when a call starts, so calls cancelled before they finish show too
+        self.calls += 1
+        if self.slow_fraction and self._rng.random() < self.slow_fraction:
+            self.slow_calls += 1
+            return self.slow_latency
+        return self.latency
+
+    def _call_latency(self, messages) -> float:
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in (messages or [])) // 4
+        return (self._latency() + self.item_latency * self._requested_items(messages)
+                + self.prompt_latency * prompt_tokens / 1000)
+
+    @staticmethod
+    def _requested_items(messages: Optional[List[Dict[str, Any]]]) -> int:
+        """The content items a curation prompt asks for, 0 for any other prompt."""
+        last_message = str((messages or [{}])[-1].get("content", ""))
+        match = re.search(r"\[\[ ## count ## \]\]\s*(\d+)", last_message)
+        return int(match.group(1)) if match else 0
+
+    def _completion(self, messages: Optional[List[Dict[str, Any]]]) -> str:
+        body = " ".join(["insight"] * self.completion_words)
+        # Multi-question prompts number their questions; answer each of them
+        last_message = str((messages or [{}])[-1].get("content", ""))
+        questions = len(re.findall(r"^Question \d+:", last_message, flags=re.MULTILINE)) or 1
+        curated = {
+            "content": [
+                {"type": "quote", "content": f"Insight {i}: {body}", "source": "Ada Lovelace",
+                 "category": "Systems Thinking", "relevance_reason": "Builds toward the mission."}
+                for i in range(self._requested_items(messages))
+            ],
+            "categories": ["Systems Thinking"],
+        }
+        fields = {
+            "reasoning": "Considered the provided context step by step.",
+            "answer": body,
+            "answers": json.dumps([body] * questions),
+            "response": body,
+            "summary": "The user has been discussing their goals and plans.",
+            "mission": "Build products that meaningfully help people",
+            "suggestions_json": json.dumps(STUB_SUGGESTIONS),
+            "content_json": json.dumps(curated),
+        }
+        # Only the fields the prompt asks for, in the order the stub lists them
+        prompt = " ".join(str(m.get("content", "")) for m in (messages or []))
+        fields = {name: value for name, value in fields.items() if f"[[ ## {name} ## ]]" in prompt} or fields
+        fault = None
+        if "suggestions_json" in fields and self.malformed_fraction and self._rng.random() < self.malformed_fraction:
+            fault = self._rng.choice(self.fault_kinds)
+            self.faults[fault] = self.faults.get(fault, 0) + 1
+            fields["suggestions_json"] = self._malformed(fields["suggestions_json"], fault)
+        if fault == "unmarked":
+            return fields["suggestions_json"]
+        sections = [f"[[ ## {name} ## ]]\n{value}" for name, value in fields.items()]
+        text = "\n\n".join(sections + ["[[ ## completed ## ]]"])
+        if fault == "truncated":
+            # Stopped by the token limit partway through the interests
+            return text[:int(len(text) * 0.8)]
+        return text
+
+    @staticmethod
+    def _malformed(value: str, fault: str) -> str:
+        if fault == "fenced":
+            return f"Here are some suggestions based on your mission:\n```json\n{value}\n```"
+        if fault == "trailing_comma":
+            return value.replace("}]", "},]")
+        if fault == "prose":
+            return "You might look to Ada Lovelace and Dieter Rams, and explore systems thinking and design."
+        return value
+
+    def _response(self, messages):
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in (messages or []))
+        text = self._completion(messages)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text), finish_reason="stop")],
+            usage={
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(text) // 4,
+                "total_tokens": (prompt_chars + len(text)) // 4,
+            },
+            model=self.model,
+        )
+
+    def _cache_key(self, messages, kwargs) -> Optional[str]:
+        if not self.response_cache or kwargs.get("cache") is False:
+            return None
+        return json.dumps([messages, kwargs.get("rollout_id")], sort_keys=True, default=str)
+
+    def _cached(self, key: Optional[str]):
+        response = self._responses.get(key) if key is not None else None
+        if response is not None:
+            self.cache_hits += 1
+        return response
+
+    def _remember(self, key: Optional[str], response):
+        if key is not None:
+            self._responses[key] = response
+        return response
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        key = self._cache_key(messages, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        time.sleep(self._call_latency(messages))
+        return self._remember(key, self._response(messages))
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        key = self._cache_key(messages, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            # Like dspy's cache, a cached answer comes back whole, even under streamify
+            return cached
+        latency = self._call_latency(messages)
+        stream = dspy.settings.send_stream
+        if stream is None:
+            await asyncio.sleep(latency)
+            return self._remember(key, self._response(messages))
+
+        from litellm import ModelResponseStream
+        from litellm.types.utils import Delta, StreamingChoices
+
+        response = self._remember(key, self._response(messages))
+        text = response.choices[0].message.content
+        chunks = [text[i:i + 16] for i in range(0, len(text), 16)]
+        predict_id = id(dspy.settings.caller_predict) if dspy.settings.caller_predict else None
+
+        await asyncio.sleep(latency * self.ttft_fraction)
+        for chunk_text in chunks:
+            chunk = ModelResponseStream(choices=[StreamingChoices(delta=Delta(content=chunk_text))])
+            chunk.predict_id = predict_id
+            await stream.send(chunk)
+            await asyncio.sleep(latency * (1 - self.ttft_fraction) / len(chunks))
+        return response
+
+
+# --- Stub Embeddings API ---
+
+@lru_cache(maxsize=4096)
+def _token_vector(token: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(token.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """
+    Returns a deterministic unit vector: the normalized sum of per-word random
+    vectors. Texts that share words therefore have a higher cosine similarity,
+    which keeps thresholds and rankings meaningful in benchmarks.
+    """
+    tokens = "".join(c.lower() if c.isalnum() else " " for c in text).split() or [""]
+    vector = np.sum([_token_vector(token, dim) for token in tokens], axis=0)
+    vector /= np.linalg.norm(vector)
+    return vector.tolist()
+
+
+def _api_error(error_class, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+    import httpx
+
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    return error_class(message, response=httpx.Response(status, headers=headers, request=request), body=None)
+
+
+class _FakeEmbeddingsResource:
+    def __init__(self, owner: "FakeAsyncOpenAI"):
+        self.owner = owner
+
+    async def create(self, input, model, **kwargs):
+        import openai
+
+        texts = [input] if isinstance(input, str) else list(input)
+        owner = self.owner
+        owner.calls += 1
+        if owner.requests_per_second:
+            now = time.monotonic()
+            owner._window = [t for t in owner._window if now - t < 1.0]
+            if len(owner._window) >= owner.requests_per_second:
+                owner.rate_limited += 1
+                raise _api_error(openai.RateLimitError, 429, "Rate limit reached", {"retry-after-ms": "250"})
+            owner._window.append(now)
+        await asyncio.sleep(owner.latency)
+        if owner.reject_marker and any(owner.reject_marker in text for text in texts):
+            raise _api_error(openai.BadRequestError, 400, "Invalid input")
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=fake_embedding(text)) for i, text in enumerate(texts)],
+            model=model,
+        )
+
+
+class FakeAsyncOpenAI:
+    """
+    Mimics `openai.AsyncOpenAI().embeddings.create`. Optionally answers 429
+    above `requests_per_second`, and 400 for any batch containing
+    `reject_marker`, like a request with one malformed input.
+    """
+
+    def __init__(self, latency: float = 0.05, requests_per_second: int = 0, reject_marker: Optional[str] = None):
+        self.latency = latency
+        self.requests_per_second = requests_per_second
+        self.reject_marker = reject_marker
+        self.calls = 0
+        self.rate_limited = 0
+        self._window: List[float] = []
+        self.embeddings = _FakeEmbeddingsResource(self)
+
+    def with_options(self, **kwargs) -> "FakeAsyncOpenAI":
+        return self
+
+
+# --- Stub Supabase ---
+
+class _FakeQuery:
+    """
+    Supports the subset of the postgrest query builder the service uses:
+    select, update or insert / eq / is_ / not_ / gt / in_ / order / limit, then `await execute()`.
+    """
+
+    def __init__(self, owner: "FakeAsyncSupabase", table: str):
+        self.owner = owner
+        self.table = table
+        self._columns: Optional[List[str]] = None
+        self._filters = []
+        self._negate_next = False
+        self._order: Optional[str] = None
+        self._limit: Optional[int] = None
+        self._update: Optional[Dict[str, Any]] = None
+        self._insert: Optional[List[Dict[str, Any]]] = None
+
+    def select(self, columns: str, **kwargs):
+        self._columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self._update = dict(values)
+        return self
+
+    def insert(self, rows):
+        self._insert = [dict(row) for row in (rows if isinstance(rows, list) else [rows])]
+        return self
+
+    @property
+    def not_(self):
+        self._negate_next = True
+        return self
+
+    def _where(self, predicate):
+        if self._negate_next:
+            self._negate_next = False
+            self._filters.append(lambda row: not predicate(row))
+        else:
+            self._filters.append(predicate)
+        return self
+
+    def eq(self, column, value):
+        return self._where(lambda row: row.get(column) == value)
+
+    def is_(self, column, value):
+        return self._where(lambda row: row.get(column) is None if value == "null" else row.get(column) == value)
+
+    def gt(self, column, value):
+        return self._where(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._where(lambda row: row.get(column) in values)
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    async def execute(self):
+        self.owner.queries += 1
+        await asyncio.sleep(self.owner.latency)
+        if self._insert is not None:
+            rows = [self.owner.insert_row(self.table, row) for row in self._insert]
+            return SimpleNamespace(data=[dict(row) for row in rows], count=len(rows))
+        rows = [row for row in self.owner.tables.get(self.table, []) if all(f(row) for f in self._filters)]
+        if self._update is not None:
+            for row in rows:
+                row.update(self._update)
+            return SimpleNamespace(data=[dict(row) for row in rows], count=len(rows))
+        if self._order:
+            column, desc = self._order
+            rows.sort(key=lambda row: row.get(column), reverse=desc)
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        if self._columns:
+            rows = [{c: row.get(c) for c in self._columns} for row in rows]
+        # PostgREST serializes pgvector columns as strings
+        rows = [{k: json.dumps(v) if k == "embedding" and v is not None else v for k, v in row.items()} for row in rows]
+        return SimpleNamespace(data=rows, count=len(rows))
+
+
+class _FakeRPC:
+    def __init__(self, owner: "FakeAsyncSupabase", name: str, params: Dict[str, Any]):
+        self.owner = owner
+        self.name = name
+        self.params = params
+
+    async def execute(self):
+        self.owner.queries += 1
+        await asyncio.sleep(self.owner.latency)
+        if self.name not in FakeAsyncSupabase.RPCS:
+            raise ValueError(f"Unknown RPC: {self.name}")
+        return SimpleNamespace(data=getattr(self.owner, self.name)(**self.params))
+
+
+class FakeAsyncSupabase:
+    """
+    In-memory `muse_items`, `ai_processing_jobs`, `user_missions` and
+    `ai_messages` tables plus the RPCs the service calls, with the same parameters and result shapes as the
+    Postgres functions: a brute-force `match_muse_items`, its compact
+    coarse-then-rescore variant and the embedding job queue functions.
+    """
+
+    RPCS = (
+        "match_muse_items", "match_muse_items_compact", "claim_ai_jobs", "renew_ai_jobs", "fail_ai_jobs",
+        "set_item_embeddings",
+    )
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.items: List[Dict[str, Any]] = []
+        self.jobs: List[Dict[str, Any]] = []
+        self.tables: Dict[str, List[Dict[str, Any]]] = {
+            "muse_items": self.items, "ai_processing_jobs": self.jobs, "user_missions": [], "ai_messages": [],
+        }
+        # Table queries and RPCs executed, to count the round-trips a request makes
+        self.queries = 0
+
+    def seed(self, user_id: str, count: int, conversation_turns: int = 20):
+        """
+        Adds `count` synthetic items for the given user, their mission and a
+        conversation "conv-<user_id>" of `conversation_turns` messages.
+        """
+        import datetime
+
+        start = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+        self.tables["user_missions"].append({"user_id": user_id, "mission_statement": "Build calm software"})
+        for i in range(conversation_turns):
+            self.tables["ai_messages"].append({
+                "id": f"conv-{user_id}-message-{i}", "conversation_id": f"conv-{user_id}",
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"Message {i} about what to focus on next.",
+                "created_at": (start + datetime.timedelta(minutes=i)).isoformat(),
+            })
+        for i in range(count):
+            content = f"Synthetic note {i} about focus, craft and building things for user {user_id}."
+            self.items.append({
+                "id": f"{user_id}-item-{i}",
+                "user_id": user_id,
+                "content": content,
+                "content_type": "text",
+                "description": f"Generated item {i}",
+                "ai_categories": ["focus"] if i % 2 else ["craft"],
+                "created_at": (start + datetime.timedelta(hours=i)).isoformat(),
+                "deleted_at": None,
+                "embedding": fake_embedding(content),
+            })
+
+    def _searchable(self, user_id: str) -> List[Dict[str, Any]]:
+        return [
+            item for item in self.items
+            if item["user_id"] == user_id and item["deleted_at"] is None and item["embedding"] is not None
+        ]
+
+    @staticmethod
+    def _rank(query_embedding, items, match_threshold, match_count):
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scored = []
+        for item in items:
+            similarity = float(np.dot(query, np.asarray(item["embedding"], dtype=np.float32)))
+            if similarity >= match_threshold:
+                scored.append((similarity, item))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [
+            {k: v for k, v in item.items() if k not in ("embedding", "deleted_at")} | {"similarity": score}
+            for score, item in scored[:match_count]
+        ]
+
+    def match_muse_items(self, query_embedding, match_threshold, match_count, p_user_id):
+        return self._rank(query_embedding, self._searchable(p_user_id), match_threshold, match_count)
+
+    def match_muse_items_compact(self, query_embedding, match_threshold, match_count, p_user_id, p_rescore_count=40):
+        candidates = self._searchable(p_user_id)
+        if not candidates:
+            return []
+        # The generated embedding_compact column: sign bits of the first 512 components
+        codec = CompactCodec(dims=512, scheme="binary")
+        codes, _ = codec.encode(np.asarray([item["embedding"] for item in candidates], dtype=np.float32))
+        hamming = -codec.scores([query_embedding], codes, None)[0]
+        shortlist = np.argsort(hamming, kind="stable")[:max(p_rescore_count, match_count)]
+        return self._rank(query_embedding, [candidates[i] for i in shortlist], match_threshold, match_count)
+
+    def insert_row(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Adds a row with the column defaults Postgres would fill in, and runs the muse_items insert trigger."""
+        import datetime
+
+        row = {"id": str(uuid.uuid4()), "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(), **row}
+        if table == "muse_items":
+            row = {"deleted_at": None, "embedding": None, "ai_categories": [], "description": None, **row}
+        elif table == "ai_processing_jobs":
+            row = {"status": "pending", "attempts": 0, "available_at": time.time(), "locked_at": None,
+                   "error_message": None, "completed_at": None, "input_data": None, "result_data": None,
+                   "item_id": None, **row}
+        self.tables.setdefault(table, []).append(row)
+        if table == "muse_items":
+            self.enqueue_embedding_job(row)
+        return row
+
+    def enqueue_embedding_job(self, item: Dict[str, Any]):
+        """What the muse_items insert trigger does."""
+        self.jobs.append({
+            "id": f"job-{len(self.jobs)}", "job_type": "embedding", "item_id": item["id"], "user_id": item["user_id"],
+            "status": "pending", "attempts": 0, "available_at": time.time(), "locked_at": None,
+            "error_message": None, "completed_at": None, "created_at": time.time(),
+        })
+
+    def claim_ai_jobs(self, p_job_type, p_limit, p_lease_seconds=300):
+        now = time.time()
+        claimed = []
+        for job in self.jobs:
+            if len(claimed) >= p_limit:
+                break
+            due = job["status"] == "pending" and _epoch(job["available_at"]) <= now
+            expired = job["status"] == "processing" and job["locked_at"] < now - p_lease_seconds
+            if job["job_type"] == p_job_type and (due or expired):
+                job.update(status="processing", locked_at=now, attempts=job["attempts"] + 1)
+                claimed.append(dict(job))
+        return claimed
+
+    def renew_ai_jobs(self, p_ids):
+        ids = set(p_ids)
+        now = time.time()
+        renewed = 0
+        for job in self.jobs:
+            if job["id"] in ids and job["status"] == "processing":
+                job["locked_at"] = now
+                renewed += 1
+        return renewed
+
+    def fail_ai_jobs(self, p_ids, p_error, p_max_attempts, p_backoff_seconds=10):
+        ids = set(p_ids)
+        by_id = {item["id"]: item for item in self.items}
+        for job in self.jobs:
+            if job["id"] not in ids:
+                continue
+            dead = job["attempts"] >= p_max_attempts
+            job.update(
+                status="failed" if dead else "pending", locked_at=None, error_message=p_error,
+                available_at=time.time() + p_backoff_seconds * 2 ** max(job["attempts"] - 1, 0),
+            )
+            if dead and job["item_id"] in by_id:
+                by_id[job["item_id"]]["ai_status"] = "failed"
+
+    def set_item_embeddings(self, p_items):
+        by_id = {item["id"]: item for item in self.items}
+        updated = 0
+        for row in p_items:
+            item = by_id.get(row["id"])
+            if item is not None:
+                item.update(embedding=row["embedding"], ai_status="completed")
+                updated += 1
+        return updated
+
+    def from_(self, table: str) -> _FakeQuery:
+        return _FakeQuery(self, table)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> _FakeRPC:
+        return _FakeRPC(self, name, params)
+
+
+def _epoch(value) -> float:
+    # Timestamps written by the service arrive as ISO strings
+    if isinstance(value, str):
+        import datetime
+        return datetime.datetime.fromisoformat(value).timestamp()
+    return value
+
+
+# --- Wiring ---
+
+def install_stubs(lm_latency: float = 0.5, embed_latency: float = 0.05, db_latency: float = 0.02,
+                  seed_users: int = 4, items_per_user: int = 50, completion_words: int = 40,
+                  lm_slow_fraction: float = 0.0, lm_slow_latency: float = 0.0, fallback_lm_latency: Optional[float] = None,
+                  lm_item_latency: float = 0.0, lm_malformed_fraction: float = 0.0):
+    """
+    Points the service at the stubs by overriding its lazily built clients.
+    DSPy itself is configured with the stub LM when the service first needs it.
+    The fallback LM answers in `fallback_lm_latency` (a quarter of the main
+    LM's by default) and has no slow tail or malformed output.
+    """
+    from core.config import services
+
+    lm = StubLM(latency=lm_latency, completion_words=completion_words,
+                slow_fraction=lm_slow_fraction, slow_latency=lm_slow_latency, item_latency=lm_item_latency,
+                malformed_fraction=lm_malformed_fraction)
+    fallback_lm = StubLM(latency=lm_latency / 4 if fallback_lm_latency is None else fallback_lm_latency,
+                         completion_words=completion_words, model="stub/gpt-4o-mini")
+    embeddings = FakeAsyncOpenAI(latency=embed_latency)
+    db = FakeAsyncSupabase(latency=db_latency)
+    for u in range(seed_users):
+        db.seed(f"user-{u}", items_per_user)
+
+    services.override(lm=lm, fallback_lm=fallback_lm, async_openai=embeddings, async_supabase=db)
+
+    return SimpleNamespace(lm=lm, fallback_lm=fallback_lm, embeddings=embeddings, db=db)
@@ -0,0 +1,136 @@
+# museboard-ai-service/benchmarks/tail_latency_benchmark.py
+
+"""
+Tail latency of an LM endpoint under injected provider delays, with and
+without the LM deadlines (core/deadlines.py).
+
+The stub LM answers in --lm-latency, except for --slow-fraction of calls,
+which take --slow-latency: the long tail a provider shows under load. The
+fallback LM answers in --fallback-latency. Each configuration runs against
+the same in-process server with a fresh latency history:
+
+  none        no budget and no hedging: a slow call is waited out
+  hedge       a duplicate call after the recent p95, no budget
+  deadline    the --budget latency budget, falling back to the fast path
+  both        budget, fallbacks and hedging together
+
+Reported per configuration: latency percentiles, failed requests, the
+responses by path (the X-Museboard-Path header), LM calls made on each model
+and the hedges sent. A warm-up round before each measurement fills the
+latency history the hedge delay and fallback reserve are taken from.
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.tail_latency_benchmark --endpoint chat --slow-fraction 0.05 --slow-latency 3
+"""
+
+import argparse
+import asyncio
+import collections
+import time
+
+from benchmarks.load_test import ENDPOINTS, free_port, percentile
+from benchmarks.stubs import install_stubs
+
+# name -> (deadlines enabled, hedging enabled)
+CONFIGURATIONS = {
+    "none": (False, False),
+    "hedge": (False, True),
+    "deadline": (True, False),
+    "both": (True, True),
+}
+
+
+async def measure(client, endpoint: str, concurrency: int, requests_per_client: int, first_id: int):
+    from core.deadlines import PATH_HEADER
+
+    method, path, make_body = ENDPOINTS[endpoint]
+    latencies = []
+    paths = collections.Counter()
+    errors = 0
+
+    async def worker(offset: int):
+        nonlocal errors
+        for i in range(requests_per_client):
+            body = make_body(first_id + offset * requests_per_client + i)
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+            paths[response.headers.get(PATH_HEADER, "-")] += 1
+
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    return latencies, paths, errors
+
+
+async def main(args, stubs):
+    import httpx
+    import uvicorn
+    from core.config import lm_deadlines
+    from core.deadlines import LatencyTracker
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=free_port(), log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    lm_deadlines.budgets[args.endpoint] = args.budget
+    lm_deadlines.fallback_reserve = args.reserve
+    print(f"{args.endpoint}: LM {args.lm_latency * 1000:.0f}ms, {args.slow_fraction:.0%} of calls "
+          f"{args.slow_latency * 1000:.0f}ms, fallback LM {args.fallback_latency * 1000:.0f}ms, "
+          f"budget {args.budget * 1000:.0f}ms (reserve {args.reserve * 1000:.0f}ms), concurrency {args.concurrency}\n")
+    print(f"{'config':<10}{'reqs':>6}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'lm calls':>10}{'fallback':>10}{'hedges':>8}  paths")
+
+    next_id = 0
+    port = server.config.port
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.05)
+        for name in args.configs:
+            lm_deadlines.enabled, lm_deadlines.hedge = CONFIGURATIONS[name]
+            lm_deadlines.tracker = LatencyTracker()
+            await measure(client, args.endpoint, args.concurrency, args.warmup_per_client, next_id)
+            next_id += args.concurrency * args.warmup_per_client
+
+            lm_calls, fallback_calls, hedges = stubs.lm.calls, stubs.fallback_lm.calls, lm_deadlines.hedges
+            latencies, paths, errors = await measure(
+                client, args.endpoint, args.concurrency, args.requests_per_client, next_id,
+            )
+            next_id += args.concurrency * args.requests_per_client
+            summary = " ".join(f"{path}={count}" for path, count in sorted(paths.items()))
+            print(f"{name:<10}{len(latencies):>6}{errors:>8}{percentile(latencies, 50):>9.0f}"
+                  f"{percentile(latencies, 95):>9.0f}{percentile(latencies, 99):>9.0f}{max(latencies) * 1000:>9.0f}"
+                  f"{stubs.lm.calls - lm_calls:>10}{stubs.fallback_lm.calls - fallback_calls:>10}"
+                  f"{lm_deadlines.hedges - hedges:>8}  {summary}")
+
+    server.should_exit = True
+    await serve_task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", default="chat", choices=["chat", "search", "mission_enhance", "suggestions"])
+    parser.add_argument("--config", dest="configs", action="append", choices=sorted(CONFIGURATIONS),
+                        help="Configuration to run (repeatable). Defaults to all.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests-per-client", type=int, default=50)
+    parser.add_argument("--warmup-per-client", type=int, default=5)
+    parser.add_argument("--lm-latency", type=float, default=0.2)
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--fallback-latency", type=float, default=0.08)
+    parser.add_argument("--budget", type=float, default=1.0, help="Latency budget for the endpoint, in seconds.")
+    parser.add_argument("--reserve", type=float, default=0.25,
+                        help="Least time, in seconds, kept for the fallback path.")
+    args = parser.parse_args()
+    args.configs = args.configs or list(CONFIGURATIONS)
+
+    stubs = install_stubs(
+        lm_latency=args.lm_latency, embed_latency=0.005, db_latency=0.002,
+        lm_slow_fraction=args.slow_fraction, lm_slow_latency=args.slow_latency,
+        fallback_lm_latency=args.fallback_latency,
+    )
+    asyncio.run(main(args, stubs))
@@ -0,0 +1,142 @@
+# museboard-ai-service/benchmarks/vector_index_benchmark.py
+
+"""
+Compares retrieval latency of the in-process vector index against the
+match_muse_items RPC path on a synthetic corpus.
+
+The RPC path is measured through the stub Supabase client by default: an
+exact scan of the same corpus plus `--rpc-latency-ms` of simulated network
+round-trip. Pass --live-user-id to time the real RPC instead (requires
+SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY and a user with embedded items).
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.vector_index_benchmark --items 100000 --queries 200
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from benchmarks.stubs import FakeAsyncSupabase
+from core.vector_index import UserVectorIndex
+
+USER_ID = "bench-user"
+
+
+def percentile(samples, q):
+    return float(np.percentile(np.asarray(samples) * 1000, q))
+
+
+def synthetic_corpus(items: int, dim: int, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    matrix = np.empty((items, dim), dtype=np.float32)
+    # Generated in chunks to keep peak memory near the size of the final matrix
+    for start in range(0, items, 10_000):
+        chunk = rng.standard_normal((min(10_000, items - start), dim)).astype(np.float32)
+        matrix[start:start + len(chunk)] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    return matrix
+
+
+def make_queries(corpus: np.ndarray, count: int, seed: int = 11) -> np.ndarray:
+    # Perturbed copies of corpus rows, so every query has genuine near neighbours
+    rng = np.random.default_rng(seed)
+    rows = corpus[rng.integers(0, len(corpus), count)]
+    queries = rows + 0.5 * rng.standard_normal(rows.shape).astype(np.float32) / np.sqrt(corpus.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def bench_local(corpus, queries, k, threshold):
+    items = [{"id": f"item-{i}", "user_id": USER_ID, "content_type": "text"} for i in range(len(corpus))]
+    index = UserVectorIndex(dim=corpus.shape[1], capacity=len(corpus))
+    started = time.perf_counter()
+    index.bulk_load(items, corpus)
+    load_seconds = time.perf_counter() - started
+
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, k, threshold)
+        samples.append(time.perf_counter() - started)
+    return samples, load_seconds, index.nbytes
+
+
+async def bench_stub_rpc(corpus, queries, k, threshold, rpc_latency):
+    db = FakeAsyncSupabase(latency=rpc_latency)
+    # An exact, vectorized scan of the same corpus stands in for pgvector, so
+    # the stub measures the round-trip cost rather than Python loops.
+    db.match_muse_items = lambda query_embedding, match_threshold, match_count, p_user_id: (
+        _exact_top_k(corpus, np.asarray(query_embedding, dtype=np.float32), match_count, match_threshold)
+    )
+
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        await db.rpc("match_muse_items", {
+            "query_embedding": query.tolist(), "match_threshold": threshold, "match_count": k, "p_user_id": USER_ID,
+        }).execute()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _exact_top_k(corpus, query, k, threshold):
+    scores = corpus @ query
+    top = np.argsort(-scores)[:k]
+    return [{"id": f"item-{i}", "similarity": float(scores[i])} for i in top if scores[i] >= threshold]
+
+
+async def bench_live_rpc(user_id, dim, queries_count, k, threshold):
+    from core.config import services
+
+    client = await services.aget("async_supabase")
+    rng = np.random.default_rng(3)
+    samples = []
+    for _ in range(queries_count):
+        query = rng.standard_normal(dim).astype(np.float32)
+        query /= np.linalg.norm(query)
+        started = time.perf_counter()
+        await client.rpc("match_muse_items", {
+            "query_embedding": query.tolist(), "match_threshold": threshold, "match_count": k, "p_user_id": user_id,
+        }).execute()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(name, samples):
+    print(f"{name:<28}{percentile(samples, 50):>10.2f}{percentile(samples, 99):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.70)
+    parser.add_argument("--rpc-latency-ms", type=float, default=40.0,
+                        help="Simulated network round-trip for the stub RPC path.")
+    parser.add_argument("--live-user-id", help="Time the real match_muse_items RPC for this user instead of the stub.")
+    args = parser.parse_args()
+
+    print(f"Building synthetic corpus: {args.items} items x {args.dim} dims...")
+    corpus = synthetic_corpus(args.items, args.dim)
+    queries = make_queries(corpus, args.queries)
+
+    local_samples, load_seconds, nbytes = bench_local(corpus, queries, args.k, args.threshold)
+    print(f"Local index: loaded in {load_seconds:.2f}s, {nbytes / 1024 / 1024:.0f} MiB")
+
+    if args.live_user_id:
+        rpc_name = "match_muse_items (live)"
+        rpc_samples = asyncio.run(bench_live_rpc(args.live_user_id, args.dim, args.queries, args.k, args.threshold))
+    else:
+        rpc_name = "match_muse_items (stub)"
+        rpc_samples = asyncio.run(bench_stub_rpc(corpus, queries, args.k, args.threshold, args.rpc_latency_ms / 1000))
+
+    print(f"\n{'path':<28}{'p50 ms':>10}{'p99 ms':>10}")
+    report("local index", local_samples)
+    report(rpc_name, rpc_samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# museboard-ai-service/benchmarks/worker_scaling_benchmark.py
+
+"""
+Throughput of the multi-worker serving mode (serve.py) as workers are added,
+against the stub LM, embeddings and Supabase (benchmarks/stub_app.py).
+
+  scaling     req/s and latency of one endpoint at a fixed concurrency for
+              each worker count. With a short stub LM latency the time per
+              request is mostly the service's own CPU work, the part that one
+              process can't spread over several cores. Expect near-linear
+              scaling until workers reach the number of cores, and nothing
+              beyond (this process generating the load needs a core too).
+  shared      mission enhancement requests drawn from a few distinct
+              missions, with and without the shared cache tier. Without it
+              each worker calls the LM once per mission; with it, about once
+              in total (two workers that get the same new mission at the
+              same moment both call the LM).
+  recycling   the same load with and without --max-requests set low, so
+              workers are recycled under load; counts failed requests and the
+              workers replaced during the run. A replacement loads DSPy
+              before it takes traffic, which competes with the serving
+              workers for CPU when there are no spare cores.
+
+Usage (from museboard-ai-service/):
+    python -m benchmarks.worker_scaling_benchmark --workers 1,2,4 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.load_test import free_port, run_level
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Server:
+    """serve.py running the stub app in a subprocess."""
+
+    def __init__(self, workers: int, args, shared: bool = True, max_requests: int = 0):
+        self.workers = workers
+        self.port = free_port()
+        self.tmp = tempfile.TemporaryDirectory()
+        env = {
+            **os.environ,
+            "STUB_LM_LATENCY": str(args.lm_latency),
+            "STUB_EMBED_LATENCY": str(args.embed_latency),
+            "STUB_DB_LATENCY": str(args.db_latency),
+            "LOG_LEVEL": "WARNING",
+            "SHARED_CACHE_PATH": os.path.join(self.tmp.name, "shared.sqlite") if shared else "",
+            "EMBEDDING_CACHE_PATH": os.path.join(self.tmp.name, "embeddings.sqlite") if shared else "",
+        }
+        command = [
+            sys.executable, "serve.py", "--app", "benchmarks.stub_app:app", "--host", "127.0.0.1",
+            "--port", str(self.port), "--workers", str(workers), "--max-requests", str(max_requests),
+            # Jitter keeps the workers from reaching their limit, and restarting, together
+            "--max-requests-jitter", str(max_requests), "--log-level", "warning",
+        ]
+        self.process = subprocess.Popen(command, cwd=SERVICE_DIR, env=env)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def wait_until_ready(self, timeout: float = 180.0):
+        """Waits until /ready has answered 200 several times in a row, from fresh connections (so from each worker)."""
+        import httpx
+
+        started = time.perf_counter()
+        streak = 0
+        while streak < 4 * self.workers:
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"serve.py with {self.workers} workers not ready after {timeout}s")
+            try:
+                async with httpx.AsyncClient(base_url=self.url) as client:
+                    streak = streak + 1 if (await client.get("/ready")).status_code == 200 else 0
+            except httpx.TransportError:
+                streak = 0
+            if not streak:
+                await asyncio.sleep(0.1)
+
+    async def worker_stats(self, attempts: int = 200):
+        """Cache stats from as many workers as answer within `attempts` fresh connections, by worker pid."""
+        import httpx
+
+        stats = {}
+        for _ in range(attempts):
+            # A worker may be slow to answer while a recycled one is loading next to it
+            async with httpx.AsyncClient(base_url=self.url, timeout=60) as client:
+                body = (await client.get("/api/v1/stats/cache")).json()
+            stats[body["worker"]["pid"]] = body
+            if len(stats) >= self.workers:
+                break
+        return stats
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(timeout=60)
+        self.tmp.cleanup()
+
+
+async def load(server: Server, endpoint: str, concurrency: int, requests_per_client: int, distinct_inputs: int = 0,
+               keep_alive: bool = True):
+    import httpx
+
+    # Without keep-alive every request is a new connection, which any worker may accept
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=None if keep_alive else 0)
+    async with httpx.AsyncClient(base_url=server.url, timeout=None, limits=limits) as client:
+        return await run_level(client, endpoint, concurrency, requests_per_client, distinct_inputs)
+
+
+async def scaling(args):
+    print(f"Scaling: {args.endpoint}, concurrency {args.concurrency}, stub LM {args.lm_latency * 1000:.0f}ms, "
+          f"{os.cpu_count()} cores\n")
+    print(f"{'workers':>8}{'reqs':>7}{'errors':>8}{'req/s':>10}{'speedup':>9}{'p50 ms':>10}{'p99 ms':>10}")
+    baseline = None
+    for workers in args.workers:
+        server = Server(workers, args)
+        try:
+            await server.wait_until_ready()
+            await load(server, args.endpoint, args.concurrency, 1)
+            result = await load(server, args.endpoint, args.concurrency, args.requests_per_client)
+        finally:
+            server.stop()
+        baseline = baseline or result["throughput"]
+        print(f"{workers:>8}{result['requests']:>7}{result['errors']:>8}{result['throughput']:>10.1f}"
+              f"{result['throughput'] / baseline:>8.2f}x{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}")
+
+
+async def shared_tier(args):
+    workers = max(args.workers)
+    print(f"\nShared cache: {workers} workers, mission_enhance over {args.distinct_inputs} distinct missions, "
+          f"concurrency {args.shared_concurrency}\n")
+    print(f"{'shared tier':<14}{'reqs':>7}{'lm calls':>10}{'shared hits':>13}{'workers seen':>14}")
+    for shared in (False, True):
+        server = Server(workers, args, shared=shared)
+        try:
+            await server.wait_until_ready()
+            result = await load(server, "mission_enhance", args.shared_concurrency, args.shared_requests_per_client,
+                                args.distinct_inputs, keep_alive=False)
+            stats = await server.worker_stats()
+        finally:
+            server.stop()
+        # Every local miss is one LM call
+        lm_calls = sum(body["mission_enhance"]["misses"] for body in stats.values())
+        shared_hits = sum(body["mission_enhance"]["shared_hits"] for body in stats.values())
+        print(f"{'on' if shared else 'off':<14}{result['requests']:>7}{lm_calls:>10}{shared_hits:>13}"
+              f"{len(stats):>14}")
+
+
+async def recycling(args):
+    workers = max(max(args.workers), 2)
+    print(f"\nRecycling: {workers} workers, {args.endpoint}, concurrency {args.recycle_concurrency}\n")
+    print(f"{'recycle after':<16}{'reqs':>7}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'replaced':>10}")
+    for max_requests in (0, args.recycle_after):
+        server = Server(workers, args, max_requests=max_requests)
+        try:
+            await server.wait_until_ready()
+            before = set(await server.worker_stats())
+            result = await load(server, args.endpoint, args.recycle_concurrency, args.requests_per_client * 4)
+            # A recycled worker comes back with a new pid
+            after = set(await server.worker_stats())
+        finally:
+            server.stop()
+        print(f"{max_requests or 'never':<16}{result['requests']:>7}{result['errors']:>8}{result['throughput']:>10.1f}"
+              f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}{len(after - before):>10}")
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2} | {n for n in (4, 8, 16) if n <= cores})
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=lambda s: [int(w) for w in s.split(",")], default=default_workers)
+    parser.add_argument("--endpoint", default="chat")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests-per-client", type=int, default=8)
+    parser.add_argument("--lm-latency", type=float, default=0.02)
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--db-latency", type=float, default=0.002)
+    parser.add_argument("--distinct-inputs", type=int, default=20)
+    # Low enough that most repeats of a mission arrive after its first answer
+    parser.add_argument("--shared-concurrency", type=int, default=4)
+    parser.add_argument("--shared-requests-per-client", type=int, default=25)
+    parser.add_argument("--recycle-after", type=int, default=100)
+    parser.add_argument("--recycle-concurrency", type=int, default=16)
+    parser.add_argument("--skip", action="append", default=[], choices=["scaling", "shared", "recycling"])
+    args = parser.parse_args()
+
+    if "scaling" not in args.skip:
+        asyncio.run(scaling(args))
+    if "shared" not in args.skip:
+        asyncio.run(shared_tier(args))
+    if "recycling" not in args.skip:
+        asyncio.run(recycling(args))
+
+
+if __name__ == "__main__":
+    main()
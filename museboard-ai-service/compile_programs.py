@@ -0,0 +1,163 @@
+# museboard-ai-service/compile_programs.py
+
+"""
+Optimizes the onboarding DSPy programs offline and saves them for the
+service to load at startup (see dspy_modules/compiled.py).
+
+BootstrapFewShot runs each program over a small set of representative
+inputs, keeps the runs whose output passes the program's metric, and saves
+them as few-shot demos next to the signature's instructions. The demos go
+into the stable part of the prompt, ahead of the user's input, so they are
+the same on every request.
+
+Only bootstrapped demos are kept: the training inputs have no outputs, so
+labeled demos would be bare inputs. Each predictor keeps as many demos as
+fit in --max-demo-tokens, which keeps the compiled prompt close to the
+signature's own size: a mission demo is a few dozen tokens, while a whole
+suggestions answer is over 300 and is left out unless the budget is raised.
+
+Usage (from museboard-ai-service/, with OPENAI_API_KEY set):
+    python compile_programs.py
+    python compile_programs.py --programs mission_enhancer --max-demos 3 --max-demo-tokens 200
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+
+import dspy
+
+from core.context_builder import count_tokens
+from dspy_modules.compiled import COMPILED_PROGRAMS, compiled_path
+from dspy_modules.mission_enhance import MissionEnhancer
+from dspy_modules.onboarding import InterestSuggester
+
+logger = logging.getLogger(__name__)
+
+# Few-shot demos per predictor, and the most prompt tokens they may add to it
+MAX_DEMOS = 2
+MAX_DEMO_TOKENS = 120
+
+# --- Training Inputs ---
+# Raw inputs like the ones users type at signup; the outputs are bootstrapped.
+
+MISSION_INPUTS = [
+    "I want to teach kids to code",
+    "help small farms sell directly to people",
+    "Be healthier and have more energy for my family",
+    "write a novel",
+    "I run a bakery and want it to matter to the neighborhood",
+    "make mental health care less scary to ask for",
+    "Build tools that help remote teams feel connected",
+    "learn to paint again after 20 years",
+    "get more women into engineering leadership",
+    "Make climate data something normal people can use",
+]
+
+MISSION_STATEMENTS = [
+    "Teach kids to build with code so they see themselves as creators",
+    "Help small farms thrive by connecting them directly with the people they feed",
+    "Make mental health care feel as approachable as a conversation with a friend",
+    "Build calm software that helps people focus on what matters",
+    "Write stories that help readers feel less alone",
+    "Turn climate data into decisions everyday people can act on",
+    "Open the path to engineering leadership for women",
+    "Create a neighborhood bakery that brings people together",
+]
+
+
+# --- Metrics ---
+
+def mission_metric(example, prediction, trace=None) -> bool:
+    mission = (prediction.mission or "").strip()
+    return 0 < len(mission.split()) <= 20 and not mission.endswith("?")
+
+
+def suggestions_metric(example, prediction, trace=None) -> bool:
+    return (
+        prediction.outcome == "valid"
+        and 8 <= len(prediction.heroes) <= 10
+        and 5 <= len(prediction.interests) <= 6
+    )
+
+
+# --- Compilation ---
+
+def _finish_mission_enhancer(program: MissionEnhancer) -> MissionEnhancer:
+    # The fast path shares the demos, minus the reasoning it doesn't produce
+    program.enhance_fast.demos = [demo.without("reasoning") for demo in program.enhance.predict.demos]
+    return program
+
+
+PROGRAMS = {
+    "mission_enhancer": (
+        MissionEnhancer, mission_metric,
+        [dspy.Example(user_input=text).with_inputs("user_input") for text in MISSION_INPUTS],
+        _finish_mission_enhancer,
+    ),
+    "interest_suggester": (
+        InterestSuggester, suggestions_metric,
+        [dspy.Example(mission_statement=text).with_inputs("mission_statement") for text in MISSION_STATEMENTS],
+        None,
+    ),
+}
+
+
+def _fit_demos(program: dspy.Module, max_tokens: int):
+    # Demos in the order the optimizer ranked them, as many as fit in the budget
+    for name, predictor in program.named_predictors():
+        kept, used = [], 0
+        for demo in predictor.demos:
+            tokens = count_tokens("\n".join(str(value) for value in demo.values()))
+            if used + tokens > max_tokens:
+                break
+            kept.append(demo)
+            used += tokens
+        if len(kept) < len(predictor.demos):
+            logger.info(f"{name}: kept {len(kept)} of {len(predictor.demos)} demos within {max_tokens} tokens")
+        predictor.demos = kept
+
+
+def compile_program(name: str, max_demos: int = MAX_DEMOS, max_demo_tokens: int = MAX_DEMO_TOKENS) -> dspy.Module:
+    """Compiles one program with the LM currently configured in DSPy."""
+    factory, metric, trainset, finish = PROGRAMS[name]
+    optimizer = dspy.BootstrapFewShot(
+        metric=metric, max_bootstrapped_demos=max_demos, max_labeled_demos=0, max_rounds=1,
+    )
+    program = optimizer.compile(factory(), trainset=trainset)
+    _fit_demos(program, max_demo_tokens)
+    return finish(program) if finish else program
+
+
+def main(names, directory: str, max_demos: int, max_demo_tokens: int):
+    from core.config import services
+
+    lm = asyncio.run(services.aget("lm"))
+    os.makedirs(directory, exist_ok=True)
+    with dspy.context(lm=lm):
+        for name in names:
+            program = compile_program(name, max_demos, max_demo_tokens)
+            path = compiled_path(directory, name)
+            program.save(path)
+            demos = sum(len(predictor.demos) for _, predictor in program.named_predictors())
+            logger.info(f"Saved compiled {name} to {path} ({demos} demos)")
+
+
+if __name__ == "__main__":
+    from core.config import COMPILED_PROGRAMS_DIR
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--programs", type=lambda s: s.split(","), default=list(COMPILED_PROGRAMS),
+                        help=f"Comma-separated programs to compile (default: {','.join(COMPILED_PROGRAMS)})")
+    parser.add_argument("--out", default=COMPILED_PROGRAMS_DIR, help="Directory to save compiled programs to")
+    parser.add_argument("--max-demos", type=int, default=MAX_DEMOS, help="Few-shot demos per predictor")
+    parser.add_argument("--max-demo-tokens", type=int, default=MAX_DEMO_TOKENS,
+                        help="Most tokens a predictor's demos may add to its prompt")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    unknown = set(args.programs) - set(PROGRAMS)
+    if unknown:
+        parser.error(f"Unknown programs: {', '.join(sorted(unknown))}")
+    main(args.programs, args.out, args.max_demos, args.max_demo_tokens)
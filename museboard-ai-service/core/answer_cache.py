@@ -0,0 +1,146 @@
+# museboard-ai-service/core/answer_cache.py
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def source_fingerprint(sources: List[Dict[str, Any]]) -> Tuple[str, ...]:
+    """
+    Identifies a retrieved item set by ID and content, so an edit to any of
+    the retrieved items invalidates answers that were built from it.
+    """
+    fingerprints = []
+    for item in sources:
+        digest = hashlib.sha1(f"{item.get('content', '')}\x00{item.get('description', '')}".encode("utf-8")).hexdigest()
+        fingerprints.append(f"{item.get('id')}:{digest[:12]}")
+    return tuple(sorted(fingerprints))
+
+
+@dataclass
+class CachedAnswer:
+    user_id: str
+    query_vector: np.ndarray
+    fingerprint: Tuple[str, ...]
+    answer: str
+    sources: List[Dict[str, Any]]
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Per-user cache of generated search answers.
+
+    A lookup hits when a cached query's embedding is within `threshold`
+    cosine similarity of the new one *and* retrieval returned the same items,
+    so the answer would have been generated from identical context.
+    Entries expire after `ttl_seconds` and the least recently used entries
+    are evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 600, max_entries: int = 10_000,
+                 max_entries_per_user: int = 32):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_entries_per_user = max_entries_per_user
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._by_user: Dict[str, "OrderedDict[str, None]"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, entry_id: str):
+        # Caller must hold self._lock
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        user_entries = self._by_user.get(entry.user_id)
+        if user_entries is not None:
+            user_entries.pop(entry_id, None)
+            if not user_entries:
+                del self._by_user[entry.user_id]
+
+    def lookup(self, user_id: str, query_embedding, sources: List[Dict[str, Any]]) -> Optional[CachedAnswer]:
+        fingerprint = source_fingerprint(sources)
+        query = self._unit(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._by_user.get(user_id, ())):
+                entry = self._entries[entry_id]
+                if now - entry.created_at > self.ttl_seconds:
+                    self._drop(entry_id)
+                    self.evictions += 1
+                    continue
+                if entry.fingerprint != fingerprint:
+                    continue
+                score = float(np.dot(query, entry.query_vector))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            self._by_user[user_id].move_to_end(best_id)
+            return self._entries[best_id]
+
+    def store(self, user_id: str, query_embedding, sources: List[Dict[str, Any]], answer: str):
+        entry_id = uuid.uuid4().hex
+        entry = CachedAnswer(
+            user_id=user_id,
+            query_vector=self._unit(query_embedding),
+            fingerprint=source_fingerprint(sources),
+            answer=answer,
+            sources=sources,
+            created_at=time.monotonic(),
+        )
+        with self._lock:
+            self._entries[entry_id] = entry
+            user_entries = self._by_user.setdefault(user_id, OrderedDict())
+            user_entries[entry_id] = None
+
+            while len(user_entries) > self.max_entries_per_user:
+                self._drop(next(iter(user_entries)))
+                self.evictions += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: str, item_ids: Optional[List[str]] = None):
+        """Drops every cached answer for the user whose items have changed."""
+        with self._lock:
+            for entry_id in list(self._by_user.get(user_id, ())):
+                self._drop(entry_id)
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "users": len(self._by_user),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
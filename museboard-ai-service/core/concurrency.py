@@ -0,0 +1,44 @@
+# museboard-ai-service/core/concurrency.py
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from fastapi import HTTPException
+
+BUSY_DETAIL = "AI service is busy, please retry shortly."
+
+
+class EndpointLimiter:
+    """
+    Bounds how many requests each endpoint runs concurrently.
+    Every endpoint gets its own semaphore, so a burst of slow chat requests
+    can't starve search or onboarding of LM capacity.
+    """
+
+    def __init__(self, limits: Dict[str, int], queue_timeout: float):
+        self.limits = dict(limits)
+        self.queue_timeout = queue_timeout
+        self._semaphores: Dict[str, asyncio.Semaphore] = {
+            name: asyncio.Semaphore(limit) for name, limit in self.limits.items()
+        }
+
+    def in_flight(self, endpoint: str) -> int:
+        """Returns how many requests are currently holding a slot for the endpoint."""
+        return self.limits[endpoint] - self._semaphores[endpoint]._value
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str):
+        """
+        Waits for a free slot on the given endpoint. Raises a 503 if the wait
+        exceeds the queue timeout, so clients can back off and retry.
+        """
+        semaphore = self._semaphores[endpoint]
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail=BUSY_DETAIL)
+        try:
+            yield
+        finally:
+            semaphore.release()
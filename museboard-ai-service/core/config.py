@@ -1,36 +1,317 @@
 # museboard-ai-service/core/config.py
 
 import os
-import dspy
-import openai
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from typing import Optional
+
+from core.answer_cache import SemanticAnswerCache
+from core.container import ServiceContainer
+from core.conversation_store import ConversationStore
+from core.deadlines import DeadlinePolicy
+from core.embedding_cache import EmbeddingCache
+from core.lexical_index import LocalLexicalIndex
+from core.memo import SingleFlightCache
+from core.quantization import CompactCodec
+from core.shared_cache import SharedCache
+from core.user_profile import UserProfileCache
+from core.vector_index import LocalVectorIndex
 
 # Load environment variables from .env file
 load_dotenv()
 
-# --- OpenAI Client Configuration ---
-# Create a single, reusable OpenAI client instance for direct calls (e.g., embeddings)
-# This remains correct and is essential for our backfill script.
-openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# --- Service Clients ---
+# The OpenAI clients, the DSPy LM and the Supabase clients are created on
+# first use by the service container (see core/container.py), not at import
+# time. Missing credentials only surface when a client is first needed, and
+# the /ready probe reports them.
+supabase_url: Optional[str] = os.environ.get("SUPABASE_URL")
+supabase_key: Optional[str] = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+
+def _dspy_callbacks():
+    # Imported lazily since it pulls in DSPy
+    from core.lm_telemetry import LMTelemetryCallback
+    return [LMTelemetryCallback()]
+
+
+services = ServiceContainer(
+    openai_api_key=os.getenv("OPENAI_API_KEY"),
+    supabase_url=supabase_url,
+    supabase_key=supabase_key,
+    lm_model=os.getenv("LM_MODEL", "openai/gpt-4o"),
+    lm_max_tokens=int(os.getenv("LM_MAX_TOKENS", "4000")),
+    fallback_lm_model=os.getenv("LM_FALLBACK_MODEL", "openai/gpt-4o-mini") or None,
+    http_max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    dspy_callbacks=_dspy_callbacks,
+)
+
+# --- Retrieval Defaults ---
+DEFAULT_MATCH_THRESHOLD = 0.70
+DEFAULT_MATCH_COUNT = 5
+# Most queries accepted by one batch search request
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "16"))
+
+# --- Shared Cache Tier ---
+# With several worker processes (see serve.py) every in-process cache is per
+# worker. SHARED_CACHE_PATH names a SQLite file that all workers on the host
+# share: onboarding LM results are stored there for every worker to serve,
+# and items-changed notifications are relayed through it to all workers
+# within SHARED_EVENTS_POLL_INTERVAL seconds. serve.py points it at a file in
+# /dev/shm when it runs more than one worker.
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH") or None
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "100000"))
+SHARED_EVENTS_POLL_INTERVAL = float(os.getenv("SHARED_EVENTS_POLL_INTERVAL", "0.5"))
+
+shared_cache: Optional[SharedCache] = (
+    SharedCache(SHARED_CACHE_PATH, max_entries=SHARED_CACHE_MAX_ENTRIES) if SHARED_CACHE_PATH else None
+)
+
+# --- Embedding Cache ---
+# Repeated queries and duplicate content skip the embeddings round-trip.
+# Set EMBEDDING_CACHE_PATH to also persist vectors in a SQLite file, which the
+# backfill script reads and writes as well, and which every worker process
+# shares (serve.py puts it in /dev/shm when running several workers).
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "64")) * 1024 * 1024
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH") or None
+
+embedding_cache = EmbeddingCache(max_bytes=EMBEDDING_CACHE_MAX_BYTES, persist_path=EMBEDDING_CACHE_PATH)
+
+# --- Answer Cache ---
+# Serves a previous search answer when the same user asks a near-identical
+# question and retrieval returns the same, unchanged items.
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "600")),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000")),
+)
+
+# --- Onboarding Memo Caches ---
+# Popular missions arrive over and over during signup spikes. Identical
+# requests in flight share one LM call, and results are reused for the TTL.
+ONBOARDING_CACHE_TTL_SECONDS = float(os.getenv("ONBOARDING_CACHE_TTL_SECONDS", "3600"))
+ONBOARDING_CACHE_MAX_ENTRIES = int(os.getenv("ONBOARDING_CACHE_MAX_ENTRIES", "5000"))
+
+suggestions_cache = SingleFlightCache(ttl_seconds=ONBOARDING_CACHE_TTL_SECONDS, max_entries=ONBOARDING_CACHE_MAX_ENTRIES,
+                                      shared=shared_cache, namespace="suggestions")
+mission_enhance_cache = SingleFlightCache(ttl_seconds=ONBOARDING_CACHE_TTL_SECONDS, max_entries=ONBOARDING_CACHE_MAX_ENTRIES,
+                                          shared=shared_cache, namespace="mission_enhance")
+# Missions whose last suggestions were cut off, and so weren't cached above.
+# DSPy's own LM cache still holds the cut-off completion, so the next
+# request for one of them skips it.
+incomplete_suggestions = SingleFlightCache(ttl_seconds=ONBOARDING_CACHE_TTL_SECONDS,
+                                           max_entries=ONBOARDING_CACHE_MAX_ENTRIES,
+                                           shared=shared_cache, namespace="suggestions_incomplete")
+
+# --- Compiled Programs ---
+# Optimized DSPy programs written by compile_programs.py, one JSON file per
+# program (e.g. mission_enhancer.json). They are loaded when the agents are
+# built; a program without a file runs with its signature's instructions only.
+COMPILED_PROGRAMS_DIR = os.getenv(
+    "COMPILED_PROGRAMS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "compiled"),
+)
+
+# --- Compact Embeddings ---
+# Optional coarse-then-rescore vector search. The match_muse_items_compact RPC
+# ranks items by a 512-bit code of their embedding and rescores the top
+# match_count x COMPACT_RESCORE_MULTIPLIER candidates at full precision (binary
+# codes need about 10x for good recall, int8 codes about 4x). The
+# local vector index does the same with codes of COMPACT_EMBEDDING_DIMS
+# dimensions in COMPACT_EMBEDDING_SCHEME ("int8" or "binary"). With a
+# multiplier of 0 it drops the full vectors and answers from int8 codes alone.
+COMPACT_EMBEDDINGS_ENABLED = os.getenv("COMPACT_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+COMPACT_EMBEDDING_DIMS = int(os.getenv("COMPACT_EMBEDDING_DIMS", "512"))
+COMPACT_EMBEDDING_SCHEME = os.getenv("COMPACT_EMBEDDING_SCHEME", "int8")
+COMPACT_RESCORE_MULTIPLIER = int(os.getenv("COMPACT_RESCORE_MULTIPLIER", "10"))
+
+compact_codec: Optional[CompactCodec] = (
+    CompactCodec(dims=COMPACT_EMBEDDING_DIMS, scheme=COMPACT_EMBEDDING_SCHEME)
+    if COMPACT_EMBEDDINGS_ENABLED else None
+)
+
+# --- Local Vector Index ---
+# Optional in-process retrieval. When enabled, searches run against a per-user
+# in-memory index warmed from Supabase; match_muse_items remains the fallback.
+# Items-changed events keep indexes current; writers that don't send them (e.g.
+# a standalone ingestion worker without --notify-url) are picked up by rebuilding
+# an index in the background once it is LOCAL_INDEX_MAX_AGE_SECONDS old.
+LOCAL_VECTOR_INDEX_ENABLED = os.getenv("LOCAL_VECTOR_INDEX", "false").lower() in ("1", "true", "yes")
+LOCAL_VECTOR_INDEX_MAX_VECTORS = int(os.getenv("LOCAL_VECTOR_INDEX_MAX_VECTORS", "1000000"))
+LOCAL_INDEX_MAX_AGE = float(os.getenv("LOCAL_INDEX_MAX_AGE_SECONDS", "300"))
+
+local_vector_index: Optional[LocalVectorIndex] = (
+    LocalVectorIndex(lambda: services.aget("async_supabase"), max_vectors=LOCAL_VECTOR_INDEX_MAX_VECTORS,
+                     codec=compact_codec, rescore_multiplier=COMPACT_RESCORE_MULTIPLIER, max_age=LOCAL_INDEX_MAX_AGE)
+    if LOCAL_VECTOR_INDEX_ENABLED else None
+)
+
+# --- Hybrid Retrieval ---
+# Optional keyword retrieval alongside the vector search: a per-user BM25
+# index over item content, description and categories, fused with the vector
+# matches by reciprocal rank fusion. It finds items whose exact terms (names,
+# tags, URLs) an embedding blurs, and items not embedded yet. The reranker
+# reorders the fused candidates before the answer context is assembled.
+HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+HYBRID_RERANK_ENABLED = os.getenv("HYBRID_RERANK", "true").lower() in ("1", "true", "yes")
+# Each retriever returns match_count x this many candidates for fusion
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "4"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Share of a query's keywords an item must contain to be a keyword match
+LEXICAL_MIN_COVERAGE = float(os.getenv("LEXICAL_MIN_COVERAGE", "0.5"))
+LEXICAL_INDEX_MAX_ITEMS = int(os.getenv("LEXICAL_INDEX_MAX_ITEMS", "1000000"))
+
+local_lexical_index: Optional[LocalLexicalIndex] = (
+    LocalLexicalIndex(lambda: services.aget("async_supabase"), max_items=LEXICAL_INDEX_MAX_ITEMS,
+                      min_coverage=LEXICAL_MIN_COVERAGE, max_age=LOCAL_INDEX_MAX_AGE)
+    if HYBRID_RETRIEVAL_ENABLED else None
+)
+
+
+# --- User Profiles ---
+# Chat requests that carry only a user_id get their Museboard summary from
+# a per-user profile (item counts, category frequencies, recent items and an
+# interest centroid) built on first use and updated from items-changed events
+# rather than recomputed by the client on every turn. Profiles are rebuilt in
+# the background after USER_PROFILE_MAX_AGE_SECONDS, which also picks up
+# mission changes.
+USER_PROFILE_MAX_ITEMS = int(os.getenv("USER_PROFILE_MAX_ITEMS", "1000000"))
+USER_PROFILE_RECENT_ITEMS = int(os.getenv("USER_PROFILE_RECENT_ITEMS", "10"))
+USER_PROFILE_MAX_AGE = float(os.getenv("USER_PROFILE_MAX_AGE_SECONDS", "900"))
+# Conversation turns loaded from ai_messages when a conversation isn't in the store yet
+CHAT_HISTORY_MESSAGES = int(os.getenv("CHAT_HISTORY_MESSAGES", "20"))
+
+user_profiles = UserProfileCache(
+    lambda: services.aget("async_supabase"), max_items=USER_PROFILE_MAX_ITEMS,
+    recent_size=USER_PROFILE_RECENT_ITEMS, max_age=USER_PROFILE_MAX_AGE,
+)
+
+
+# --- Conversation Store ---
+# Chat requests with a user_id keep their conversation on the server: the
+# turns not yet summarized, the rolling summary and the referenced items, so
+# the client sends only the new message (see core/conversation_store.py).
+# Turns are written behind the request, every CONVERSATION_STORE_FLUSH_INTERVAL
+# seconds: to ai_messages unless CONVERSATION_STORE_WRITE_MESSAGES=false, and
+# with CONVERSATION_STORE_PATH to a SQLite file that restarts and the other
+# workers resume conversations from.
+CONVERSATION_STORE_MAX_CONVERSATIONS = int(os.getenv("CONVERSATION_STORE_MAX_CONVERSATIONS", "10000"))
+CONVERSATION_STORE_MAX_TURNS = int(os.getenv("CONVERSATION_STORE_MAX_TURNS", "50"))
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH") or None
+CONVERSATION_STORE_WRITE_MESSAGES = os.getenv("CONVERSATION_STORE_WRITE_MESSAGES", "true").lower() in ("1", "true", "yes")
+CONVERSATION_STORE_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_STORE_FLUSH_INTERVAL", "0.5"))
+
+conversation_store = ConversationStore(
+    lambda: services.aget("async_supabase"), persist_path=CONVERSATION_STORE_PATH,
+    write_messages=CONVERSATION_STORE_WRITE_MESSAGES, max_conversations=CONVERSATION_STORE_MAX_CONVERSATIONS,
+    max_turns=CONVERSATION_STORE_MAX_TURNS, load_messages=CHAT_HISTORY_MESSAGES,
+    flush_interval=CONVERSATION_STORE_FLUSH_INTERVAL,
+)
+
+
+# --- RAG Context Packing ---
+# Token budget for the retrieved items in a search answer prompt, and the most
+# any one item may take of it. Items whose words overlap an already packed
+# item's by at least the dedup threshold (Jaccard) are left out.
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "500"))
+RAG_ITEM_TOKEN_CAP = int(os.getenv("RAG_ITEM_TOKEN_CAP", "200"))
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.9"))
+
+
+# --- Embedding Ingestion Worker ---
+# Embeds new and edited items from the ai_processing_jobs queue in micro-batches
+# (see ingestion_worker.py). The muse_items trigger queues a job for every new
+# or edited item and nothing else embeds them, so the worker runs inside the API
+# process unless INGESTION_WORKER=false, e.g. when it runs standalone. Several
+# workers can share the queue.
+INGESTION_WORKER_ENABLED = os.getenv("INGESTION_WORKER", "true").lower() in ("1", "true", "yes")
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "256"))
+INGESTION_MAX_WAIT_MS = float(os.getenv("INGESTION_MAX_WAIT_MS", "200"))
+# Claimed jobs held in memory at most; beyond that they wait in the database
+INGESTION_MAX_PENDING = int(os.getenv("INGESTION_MAX_PENDING", "2048"))
+INGESTION_CONCURRENCY = int(os.getenv("INGESTION_CONCURRENCY", "4"))
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "5"))
+INGESTION_POLL_INTERVAL = float(os.getenv("INGESTION_POLL_INTERVAL", "1.0"))
+# Claimed jobs are locked this long; the worker renews the lease of the jobs it
+# still holds every third of it, so queued jobs aren't claimed twice
+INGESTION_LEASE_SECONDS = int(os.getenv("INGESTION_LEASE_SECONDS", "300"))
+
+
+# --- Content Curation Worker ---
+# Fills a new user's Museboard in the background once onboarding completes
+# (see curation_worker.py). Each job is split into up to CURATION_SLICES
+# parallel curator calls that together write about CURATION_ITEMS items.
+# Runs inside the API process unless CURATION_WORKER=false, e.g. when it runs
+# standalone.
+CURATION_WORKER_ENABLED = os.getenv("CURATION_WORKER", "true").lower() in ("1", "true", "yes")
+# Jobs curated at once by one worker
+CURATION_CONCURRENCY = int(os.getenv("CURATION_CONCURRENCY", "4"))
+CURATION_SLICES = int(os.getenv("CURATION_SLICES", "4"))
+CURATION_ITEMS = int(os.getenv("CURATION_ITEMS", "12"))
+CURATION_SLICE_TIMEOUT = float(os.getenv("CURATION_SLICE_TIMEOUT_SECONDS", "60"))
+CURATION_MAX_ATTEMPTS = int(os.getenv("CURATION_MAX_ATTEMPTS", "3"))
+CURATION_POLL_INTERVAL = float(os.getenv("CURATION_POLL_INTERVAL", "2.0"))
+CURATION_LEASE_SECONDS = int(os.getenv("CURATION_LEASE_SECONDS", "300"))
+
+
+# --- Concurrency Limits ---
+# Maximum number of requests each endpoint will run at once. Requests beyond
+# the limit wait for a free slot; if none frees up within the queue timeout
+# the request is rejected with a 503 instead of piling up behind the LM.
+ENDPOINT_CONCURRENCY = {
+    "chat": int(os.getenv("MAX_CONCURRENT_CHAT", "32")),
+    "search": int(os.getenv("MAX_CONCURRENT_SEARCH", "32")),
+    "mission_enhance": int(os.getenv("MAX_CONCURRENT_MISSION_ENHANCE", "16")),
+    "suggestions": int(os.getenv("MAX_CONCURRENT_SUGGESTIONS", "16")),
+}
+ENDPOINT_QUEUE_TIMEOUT = float(os.getenv("ENDPOINT_QUEUE_TIMEOUT", "30"))
+
+
+# --- LM Deadlines ---
+# Latency budget in seconds for each endpoint, counted from the request's
+# arrival. When the full module on LM_MODEL runs long, the endpoint falls back
+# to a plain Predict on LM_FALLBACK_MODEL within what is left of the budget,
+# and then to a degraded answer (see core/deadlines.py). With hedging, a call
+# still running after the recent p95 latency gets a duplicate, for at most
+# LM_HEDGE_MAX_RATE of calls.
+LM_DEADLINES_ENABLED = os.getenv("LM_DEADLINES", "true").lower() in ("1", "true", "yes")
+LM_DEADLINES = {
+    "chat": float(os.getenv("LM_DEADLINE_CHAT", "20")),
+    "search": float(os.getenv("LM_DEADLINE_SEARCH", "20")),
+    "mission_enhance": float(os.getenv("LM_DEADLINE_MISSION_ENHANCE", "10")),
+    "suggestions": float(os.getenv("LM_DEADLINE_SUGGESTIONS", "20")),
+}
+# Budget kept for the fallback: its recent p99 latency, and at least this
+LM_FALLBACK_RESERVE = float(os.getenv("LM_FALLBACK_RESERVE_SECONDS", "3"))
+LM_HEDGING_ENABLED = os.getenv("LM_HEDGING", "true").lower() in ("1", "true", "yes")
+LM_HEDGE_MAX_RATE = float(os.getenv("LM_HEDGE_MAX_RATE", "0.1"))
 
-# --- DSPy Configuration (Corrected for DSPy 3.0) ---
-# Set up the language model (LM) for DSPy using the modern, unified dspy.LM class.
-# This matches the official documentation.
-gpt4o = dspy.LM(
-    'openai/gpt-4o',
-    api_key=os.getenv("OPENAI_API_KEY"),
-    max_tokens=4000
+lm_deadlines = DeadlinePolicy(
+    LM_DEADLINES, fallback_reserve=LM_FALLBACK_RESERVE, enabled=LM_DEADLINES_ENABLED,
+    hedge=LM_HEDGING_ENABLED, hedge_max_rate=LM_HEDGE_MAX_RATE,
 )
 
-# Set the configured LM as the default for all DSPy modules
-dspy.configure(lm=gpt4o)
 
+# --- Chat Context Budgets ---
+# Token budgets for the conversation history (including its rolling summary)
+# and the Museboard summary that ShadowAgent sends with every turn.
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
+CHAT_ITEMS_TOKEN_BUDGET = int(os.getenv("CHAT_ITEMS_TOKEN_BUDGET", "200"))
 
-# --- Supabase Configuration ---
-# This remains correct
-supabase_url: str = os.environ.get("SUPABASE_URL")
-supabase_key: str = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
-# Create a single, reusable Supabase client instance
-supabase: Client = create_client(supabase_url, supabase_key)
\ No newline at end of file
+# --- Multi-worker Serving ---
+# Used by serve.py. WEB_CONCURRENCY worker processes share the port; each
+# worker is recycled after SERVE_MAX_REQUESTS requests (plus up to
+# SERVE_MAX_REQUESTS_JITTER more, so workers don't restart together; 0 never
+# recycles), finishing its in-flight requests within SERVE_GRACEFUL_TIMEOUT.
+SERVE_HOST = os.getenv("HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("PORT", "8000"))
+SERVE_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+SERVE_MAX_REQUESTS = int(os.getenv("SERVE_MAX_REQUESTS", "0"))
+SERVE_MAX_REQUESTS_JITTER = int(os.getenv("SERVE_MAX_REQUESTS_JITTER", str(SERVE_MAX_REQUESTS // 10)))
+SERVE_GRACEFUL_TIMEOUT = int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+# Finish loading the LM, DSPy modules and clients before accepting connections.
+# serve.py turns this on with several workers; a single process instead
+# answers health checks while it loads.
+WARM_UP_BEFORE_SERVING = os.getenv("WARM_UP_BEFORE_SERVING", "false").lower() in ("1", "true", "yes")
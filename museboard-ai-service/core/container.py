@@ -0,0 +1,193 @@
+# museboard-ai-service/core/container.py
+
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+Factory = Callable[[], Union[Any, Awaitable[Any]]]
+
+
+class ServiceContainer:
+    """
+    Lazily built, process-wide service clients.
+
+    Nothing is constructed at import time: each service is created by its
+    factory on first use and then reused, so importing the app stays cheap,
+    a missing environment variable only fails the services that need it,
+    and a health check can answer while the heavy dependencies load.
+
+    Sync factories run in a worker thread when requested from async code
+    (`aget`), so slow imports never block the event loop. Async factories run
+    on the loop. Concurrent first requests share one construction, and a
+    failed construction is retried on the next request rather than cached.
+    """
+
+    def __init__(self, openai_api_key: Optional[str], supabase_url: Optional[str], supabase_key: Optional[str],
+                 lm_model: str = "openai/gpt-4o", lm_max_tokens: int = 4000, http_max_connections: int = 100,
+                 dspy_callbacks: Callable[[], list] = lambda: [], fallback_lm_model: Optional[str] = None):
+        self.openai_api_key = openai_api_key
+        self.supabase_url = supabase_url
+        self.supabase_key = supabase_key
+        self.lm_model = lm_model
+        self.lm_max_tokens = lm_max_tokens
+        self.fallback_lm_model = fallback_lm_model
+        self.http_max_connections = http_max_connections
+        self.dspy_callbacks = dspy_callbacks
+
+        self._factories: Dict[str, Factory] = {
+            "openai": self._build_openai,
+            "async_openai": self._build_async_openai,
+            "supabase": self._build_supabase,
+            "async_supabase": self._build_async_supabase,
+            "lm": self._build_lm,
+            "fallback_lm": self._build_fallback_lm,
+            "dspy": self._configure_dspy,
+        }
+        self._instances: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._async_locks: Dict[str, asyncio.Lock] = {}
+
+    # --- Registration ---
+
+    def register(self, name: str, factory: Factory):
+        self._factories[name] = factory
+
+    def override(self, **instances: Any):
+        """Installs ready-made instances in place of their factories, e.g. the benchmark stubs."""
+        for name, instance in instances.items():
+            self._instances[name] = instance
+            self._errors.pop(name, None)
+
+    # --- Access ---
+
+    def _record(self, name: str, started: float, instance: Any) -> Any:
+        self._instances[name] = instance
+        self._errors.pop(name, None)
+        self._load_seconds[name] = time.perf_counter() - started
+        logger.info(f"Initialized {name} in {self._load_seconds[name] * 1000:.0f}ms")
+        return instance
+
+    def _failed(self, name: str, error: Exception):
+        self._errors[name] = f"{type(error).__name__}: {error}"
+        logger.error(f"Failed to initialize {name}: {error}")
+
+    def get(self, name: str) -> Any:
+        """Returns a sync-built service, constructing it on first use."""
+        if name in self._instances:
+            return self._instances[name]
+        factory = self._factories[name]
+        if inspect.iscoroutinefunction(factory):
+            raise RuntimeError(f"Service '{name}' is async; use `await services.aget('{name}')`.")
+        with self._thread_locks.setdefault(name, threading.Lock()):
+            if name in self._instances:
+                return self._instances[name]
+            started = time.perf_counter()
+            try:
+                instance = factory()
+            except Exception as e:
+                self._failed(name, e)
+                raise
+            return self._record(name, started, instance)
+
+    async def aget(self, name: str) -> Any:
+        """Returns a service from async code, constructing it off the event loop if needed."""
+        if name in self._instances:
+            return self._instances[name]
+        factory = self._factories[name]
+        async with self._async_locks.setdefault(name, asyncio.Lock()):
+            if name in self._instances:
+                return self._instances[name]
+            if not inspect.iscoroutinefunction(factory):
+                return await asyncio.to_thread(self.get, name)
+            started = time.perf_counter()
+            try:
+                instance = await factory()
+            except Exception as e:
+                self._failed(name, e)
+                raise
+            return self._record(name, started, instance)
+
+    async def warm_up(self, names: Iterable[str]):
+        """Builds the given services in the background; failures are reported by status()."""
+        for name in names:
+            try:
+                await self.aget(name)
+            except Exception:
+                pass
+
+    def status(self, names: Iterable[str]) -> Dict[str, str]:
+        return {
+            name: "ready" if name in self._instances else f"failed: {self._errors[name]}" if name in self._errors else "pending"
+            for name in names
+        }
+
+    def load_seconds(self) -> Dict[str, float]:
+        return dict(self._load_seconds)
+
+    # --- Factories ---
+
+    def _build_openai(self):
+        import openai
+
+        return openai.OpenAI(
+            api_key=self.openai_api_key,
+            http_client=openai.DefaultHttpxClient(limits=self._http_limits()),
+        )
+
+    def _build_async_openai(self):
+        # Used on the request path, so embedding calls made by the FastAPI
+        # handlers never block the event loop. One pooled client per process.
+        import openai
+
+        return openai.AsyncOpenAI(
+            api_key=self.openai_api_key,
+            http_client=openai.DefaultAsyncHttpxClient(limits=self._http_limits()),
+        )
+
+    def _http_limits(self):
+        import httpx
+
+        return httpx.Limits(max_connections=self.http_max_connections,
+                            max_keepalive_connections=self.http_max_connections)
+
+    def _build_supabase(self):
+        from supabase import create_client
+
+        return create_client(self.supabase_url, self.supabase_key)
+
+    async def _build_async_supabase(self):
+        # The async Supabase client can only be built inside a running event loop
+        from supabase import acreate_client
+
+        return await acreate_client(self.supabase_url, self.supabase_key)
+
+    def _build_lm(self):
+        import dspy
+
+        return dspy.LM(self.lm_model, api_key=self.openai_api_key, max_tokens=self.lm_max_tokens)
+
+    async def _build_fallback_lm(self):
+        # The smaller model answers when the main one is too slow; without
+        # one configured, the fallback paths use the main LM
+        if not self.fallback_lm_model:
+            return await self.aget("lm")
+        import dspy
+
+        return dspy.LM(self.fallback_lm_model, api_key=self.openai_api_key, max_tokens=self.lm_max_tokens)
+
+    async def _configure_dspy(self):
+        # Runs on the event loop thread, which then owns DSPy's settings
+        lm = await self.aget("lm")
+        import dspy
+
+        # Usage tracking attaches token counts to each prediction so they can
+        # be logged per request; the callbacks export them as metrics.
+        dspy.configure(lm=lm, track_usage=True, callbacks=self.dspy_callbacks())
+        return lm
@@ -0,0 +1,189 @@
+# museboard-ai-service/core/context_builder.py
+
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio used when no tokenizer is available
+CHARS_PER_TOKEN_ESTIMATE = 4
+# Room kept for the "Summary of earlier conversation:" prefix and the omitted-messages marker
+FRAMING_TOKENS = 16
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        # LiteLLM points tiktoken at its bundled BPE files, so loading the
+        # encoding doesn't need network access.
+        import litellm.litellm_core_utils.default_encoding  # noqa: F401
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable, falling back to character estimates: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Counts GPT-4o tokens locally, or estimates them if tiktoken can't be loaded."""
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN_ESTIMATE + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text down to at most `max_tokens` tokens."""
+    encoding = _encoding()
+    if encoding is None:
+        limit = max_tokens * CHARS_PER_TOKEN_ESTIMATE
+        return text if len(text) <= limit else text[:limit].rstrip() + "…"
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]).rstrip() + "…"
+
+
+def format_turn(message: Dict[str, Any]) -> str:
+    return f"{message.get('role')}: {message.get('content')}"
+
+
+def turn_key(message: Dict[str, Any]) -> str:
+    """Stable identity for a message: its database ID, or a hash of role and content."""
+    if message.get("id"):
+        return str(message["id"])
+    return hashlib.sha1(format_turn(message).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class RollingSummary:
+    text: str = ""
+    covered: Set[str] = field(default_factory=set)
+    updating: bool = False
+    # Called after each fold, e.g. so a ConversationStore can persist the summary
+    on_update: Optional[Callable[[], None]] = None
+
+
+@dataclass
+class ChatContext:
+    history: str
+    items_summary: str
+    history_tokens: int
+    raw_history_tokens: int
+    recent_turns: int
+    summarized_turns: int
+
+
+class ContextBuilder:
+    """
+    Assembles the conversation part of Shadow's prompt within a token budget.
+
+    The most recent turns are kept verbatim. Older turns are folded into a
+    rolling summary cached per conversation_id; folding happens in the
+    background, a batch of turns at a time, so it never adds an LM call to
+    the request path. Until a batch is folded, as many of those turns as
+    still fit are included verbatim.
+    """
+
+    def __init__(self, summarize: Callable[[str, str], Awaitable[str]], history_budget: int = 1500,
+                 summary_budget: int = 300, items_budget: int = 200, summary_batch_turns: int = 6,
+                 max_conversations: int = 10_000):
+        self.summarize = summarize
+        self.history_budget = history_budget
+        self.summary_budget = summary_budget
+        self.items_budget = items_budget
+        self.summary_batch_turns = summary_batch_turns
+        self.max_conversations = max_conversations
+        self._summaries: "OrderedDict[str, RollingSummary]" = OrderedDict()
+        # The loop keeps only weak references to tasks, so running folds are held here
+        self._folding: Set[asyncio.Task] = set()
+        # Load the tokenizer now rather than on the first chat request
+        _encoding()
+
+    def _summary_for(self, conversation_id: str) -> RollingSummary:
+        summary = self._summaries.get(conversation_id)
+        if summary is None:
+            summary = self._summaries[conversation_id] = RollingSummary()
+            while len(self._summaries) > self.max_conversations:
+                self._summaries.popitem(last=False)
+        self._summaries.move_to_end(conversation_id)
+        return summary
+
+    async def _fold(self, summary: RollingSummary, turns: List[Dict[str, Any]]):
+        try:
+            text = await self.summarize(summary.text, "\n".join(format_turn(t) for t in turns))
+            summary.text = truncate_to_tokens(text, self.summary_budget)
+            summary.covered.update(turn_key(t) for t in turns)
+            if summary.on_update is not None:
+                summary.on_update()
+        except Exception as e:
+            logger.warning(f"Failed to update conversation summary: {e}")
+        finally:
+            summary.updating = False
+
+    def fold(self, summary: RollingSummary, turns: List[Dict[str, Any]]) -> bool:
+        """Starts folding `turns` into `summary` in the background, unless a fold is already running."""
+        if summary.updating or not turns:
+            return False
+        summary.updating = True
+        task = asyncio.create_task(self._fold(summary, turns))
+        self._folding.add(task)
+        task.add_done_callback(self._folding.discard)
+        return True
+
+    def build(self, conversation_id: str, history: List[Dict[str, Any]], items_summary: str,
+              summary: Optional[RollingSummary] = None) -> ChatContext:
+        """
+        `summary` is the conversation's rolling summary when its owner keeps
+        one (see ConversationStore); otherwise one is cached here.
+        """
+        turn_tokens = [count_tokens(format_turn(t)) for t in history]
+        raw_history_tokens = sum(turn_tokens)
+
+        # 1. Keep the newest turns verbatim, always at least the last one
+        recent_budget = self.history_budget - self.summary_budget
+        start, used = len(history), 0
+        while start > 0 and (used + turn_tokens[start - 1] <= recent_budget or start == len(history)):
+            start -= 1
+            used += turn_tokens[start]
+        recent, older = history[start:], history[:start]
+
+        # 2. Older turns the rolling summary doesn't cover yet
+        if summary is None:
+            summary = self._summary_for(conversation_id)
+        backlog = [(t, tokens) for t, tokens in zip(older, turn_tokens) if turn_key(t) not in summary.covered]
+        if len(backlog) >= self.summary_batch_turns:
+            self.fold(summary, [t for t, _ in backlog])
+
+        # 3. Fill what is left of the budget with the newest backlog turns
+        remaining = self.history_budget - used - count_tokens(summary.text) - FRAMING_TOKENS
+        carried: List[str] = []
+        for turn, tokens in reversed(backlog):
+            if tokens > remaining:
+                break
+            carried.insert(0, format_turn(turn))
+            remaining -= tokens
+
+        parts = []
+        if summary.text:
+            parts.append(f"Summary of earlier conversation: {summary.text}")
+        if len(carried) < len(backlog):
+            parts.append(f"[{len(backlog) - len(carried)} earlier messages omitted]")
+        parts.extend(carried)
+        # A single oversized message can't push the prompt past the budget either
+        parts.extend(truncate_to_tokens(format_turn(t), recent_budget) for t in recent)
+        history_text = "\n".join(parts)
+
+        return ChatContext(
+            history=history_text,
+            items_summary=truncate_to_tokens(items_summary, self.items_budget),
+            history_tokens=count_tokens(history_text),
+            raw_history_tokens=raw_history_tokens,
+            recent_turns=len(recent),
+            summarized_turns=len(older) - len(backlog),
+        )
@@ -0,0 +1,156 @@
+# museboard-ai-service/core/context_packer.py
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.context_builder import count_tokens, truncate_to_tokens
+from core.lexical_index import tokenize
+
+ITEM_SEPARATOR = "\n\n---\n\n"
+PASSAGE_SEPARATOR = " … "
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+@dataclass
+class PackedContext:
+    text: str
+    items: List[Dict[str, Any]]
+    tokens: int
+    duplicates: int
+    trimmed: int
+    skipped: int
+
+
+def relevance(item: Dict[str, Any]) -> float:
+    """The most specific score retrieval left on an item: reranker, fusion, then cosine similarity."""
+    for key in ("rerank_score", "retrieval_score", "similarity"):
+        if item.get(key) is not None:
+            return float(item[key])
+    return 0.0
+
+
+def split_passages(text: str, passage_tokens: int) -> List[str]:
+    """Groups consecutive sentences into passages of roughly `passage_tokens` tokens."""
+    passages: List[str] = []
+    current: List[str] = []
+    used = 0
+    for sentence in filter(None, (part.strip() for part in _SENTENCE_RE.split(text))):
+        tokens = count_tokens(sentence)
+        if current and used + tokens > passage_tokens:
+            passages.append(" ".join(current))
+            current, used = [], 0
+        current.append(sentence)
+        used += tokens
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+class ContextPacker:
+    """
+    Assembles the retrieved items of a search into the answer prompt within a
+    token budget.
+
+    Items are taken greedily in relevance order, each within its share of the
+    budget still left. An item whose content is
+    nearly the same as one already packed (by Jaccard similarity of their
+    word sets) is skipped. Long content is cut down to the passages sharing
+    the most words with the question instead of its first characters, so the
+    part of an item that answers the question survives. Items that no longer
+    fit are trimmed to the remaining budget or, when too little is left, skipped.
+    """
+
+    def __init__(self, token_budget: int = 500, item_token_cap: int = 200, passage_tokens: int = 60,
+                 dedup_threshold: float = 0.9, min_item_tokens: int = 40):
+        self.token_budget = token_budget
+        self.item_token_cap = item_token_cap
+        self.passage_tokens = passage_tokens
+        self.dedup_threshold = dedup_threshold
+        self.min_item_tokens = min_item_tokens
+
+    def _extract(self, content: str, query_terms: Set[str], max_tokens: int) -> str:
+        """The passages of `content` most relevant to the query, in document order, within `max_tokens`."""
+        if count_tokens(content) <= max_tokens:
+            return content
+        passages = split_passages(content, self.passage_tokens)
+        if len(passages) <= 1:
+            return truncate_to_tokens(content, max_tokens)
+
+        # Most query words first; among equals, earlier passages first
+        ranked = sorted(
+            range(len(passages)),
+            key=lambda i: (-len(query_terms & set(tokenize(passages[i]))), i),
+        )
+        chosen: List[int] = []
+        used = 0
+        for i in ranked:
+            tokens = count_tokens(passages[i]) + (count_tokens(PASSAGE_SEPARATOR) if chosen else 0)
+            if used + tokens > max_tokens:
+                continue
+            chosen.append(i)
+            used += tokens
+        if not chosen:
+            return truncate_to_tokens(passages[ranked[0]], max_tokens)
+        chosen.sort()
+        text = PASSAGE_SEPARATOR.join(passages[i] for i in chosen)
+        # Mark content cut from before the first passage or after the last
+        if chosen[0] > 0:
+            text = "…" + text
+        if chosen[-1] < len(passages) - 1:
+            text += "…"
+        return text
+
+    def _format(self, item: Dict[str, Any], query_terms: Set[str], max_tokens: int) -> Tuple[str, bool]:
+        """Returns the item's context block and whether any of it had to be cut."""
+        full_description = (item.get("description") or "N/A").strip()
+        full_content = (item.get("content") or "").strip()
+        # Description gets at most a third of the item's share; content gets the rest
+        description = truncate_to_tokens(full_description, max(max_tokens // 3, 1))
+        framing = count_tokens(f"Type: {item.get('content_type')}\nContent: \nDescription: {description}")
+        content = self._extract(full_content, query_terms, max(max_tokens - framing, 1))
+        block = f"Type: {item.get('content_type')}\nContent: {content}\nDescription: {description}"
+        return block, content != full_content or description != full_description
+
+    def pack(self, question: str, items: List[Dict[str, Any]], token_budget: Optional[int] = None) -> PackedContext:
+        budget = self.token_budget if token_budget is None else token_budget
+        query_terms = set(tokenize(question))
+        separator_tokens = count_tokens(ITEM_SEPARATOR)
+
+        blocks: List[str] = []
+        packed: List[Dict[str, Any]] = []
+        seen: List[Set[str]] = []
+        remaining = budget
+        duplicates = trimmed = skipped = 0
+        ranked = sorted(items, key=relevance, reverse=True)
+        for position, item in enumerate(ranked):
+            words = set(tokenize(f"{item.get('content') or ''} {item.get('description') or ''}"))
+            if words and any(len(words & other) / len(words | other) >= self.dedup_threshold for other in seen):
+                duplicates += 1
+                continue
+
+            available = remaining - (separator_tokens if blocks else 0)
+            if available < self.min_item_tokens:
+                skipped += 1
+                continue
+            # An item may take its fair share of what is left, so a few long
+            # items at the top can't crowd out the rest; short items leave
+            # their unused share to the items after them.
+            share = max(available // (len(ranked) - position), self.min_item_tokens)
+            block, cut = self._format(item, query_terms, min(self.item_token_cap, share))
+            tokens = count_tokens(block)
+            if tokens > available:
+                block, cut = truncate_to_tokens(block, available), True
+                tokens = count_tokens(block)
+            trimmed += cut
+
+            blocks.append(block)
+            packed.append(item)
+            seen.append(words)
+            remaining = available - tokens
+
+        text = ITEM_SEPARATOR.join(blocks)
+        return PackedContext(
+            text=text, items=packed, tokens=count_tokens(text) if text else 0,
+            duplicates=duplicates, trimmed=trimmed, skipped=skipped,
+        )
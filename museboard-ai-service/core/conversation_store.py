@@ -0,0 +1,367 @@
+# museboard-ai-service/core/conversation_store.py
+
+import asyncio
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.context_builder import RollingSummary, turn_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Conversation:
+    conversation_id: str
+    # Turns the summary doesn't cover yet, oldest first: id, role, content, created_at
+    turns: List[Dict[str, Any]] = field(default_factory=list)
+    summary: RollingSummary = field(default_factory=RollingSummary)
+    # Museboard items the latest turn's context referenced
+    item_ids: List[str] = field(default_factory=list)
+    # Turns not yet written to ai_messages, and IDs of turns that left memory
+    # (summarized, or past max_turns) not yet deleted from SQLite
+    unsaved: List[Dict[str, Any]] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+    # The SQLite row's version this copy matches; 0 when it has never been stored
+    version: int = 0
+
+
+class ConversationStore:
+    """
+    Server-side state of Shadow conversations, keyed by conversation_id: the
+    turns not yet folded into the rolling summary, the summary itself and
+    the item IDs the last turn referenced. A chat request then only carries
+    the new message, and its context comes from memory.
+
+    Conversations live in an LRU of `max_conversations`. A conversation
+    missing from memory is loaded from SQLite (`persist_path`) when it is
+    there, else from its latest `load_messages` rows in ai_messages.
+
+    Writes are behind the request path. Turns are queued as they are
+    recorded, and `run` flushes them every `flush_interval` seconds:
+    - new turns are inserted into ai_messages (with `write_messages`)
+    - the summary and unsummarized turns are upserted into SQLite, so a
+      restart, an eviction or another worker sharing the file resumes the
+      conversation without summarizing it again
+    Turns the summary has folded in are dropped from memory and SQLite;
+    ai_messages keeps the full history. Past `max_turns`, the oldest turns are
+    handed to `fold(summary, turns)` (ContextBuilder.fold) and leave once the
+    summary covers them, so no turn is lost before it is summarized.
+
+    Each SQLite row carries a version, bumped on every write. `get` compares
+    it with the copy in memory and reloads the conversation when another
+    worker sharing the file has written since. `on_persisted(conversation_ids)`
+    is called after each flush, so other workers can drop their copies early
+    (see `invalidate`).
+    """
+
+    def __init__(self, client_factory: Optional[Callable[[], Awaitable[Any]]] = None,
+                 persist_path: Optional[str] = None, write_messages: bool = True,
+                 max_conversations: int = 10_000, max_turns: int = 50, load_messages: int = 20,
+                 flush_interval: float = 0.5, on_persisted: Optional[Callable[[List[str]], None]] = None,
+                 fold: Optional[Callable[[RollingSummary, List[Dict[str, Any]]], Any]] = None):
+        self.client_factory = client_factory
+        self.persist_path = persist_path
+        self.write_messages = write_messages and client_factory is not None
+        self.max_conversations = max_conversations
+        self.max_turns = max_turns
+        self.load_messages = load_messages
+        self.flush_interval = flush_interval
+        self.on_persisted = on_persisted
+        self.fold = fold
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._dirty: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations (conversation_id TEXT PRIMARY KEY, "
+                "summary TEXT NOT NULL, item_ids TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(conversations)")}
+            if "version" not in columns:
+                # A file written before rows were versioned
+                self._db.execute("ALTER TABLE conversations ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_turns (conversation_id TEXT NOT NULL, id TEXT NOT NULL, "
+                "role TEXT NOT NULL, content TEXT NOT NULL, created_at TEXT NOT NULL, "
+                "PRIMARY KEY (conversation_id, id))"
+            )
+        self.hits = 0
+        self.stale_reloads = 0
+        self.local_loads = 0
+        self.remote_loads = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.messages_written = 0
+
+    # --- Reads ---
+
+    async def get(self, conversation_id: str) -> Conversation:
+        """The conversation, loaded on first use. Concurrent loads of one conversation share a query."""
+        conversation = self._conversations.get(conversation_id)
+        if conversation is not None and not await self._is_current(conversation):
+            # Another worker wrote it since this copy was loaded or stored
+            self._conversations.pop(conversation_id, None)
+            self.stale_reloads += 1
+            conversation = None
+        if conversation is not None:
+            self._conversations.move_to_end(conversation_id)
+            self.hits += 1
+            return conversation
+        conversation = self._dirty.get(conversation_id)
+        if conversation is not None:
+            # Evicted before its changes were flushed: they are newer than anything stored
+            self.hits += 1
+            return self._remember(conversation)
+        task = self._loading.get(conversation_id)
+        if task is None:
+            task = self._loading[conversation_id] = asyncio.create_task(self._load(conversation_id))
+            task.add_done_callback(lambda t: self._loading.pop(conversation_id, None))
+        return await asyncio.shield(task)
+
+    async def _is_current(self, conversation: Conversation) -> bool:
+        if self._db is None or conversation.conversation_id in self._dirty:
+            # Unflushed changes are newer than anything stored
+            return True
+        stored = await asyncio.to_thread(self._read_version, conversation.conversation_id)
+        return stored is None or stored == conversation.version
+
+    def _read_version(self, conversation_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version FROM conversations WHERE conversation_id = ?", (conversation_id,),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    async def _load(self, conversation_id: str) -> Conversation:
+        conversation = None
+        if self._db is not None:
+            conversation = await asyncio.to_thread(self._read_local, conversation_id)
+            if conversation is not None:
+                self.local_loads += 1
+        if conversation is None:
+            conversation = Conversation(conversation_id, turns=await self._read_messages(conversation_id))
+            self.remote_loads += 1
+        # A turn recorded while this load was running already created the entry
+        return self._conversations.get(conversation_id) or self._remember(conversation)
+
+    def _read_local(self, conversation_id: str) -> Optional[Conversation]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary, item_ids, version FROM conversations WHERE conversation_id = ?", (conversation_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            # Every stored turn is one the summary doesn't cover yet
+            turns = self._db.execute(
+                "SELECT id, role, content, created_at FROM conversation_turns WHERE conversation_id = ? "
+                "ORDER BY created_at", (conversation_id,),
+            ).fetchall()
+        return Conversation(
+            conversation_id,
+            turns=[{"id": i, "role": role, "content": content, "created_at": created_at}
+                   for i, role, content, created_at in turns],
+            summary=RollingSummary(text=row[0]),
+            item_ids=json.loads(row[1]),
+            version=row[2],
+        )
+
+    async def _read_messages(self, conversation_id: str) -> List[Dict[str, Any]]:
+        if self.client_factory is None:
+            return []
+        supabase = await self.client_factory()
+        response = await (
+            supabase.from_("ai_messages")
+            .select("id, role, content, created_at")
+            .eq("conversation_id", conversation_id)
+            .order("created_at", desc=True)
+            .limit(self.load_messages)
+            .execute()
+        )
+        return list(reversed(response.data))
+
+    def _remember(self, conversation: Conversation) -> Conversation:
+        conversation.summary.on_update = lambda: self._folded(conversation)
+        self._conversations[conversation.conversation_id] = conversation
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+            self.evictions += 1
+            # Unflushed changes stay queued in _dirty and are still written
+        return conversation
+
+    # --- Writes ---
+
+    def record_turn(self, conversation: Conversation, user_message: str, response: str):
+        """
+        Appends a user message and Shadow's response, and queues them to be
+        persisted. The response references the conversation's `item_ids`.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        turns = [
+            {"id": str(uuid.uuid4()), "role": "user", "content": user_message, "created_at": now.isoformat()},
+            {"id": str(uuid.uuid4()), "role": "assistant", "content": response,
+             # One microsecond later, so the pair keeps its order when sorted by time
+             "created_at": (now + datetime.timedelta(microseconds=1)).isoformat(),
+             "metadata": {"referenced_items": list(conversation.item_ids)}},
+        ]
+        conversation.turns.extend(turns)
+        if len(conversation.turns) > self.max_turns and self.fold is not None:
+            # They stay until the summary covers them; see _folded
+            self.fold(conversation.summary, conversation.turns[:-self.max_turns])
+        if self.write_messages:
+            conversation.unsaved.extend(turns)
+        self._mark_dirty(conversation)
+
+    def _folded(self, conversation: Conversation):
+        # Called once the summary covers more turns: those leave memory and SQLite
+        covered = conversation.summary.covered
+        kept = []
+        for turn in conversation.turns:
+            if turn_key(turn) in covered:
+                conversation.dropped.append(turn_key(turn))
+            else:
+                kept.append(turn)
+        conversation.turns = kept
+        covered.clear()
+        self._mark_dirty(conversation)
+
+    def _mark_dirty(self, conversation: Conversation):
+        if self._db is not None or conversation.unsaved:
+            self._dirty[conversation.conversation_id] = conversation
+
+    def invalidate(self, conversation_ids: List[str]):
+        """Drops conversations another worker changed; the next turn reloads them from SQLite."""
+        for conversation_id in conversation_ids:
+            if conversation_id not in self._dirty:
+                self._conversations.pop(conversation_id, None)
+
+    async def flush(self):
+        """Writes every queued change. Whatever fails to write is queued again."""
+        if not self._dirty:
+            return
+        batch = list(self._dirty.values())
+        self._dirty.clear()
+        unsaved = [(c, c.unsaved) for c in batch if c.unsaved]
+        snapshots = [self._snapshot(c) for c in batch] if self._db is not None else []
+        for conversation in batch:
+            conversation.unsaved, conversation.dropped = [], []
+
+        failed = False
+        if unsaved:
+            rows = [
+                {"conversation_id": conversation.conversation_id, "metadata": {}, **turn}
+                for conversation, turns in unsaved for turn in turns
+            ]
+            try:
+                supabase = await self.client_factory()
+                await supabase.from_("ai_messages").insert(rows).execute()
+                self.messages_written += len(rows)
+            except Exception as e:
+                failed = True
+                logger.warning(f"Failed to write {len(rows)} messages to ai_messages: {e}")
+                for conversation, turns in unsaved:
+                    conversation.unsaved[:0] = turns
+                    self._dirty.setdefault(conversation.conversation_id, conversation)
+        if snapshots:
+            try:
+                versions = await asyncio.to_thread(self._write_local, snapshots)
+                for conversation, version in zip(batch, versions):
+                    # None: another worker wrote in between, so this copy is reloaded on its next turn
+                    if version is not None:
+                        conversation.version = version
+            except Exception as e:
+                failed = True
+                logger.warning(f"Failed to save {len(batch)} conversations to {self.persist_path}: {e}")
+                for conversation, snapshot in zip(batch, snapshots):
+                    conversation.dropped[:0] = snapshot[4]
+                    self._dirty.setdefault(conversation.conversation_id, conversation)
+                snapshots = []
+
+        if failed:
+            self.flush_failures += 1
+        else:
+            self.flushes += 1
+        if snapshots and self.on_persisted is not None:
+            self.on_persisted([snapshot[0] for snapshot in snapshots])
+
+    @staticmethod
+    def _snapshot(conversation: Conversation) -> Tuple:
+        turns = [(t["id"], t["role"], t["content"], t["created_at"]) for t in conversation.turns if t.get("id")]
+        return (conversation.conversation_id, conversation.summary.text, json.dumps(conversation.item_ids),
+                turns, list(conversation.dropped), conversation.version)
+
+    def _write_local(self, snapshots: List[Tuple]) -> List[Optional[int]]:
+        """Writes the snapshots and returns each row's new version, or None where the copy was behind."""
+        versions = []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for conversation_id, summary, item_ids, turns, dropped, base in snapshots:
+                    row = self._db.execute(
+                        "SELECT version FROM conversations WHERE conversation_id = ?", (conversation_id,),
+                    ).fetchone()
+                    stored = row[0] if row is not None else 0
+                    if stored == base:
+                        versions.append(stored + 1)
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO conversations (conversation_id, summary, item_ids, version) "
+                            "VALUES (?, ?, ?, ?)", (conversation_id, summary, item_ids, stored + 1),
+                        )
+                    else:
+                        # Another worker wrote since this copy was loaded: keep its summary and
+                        # the turns it covers, add this copy's turns, and reload on the next turn
+                        versions.append(None)
+                        dropped = []
+                        self._db.execute(
+                            "UPDATE conversations SET version = ? WHERE conversation_id = ?",
+                            (stored + 1, conversation_id),
+                        )
+                    self._db.executemany(
+                        "INSERT OR IGNORE INTO conversation_turns (conversation_id, id, role, content, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)", [(conversation_id, *turn) for turn in turns],
+                    )
+                    self._db.executemany(
+                        "DELETE FROM conversation_turns WHERE conversation_id = ? AND id = ?",
+                        [(conversation_id, turn_id) for turn_id in dropped],
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return versions
+
+    async def run(self):
+        """Flushes queued changes every `flush_interval` seconds until stopped, then once more."""
+        while not self._stopping:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+        await self.flush()
+
+    def stop(self):
+        self._stopping = True
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "conversations": len(self._conversations),
+            "dirty": len(self._dirty),
+            "hits": self.hits,
+            "stale_reloads": self.stale_reloads,
+            "local_loads": self.local_loads,
+            "remote_loads": self.remote_loads,
+            "evictions": self.evictions,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "messages_written": self.messages_written,
+        }
@@ -0,0 +1,221 @@
+# museboard-ai-service/core/deadlines.py
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from core.telemetry import DEADLINE_FALLBACKS, LM_HEDGES
+
+logger = logging.getLogger(__name__)
+
+# Response paths, reported in the X-Museboard-Path header
+PATH_PRIMARY = "primary"      # the full module (ChainOfThought where used) on the main LM
+PATH_FAST = "fast"            # a plain Predict on the fallback LM
+PATH_CACHE = "cache"          # a previously generated answer
+PATH_DEGRADED = "degraded"    # no LM answer: the input echoed back, or sources without an answer
+
+PATH_HEADER = "X-Museboard-Path"
+
+
+class DeadlineExceeded(Exception):
+    """Raised when no tier produced an answer within the endpoint's budget."""
+
+
+class Tier(NamedTuple):
+    """
+    One way of producing an answer, tried in order by Deadline.run.
+
+    `call` starts a fresh attempt each time it is invoked (a hedge calls it
+    twice). With `lm`, the call runs with that LM in place of the default.
+    """
+    path: str
+    call: Callable[[], Awaitable[Any]]
+    hedge: bool = False
+    lm: Any = None
+
+
+def fallback_tiers(call: Callable[[bool], Awaitable[Any]], fallback_lm: Any, hedge: bool = True) -> List[Tier]:
+    """
+    The usual ladder for one LM step: `call(False)` on the main LM, hedged
+    unless `hedge` is false, then `call(True)` (the module's fast variant) on
+    the fallback LM.
+    """
+    return [
+        Tier(PATH_PRIMARY, lambda: call(False), hedge=hedge),
+        Tier(PATH_FAST, lambda: call(True), lm=fallback_lm),
+    ]
+
+
+class LatencyTracker:
+    """Recent call latencies per (endpoint, path), for the hedge delay and fallback reserve."""
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, path: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get((endpoint, path))
+            if samples is None:
+                samples = self._samples[(endpoint, path)] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def quantile(self, endpoint: str, path: str, q: float) -> Optional[float]:
+        """The q-quantile of recent latencies, or None until `min_samples` calls were seen."""
+        with self._lock:
+            samples = sorted(self._samples.get((endpoint, path), ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class DeadlinePolicy:
+    """
+    Per-endpoint latency budgets for LM calls, with fallbacks and hedging.
+
+    An endpoint starts a Deadline when the request arrives and runs its
+    tiers through it, cheapest last. Each tier gets the remaining budget
+    minus a reserve for the next one (that tier's recent p99, and at least
+    `fallback_reserve`), so a slow or failing call leaves time for the
+    fallback. A tier whose share is already spent,
+    e.g. after a long wait for a concurrency slot, is skipped.
+
+    With hedging, a tier marked `hedge` sends a duplicate call once the
+    first one has taken longer than its recent `hedge_quantile` latency;
+    whichever finishes first wins and the other is cancelled. At most
+    `hedge_max_rate` of calls are hedged, which bounds the extra LM spend.
+    """
+
+    def __init__(self, budgets: Dict[str, float], fallback_reserve: float = 3.0, enabled: bool = True,
+                 hedge: bool = True, hedge_quantile: float = 0.95, hedge_max_rate: float = 0.1,
+                 tracker: Optional[LatencyTracker] = None):
+        self.budgets = dict(budgets)
+        self.fallback_reserve = fallback_reserve
+        self.enabled = enabled
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_max_rate = hedge_max_rate
+        self.tracker = tracker or LatencyTracker()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.exhausted = 0
+
+    def start(self, endpoint: str) -> "Deadline":
+        budget = self.budgets.get(endpoint) if self.enabled else None
+        return Deadline(self, endpoint, budget)
+
+    def _reserve(self, endpoint: str, tier: Tier) -> float:
+        p99 = self.tracker.quantile(endpoint, tier.path, 0.99)
+        return max(p99 or 0.0, self.fallback_reserve)
+
+    def _hedge_delay(self, endpoint: str, tier: Tier) -> Optional[float]:
+        if not (self.hedge and tier.hedge) or self.hedges >= self.hedge_max_rate * self.calls:
+            return None
+        return self.tracker.quantile(endpoint, tier.path, self.hedge_quantile)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "exhausted": self.exhausted,
+        }
+
+
+class Deadline:
+    """The latency budget of one request; `budget` None means no limit."""
+
+    def __init__(self, policy: DeadlinePolicy, endpoint: str, budget: Optional[float]):
+        self.policy = policy
+        self.endpoint = endpoint
+        self.budget = budget
+        self.started = time.monotonic()
+
+    def remaining(self) -> Optional[float]:
+        if self.budget is None:
+            return None
+        return self.budget - (time.monotonic() - self.started)
+
+    async def run(self, tiers: List[Tier]) -> Tuple[Any, str]:
+        """
+        Returns (result, path) from the first tier that answers in time.
+        Raises DeadlineExceeded when none did; errors a tier raises other
+        than timeouts are passed on when there is no budget to fall back in.
+        """
+        if self.budget is None:
+            return await self._attempt(tiers[0], None), tiers[0].path
+
+        policy = self.policy
+        for i, tier in enumerate(tiers):
+            remaining = self.remaining()
+            reserve = policy._reserve(self.endpoint, tiers[i + 1]) if i + 1 < len(tiers) else 0.0
+            timeout = remaining - reserve
+            if timeout <= 0:
+                DEADLINE_FALLBACKS.inc(self.endpoint, tier.path, "skipped")
+                continue
+            try:
+                return await self._attempt(tier, timeout), tier.path
+            except asyncio.TimeoutError:
+                reason = "timeout"
+            except Exception as e:
+                logger.warning(f"{self.endpoint} {tier.path} path failed: {e}")
+                reason = "error"
+            policy.fallbacks += 1
+            DEADLINE_FALLBACKS.inc(self.endpoint, tier.path, reason)
+
+        policy.exhausted += 1
+        raise DeadlineExceeded(f"No answer for {self.endpoint} within {self.budget:.1f}s")
+
+    async def _timed(self, tier: Tier) -> Any:
+        started = time.monotonic()
+        failed = False
+        try:
+            if tier.lm is None:
+                return await tier.call()
+            import dspy
+
+            with dspy.context(lm=tier.lm):
+                return await tier.call()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # Cancelled calls (timed out or out-raced) count too: they took at least this long
+            if not failed:
+                self.policy.tracker.record(self.endpoint, tier.path, time.monotonic() - started)
+
+    async def _attempt(self, tier: Tier, timeout: Optional[float]) -> Any:
+        policy = self.policy
+        policy.calls += 1
+        hedge_delay = policy._hedge_delay(self.endpoint, tier)
+        first = asyncio.create_task(self._timed(tier))
+        tasks = {first}
+        try:
+            async with asyncio.timeout(timeout):
+                if hedge_delay is not None and (timeout is None or hedge_delay < timeout):
+                    done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                    if not done:
+                        policy.hedges += 1
+                        LM_HEDGES.inc(self.endpoint, "sent")
+                        tasks.add(asyncio.create_task(self._timed(tier)))
+                while True:
+                    done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            if task is not first:
+                                policy.hedge_wins += 1
+                                LM_HEDGES.inc(self.endpoint, "won")
+                            return task.result()
+                    if not tasks:
+                        raise done.pop().exception()
+        finally:
+            for task in tasks:
+                task.cancel()
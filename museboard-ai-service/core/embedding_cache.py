@@ -0,0 +1,229 @@
+# museboard-ai-service/core/embedding_cache.py
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so trivially different copies of a text share a cache entry."""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embedding vectors, keyed by a hash of
+    (model, normalized text).
+
+    Two tiers:
+    - an in-process LRU of float32 vectors, evicted by total size in bytes;
+    - an optional SQLite file, so vectors survive restarts and can be shared
+      by the API service and the backfill script.
+
+    `aembed` keeps the SQLite tier off the event loop: lookups run in a
+    thread, and new vectors are written behind in batches, every
+    `write_delay` seconds at most. `aflush` and `close` write what is left.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, persist_path: Optional[str] = None,
+                 write_delay: float = 0.25):
+        self.max_bytes = max_bytes
+        self.persist_path = persist_path
+        self.write_delay = write_delay
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Guards the SQLite connection, so memory lookups never wait on the disk
+        self._db_lock = threading.Lock()
+        self._unwritten: List[Tuple[str, int, bytes]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self.disk_writes = 0
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    # --- In-process tier ---
+
+    def _remember(self, key: str, vector: np.ndarray):
+        # Caller must hold self._lock
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    # --- Persistent tier ---
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if self._db is None or not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._db_lock:
+            rows = self._db.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys).fetchall()
+        return {key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows}
+
+    def _write_disk(self, rows: List[Tuple[str, int, bytes]]):
+        if self._db is None or not rows:
+            return
+        with self._db_lock:
+            self._db.executemany("INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)", rows)
+            self._db.commit()
+        self.disk_writes += 1
+
+    async def _write_behind(self):
+        await asyncio.sleep(self.write_delay)
+        self._writer = None
+        rows, self._unwritten = self._unwritten, []
+        try:
+            await asyncio.to_thread(self._write_disk, rows)
+        except Exception as e:
+            logger.warning(f"Failed to persist {len(rows)} embeddings: {e}")
+
+    # --- Lookups ---
+
+    def _lookup_memory(self, keys: List[str]) -> Tuple[Dict[str, np.ndarray], List[str]]:
+        """(vectors found in memory, unique keys that weren't)"""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+        return found, [key for key in dict.fromkeys(keys) if key not in found]
+
+    def _merge(self, keys: List[str], found: Dict[str, np.ndarray],
+               from_disk: Dict[str, np.ndarray]) -> List[Optional[List[float]]]:
+        with self._lock:
+            for key, vector in from_disk.items():
+                self._remember(key, vector)
+            self.persistent_hits += len(from_disk)
+            found.update(from_disk)
+            self.misses += sum(1 for key in keys if key not in found)
+        return [found[key].tolist() if key in found else None for key in keys]
+
+    def _prepare(self, model: str, texts: List[str], embeddings: List[List[float]]) -> List[Tuple[str, int, bytes]]:
+        """Remembers the vectors in memory and returns their rows for the SQLite tier."""
+        rows = []
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.make_key(model, text)
+                vector = np.asarray(embedding, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, vector.shape[0], vector.tobytes()))
+        return rows
+
+    # --- Public API ---
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Looks up several texts at once; misses come back as None."""
+        keys = [self.make_key(model, text) for text in texts]
+        found, missing = self._lookup_memory(keys)
+        return self._merge(keys, found, self._read_disk(missing))
+
+    async def aget_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """get_many() with the SQLite lookup in a thread."""
+        keys = [self.make_key(model, text) for text in texts]
+        found, missing = self._lookup_memory(keys)
+        from_disk = await asyncio.to_thread(self._read_disk, missing) if missing and self._db is not None else {}
+        return self._merge(keys, found, from_disk)
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        self._write_disk(self._prepare(model, texts, embeddings))
+
+    def aput_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """put_many() from the event loop: the vectors are in memory at once and reach SQLite in the next batch."""
+        rows = self._prepare(model, texts, embeddings)
+        if self._db is None:
+            return
+        self._unwritten.extend(rows)
+        if self._writer is None:
+            self._writer = asyncio.get_running_loop().create_task(self._write_behind())
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        self.put_many(model, [text], [embedding])
+
+    async def aembed(self, model: str, texts: List[str],
+                     embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]]) -> List[List[float]]:
+        """
+        Returns embeddings for `texts`, calling `embed_fn` only for the unique
+        texts that aren't cached yet (in one call), then caching its results.
+        """
+        results = await self.aget_many(model, texts)
+        pending: Dict[str, str] = {}
+        for text, result in zip(texts, results):
+            if result is None:
+                pending.setdefault(self.make_key(model, text), text)
+
+        if pending:
+            missing_texts = list(pending.values())
+            embeddings = await embed_fn(missing_texts)
+            self.aput_many(model, missing_texts, embeddings)
+            by_key = dict(zip(pending.keys(), embeddings))
+            results = [
+                result if result is not None else by_key[self.make_key(model, text)]
+                for text, result in zip(texts, results)
+            ]
+        return results
+
+    async def aflush(self):
+        """Writes the vectors still waiting for the next batch."""
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        rows, self._unwritten = self._unwritten, []
+        await asyncio.to_thread(self._write_disk, rows)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "unwritten": len(self._unwritten),
+                "disk_writes": self.disk_writes,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        rows, self._unwritten = self._unwritten, []
+        self._write_disk(rows)
+        if self._db is not None:
+            self._db.close()
+            self._db = None
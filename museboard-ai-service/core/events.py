@@ -0,0 +1,39 @@
+# museboard-ai-service/core/events.py
+
+import logging
+from typing import Any, Callable, Dict, List
+
+EventHandler = Callable[..., None]
+
+logger = logging.getLogger(__name__)
+
+# Emitted with (user_id, item_ids) whenever a user's muse_items are created,
+# edited or deleted. Caches and indexes keyed on a user's items subscribe to it.
+ITEMS_CHANGED = "items_changed"
+# Emitted with (origin_pid, conversation_ids) after a worker persists
+# conversations, so other workers drop their in-memory copies.
+CONVERSATIONS_CHANGED = "conversations_changed"
+
+
+class EventBus:
+    """A minimal in-process publish/subscribe hub, mirroring lib/utils/event-bus.ts."""
+
+    def __init__(self):
+        self._events: Dict[str, List[EventHandler]] = {}
+
+    def on(self, event: str, handler: EventHandler):
+        self._events.setdefault(event, []).append(handler)
+
+    def off(self, event: str, handler: EventHandler):
+        if event in self._events:
+            self._events[event] = [h for h in self._events[event] if h is not handler]
+
+    def emit(self, event: str, *args: Any, **kwargs: Any):
+        for handler in list(self._events.get(event, [])):
+            try:
+                handler(*args, **kwargs)
+            except Exception as e:
+                logger.exception(f"Error in '{event}' handler {getattr(handler, '__name__', handler)}: {e}")
+
+
+event_bus = EventBus()
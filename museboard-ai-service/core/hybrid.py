@@ -0,0 +1,58 @@
+# museboard-ai-service/core/hybrid.py
+
+import string
+from typing import Any, Dict, List, Sequence
+
+from core.lexical_index import tokenize
+
+# Weights of the reranker's features; they sum to 1 so scores stay in [0, 1]
+RERANK_WEIGHTS = {"fused": 0.5, "coverage": 0.3, "phrase": 0.1, "category": 0.1}
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Merges ranked result lists by reciprocal rank fusion: an item scores
+    sum(1 / (k + rank)) over the lists it appears in. Ranks are comparable
+    across retrievers even though cosine and BM25 scores are not. Fields an
+    item carries in several lists (e.g. "similarity" and "lexical_score")
+    are merged, and the fused score is stored as "retrieval_score".
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            entry = fused.get(item["id"])
+            if entry is None:
+                entry = fused[item["id"]] = {**item, "retrieval_score": 0.0}
+            else:
+                entry.update({key: value for key, value in item.items() if key not in entry})
+            entry["retrieval_score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda item: item["retrieval_score"], reverse=True)
+
+
+def rerank(query: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Cheap local reranker run on the fused candidates before context assembly.
+    Blends the fused score with how many query terms an item contains, whether
+    it contains the query verbatim and whether a query term names one of its
+    categories. Pure Python over a handful of candidates, so it costs well
+    under a millisecond.
+    """
+    query_terms = set(tokenize(query))
+    if not items or not query_terms:
+        return items
+    phrase = " ".join(query.casefold().split()).strip(string.punctuation + " ")
+    top_score = max(item.get("retrieval_score", 0.0) for item in items) or 1.0
+
+    def score(item: Dict[str, Any]) -> float:
+        text = f"{item.get('content') or ''} {item.get('description') or ''}"
+        categories = set(tokenize(" ".join(item.get("ai_categories") or [])))
+        features = {
+            "fused": item.get("retrieval_score", 0.0) / top_score,
+            "coverage": len(query_terms & set(tokenize(text))) / len(query_terms),
+            "phrase": float(len(query_terms) > 1 and phrase in " ".join(text.casefold().split())),
+            "category": float(bool(query_terms & categories)),
+        }
+        return sum(RERANK_WEIGHTS[name] * value for name, value in features.items())
+
+    scored = [{**item, "rerank_score": score(item)} for item in items]
+    return sorted(scored, key=lambda item: item["rerank_score"], reverse=True)
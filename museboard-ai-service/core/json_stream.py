@@ -0,0 +1,234 @@
+# museboard-ai-service/core/json_stream.py
+
+import ast
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class StructuredOutputError(ValueError):
+    """An LM's structured output held nothing usable, even after repair."""
+
+
+def repair_element(text: str) -> Any:
+    """
+    Parses one JSON value with the mistakes LMs commonly make fixed: trailing
+    commas, and Python literals (single quotes, True, None). Raises
+    ValueError if it still can't be parsed.
+    """
+    try:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", text))
+    except json.JSONDecodeError:
+        pass
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        raise ValueError(f"Not a JSON value: {text[:80]!r}")
+    # Only what JSON itself can express
+    json.dumps(value)
+    return value
+
+
+class _Frame:
+    """An open object or array while scanning."""
+    __slots__ = ("kind", "key", "expect_key", "emit", "element_start")
+
+    def __init__(self, kind: str, key: Optional[str], emit: bool):
+        self.kind = kind
+        # Object: the key whose value is being read. Array: the key it is the value of.
+        self.key = key
+        self.expect_key = kind == "{"
+        # Whether this array's elements are reported by feed()
+        self.emit = emit
+        self.element_start: Optional[int] = None
+
+
+class JSONItemStream:
+    """
+    Incremental parser for a JSON document that arrives in chunks, such as
+    an LM completion being streamed. feed() returns every element of the
+    document's top-level arrays as soon as that element is complete, as
+    (key, value) pairs: the key of the root object the array belongs to, or
+    None when the document itself is an array. For
+
+        {"content": [{"type": "quote", ...}, {...}], "categories": ["Focus"]}
+
+    each content object is returned once its closing brace arrives, long
+    before the LM has written the rest of the document.
+
+    Text before the first { or [ (a preamble, a ``` fence) is skipped.
+    Scanning is linear overall: each chunk is scanned once, and only
+    complete elements are handed to json.loads. An element that isn't valid
+    JSON goes through repair_element (counted in `repaired`), and is skipped
+    if that fails too (counted in `invalid`).
+
+    When the document is cut off or broken, salvage() rebuilds it from the
+    elements that did arrive, so a truncated completion still yields most of
+    its content without calling the LM again.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._root_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+        self._root_kind: Optional[str] = None
+        # Emitted elements by array key, for salvage()
+        self._arrays: Dict[Optional[str], List[Any]] = {}
+        self.emitted = 0
+        self.repaired = 0
+        self.invalid = 0
+
+    @property
+    def started(self) -> bool:
+        return self._root_start is not None
+
+    @property
+    def done(self) -> bool:
+        return self._root_end is not None
+
+    @property
+    def clean(self) -> bool:
+        """Whether the document is complete with nothing but whitespace around it."""
+        if self._root_start is None or self._root_end is None:
+            return False
+        return not (self._buffer[:self._root_start].strip() or self._buffer[self._root_end:].strip())
+
+    def feed(self, chunk: str) -> List[Tuple[Optional[str], Any]]:
+        self._buffer += chunk
+        elements: List[Tuple[Optional[str], Any]] = []
+        if self._root_end is not None:
+            return elements
+        buffer = self._buffer
+        stack = self._stack
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._string_closed(i, elements)
+                i += 1
+                continue
+
+            if self._root_start is None:
+                if char in "{[":
+                    self._root_start = i
+                    self._root_kind = char
+                    self._open(char)
+                i += 1
+                continue
+
+            top = stack[-1]
+            if char in _WHITESPACE:
+                pass
+            elif char == '"':
+                self._begin_element(top, i)
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                self._begin_element(top, i)
+                self._open(char)
+            elif char in "}]":
+                if top.kind == "[" and top.element_start is not None:
+                    # A number or literal ended by the closing bracket
+                    self._element_done(top, i, elements)
+                stack.pop()
+                if not stack:
+                    self._root_end = i + 1
+                    i += 1
+                    break
+                parent = stack[-1]
+                if parent.kind == "[" and parent.element_start is not None:
+                    self._element_done(parent, i + 1, elements)
+            elif char == ",":
+                if top.kind == "[" and top.element_start is not None:
+                    self._element_done(top, i, elements)
+                elif top.kind == "{":
+                    top.expect_key = True
+            elif char != ":":
+                self._begin_element(top, i)
+            i += 1
+        self._pos = i
+        return elements
+
+    def close(self) -> Optional[Any]:
+        """The whole document, or None if it didn't arrive complete and valid."""
+        if self._root_start is None or self._root_end is None:
+            return None
+        try:
+            return json.loads(self._buffer[self._root_start:self._root_end])
+        except json.JSONDecodeError:
+            return None
+
+    def salvage(self) -> Optional[Any]:
+        """
+        The whole document if it is complete and valid, else one rebuilt from
+        the array elements completed so far ({key: [elements]} for an object,
+        [elements] for an array), or None if nothing usable arrived.
+        """
+        document = self.close()
+        if document is not None:
+            return document
+        if not self._arrays:
+            return None
+        if self._root_kind == "[":
+            return list(self._arrays.get(None, []))
+        return {key: list(values) for key, values in self._arrays.items()}
+
+    # --- Scanning ---
+
+    def _open(self, kind: str):
+        stack = self._stack
+        if kind == "[":
+            # Arrays that are the document, or a value of the root object
+            emit = not stack or (len(stack) == 1 and stack[0].kind == "{")
+            key = stack[-1].key if stack and stack[-1].kind == "{" else None
+            stack.append(_Frame("[", key, emit))
+        else:
+            stack.append(_Frame("{", None, False))
+
+    @staticmethod
+    def _begin_element(frame: _Frame, i: int):
+        if frame.kind == "[" and frame.element_start is None:
+            frame.element_start = i
+
+    def _string_closed(self, i: int, elements):
+        top = self._stack[-1]
+        if top.kind == "{" and top.expect_key:
+            try:
+                top.key = json.loads(self._buffer[self._string_start:i + 1])
+            except json.JSONDecodeError:
+                top.key = None
+            top.expect_key = False
+        elif top.kind == "[" and top.element_start == self._string_start:
+            self._element_done(top, i + 1, elements)
+
+    def _element_done(self, frame: _Frame, end: int, elements):
+        start, frame.element_start = frame.element_start, None
+        if not frame.emit:
+            return
+        text = self._buffer[start:end]
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                value = repair_element(text)
+            except ValueError:
+                self.invalid += 1
+                return
+            self.repaired += 1
+        self.emitted += 1
+        self._arrays.setdefault(frame.key, []).append(value)
+        elements.append((frame.key, value))
@@ -0,0 +1,159 @@
+# museboard-ai-service/core/lexical_index.py
+
+import heapq
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+from core.user_index import UserIndexCache
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Function words that would otherwise match nearly every item
+STOPWORDS = frozenset("""
+a about an and are as at be but by can did do does for from had has have how i if in into is it its me my
+of on or our so that the their them then there these they this to was we were what when where which who
+why will with you your
+""".split())
+
+# Category labels are short and deliberate, so a match on one counts for more than a word in the content
+FIELD_WEIGHTS = {"content": 1.0, "description": 1.0, "ai_categories": 2.0}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords, with a plural "s" stripped so "notes" matches "note"."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.casefold()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def item_terms(item: Dict[str, Any]) -> Dict[str, float]:
+    """Field-weighted term frequencies of an item's content, description and categories."""
+    terms: Dict[str, float] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = item.get(field)
+        if not value:
+            continue
+        text = " ".join(value) if isinstance(value, list) else str(value)
+        for token in tokenize(text):
+            terms[token] = terms.get(token, 0.0) + weight
+    return terms
+
+
+class UserLexicalIndex:
+    """
+    One user's items as a BM25 inverted index. Postings are kept per term
+    and updated in place, so upserting or removing an item only touches the
+    terms it contains.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._terms: Dict[str, Dict[str, float]] = {}
+        self._lengths: Dict[str, float] = {}
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def upsert(self, item: Dict[str, Any]):
+        item_id = item["id"]
+        if item_id in self._items:
+            self.remove(item_id)
+        terms = item_terms(item)
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[item_id] = frequency
+        self._terms[item_id] = terms
+        self._lengths[item_id] = length = sum(terms.values())
+        self._items[item_id] = item
+        self._total_length += length
+
+    def bulk_load(self, items: List[Dict[str, Any]]):
+        for item in items:
+            self.upsert(item)
+
+    def remove(self, item_id: str):
+        terms = self._terms.pop(item_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[item_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(item_id)
+        del self._items[item_id]
+
+    def search(self, query: str, match_count: int, min_coverage: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Top-k items by BM25 score. Items matching fewer than `min_coverage` of
+        the query's distinct terms are dropped, so one common word can't pull
+        in unrelated items.
+        """
+        query_terms = set(tokenize(query))
+        if not query_terms or not self._items or match_count <= 0:
+            return []
+        count = len(self._items)
+        average_length = self._total_length / count or 1.0
+
+        scores: Dict[str, float] = {}
+        matched: Dict[str, int] = {}
+        for term in query_terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for item_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[item_id] / average_length)
+                scores[item_id] = scores.get(item_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+                matched[item_id] = matched.get(item_id, 0) + 1
+
+        needed = min_coverage * len(query_terms)
+        top = heapq.nlargest(
+            match_count,
+            ((score, item_id) for item_id, score in scores.items() if matched[item_id] >= needed),
+        )
+        return [{**self._items[item_id], "lexical_score": score} for score, item_id in top]
+
+
+class LocalLexicalIndex(UserIndexCache):
+    """
+    Keyword retrieval engine holding a UserLexicalIndex per user, warmed and
+    kept current as described in UserIndexCache. Unlike the vector index it
+    covers items whose embedding hasn't been generated yet. Scans run in a
+    worker thread, so a large index never holds up the event loop.
+    """
+
+    def __init__(self, client_factory, max_items: int = 1_000_000, page_size: int = 1000,
+                 min_coverage: float = 0.5, max_age: Optional[float] = None):
+        super().__init__(client_factory, max_items=max_items, page_size=page_size, max_age=max_age)
+        self.min_coverage = min_coverage
+
+    def _load_page(self, index: Optional[UserLexicalIndex], rows: List[Dict[str, Any]]) -> UserLexicalIndex:
+        if index is None:
+            index = UserLexicalIndex()
+        index.bulk_load(rows)
+        return index
+
+    def _apply(self, index: UserLexicalIndex, item_id: str, row: Optional[Dict[str, Any]]):
+        if row is None:
+            index.remove(item_id)
+        else:
+            index.upsert(row)
+
+    async def search(self, user_id: str, query: str, match_count: int) -> List[Dict[str, Any]]:
+        return await self.query(user_id, lambda index: index.search(query, match_count, self.min_coverage), [])
+
+    async def search_many(self, user_id: str, queries: List[str], match_count: int) -> List[List[Dict[str, Any]]]:
+        return await self.query(
+            user_id, lambda index: [index.search(query, match_count, self.min_coverage) for query in queries],
+            [[] for _ in queries],
+        )
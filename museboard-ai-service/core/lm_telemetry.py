@@ -0,0 +1,54 @@
+# museboard-ai-service/core/lm_telemetry.py
+
+import time
+from typing import Dict, Tuple
+
+import dspy
+from dspy.utils.callback import BaseCallback
+
+from core.telemetry import LM_CALLS, LM_DURATION, LM_TOKENS
+
+
+class LMTelemetryCallback(BaseCallback):
+    """
+    Records LM latency, token usage and cache hits.
+
+    DSPy adds an entry to the active usage tracker for every call that went
+    to the provider and none for a cache hit, so comparing the tracker before
+    and after a call tells the two apart. Requires dspy.configure(track_usage=True).
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Tuple[str, float, object, int]] = {}
+
+    @staticmethod
+    def _tracked_entries(tracker, model: str) -> int:
+        return len(tracker.usage_data.get(model, ())) if tracker is not None else 0
+
+    def on_lm_start(self, call_id, instance, inputs):
+        model = getattr(instance, "model", "unknown")
+        tracker = dspy.settings.usage_tracker
+        self._calls[call_id] = (model, time.perf_counter(), tracker, self._tracked_entries(tracker, model))
+
+    def on_lm_end(self, call_id, outputs, exception=None):
+        call = self._calls.pop(call_id, None)
+        if call is None:
+            return
+        model, started, tracker, entries_before = call
+        LM_DURATION.observe(time.perf_counter() - started, model)
+
+        if exception is not None:
+            LM_CALLS.inc(model, "error")
+            return
+        if tracker is None:
+            LM_CALLS.inc(model, "miss")
+            return
+
+        new_entries = tracker.usage_data.get(model, [])[entries_before:]
+        if not new_entries:
+            LM_CALLS.inc(model, "hit")
+            return
+        LM_CALLS.inc(model, "miss")
+        for usage in new_entries:
+            LM_TOKENS.inc(model, "prompt", amount=usage.get("prompt_tokens") or 0)
+            LM_TOKENS.inc(model, "completion", amount=usage.get("completion_tokens") or 0)
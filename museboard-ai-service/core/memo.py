@@ -0,0 +1,139 @@
+# museboard-ai-service/core/memo.py
+
+import asyncio
+import string
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.embedding_cache import normalize_text
+from core.shared_cache import SharedCache
+
+
+def normalize_key(text: str) -> str:
+    """
+    Case-, whitespace- and trailing-punctuation-insensitive form of a user
+    input, so "Build a startup." and "build a  startup" share an entry.
+    """
+    return normalize_text(text).casefold().strip(string.punctuation + " ")
+
+
+class SingleFlightCache:
+    """
+    TTL-bounded memo cache with single-flight coalescing.
+
+    Concurrent calls for the same key share one in-flight computation, and
+    its result is then served from memory until it expires after
+    `ttl_seconds`. Failures are passed to every waiter but never cached.
+    The least recently used entries are evicted once `max_entries` is reached.
+
+    With a `shared` cache, results (which must be JSON) are also stored there
+    under `namespace`, so a result computed by one worker process is served
+    by the others instead of being recomputed.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 5000, shared: Optional[SharedCache] = None,
+                 namespace: str = "memo"):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.shared = shared
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.failures = 0
+
+    def _cached(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remember(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic(), value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _run(self, key: str, compute: Callable[[], Awaitable[Any]],
+                   cacheable: Optional[Callable[[Any], bool]]) -> Any:
+        try:
+            value = await compute()
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        if cacheable is None or cacheable(value):
+            self.store(key, value)
+        return value
+
+    async def peek(self, key: str) -> Optional[Any]:
+        """The cached value for `key`, or None. Never computes."""
+        entry = self._cached(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        if self.shared is not None:
+            value = await self.shared.aget(f"{self.namespace}:{key}")
+            if value is not None:
+                self.shared_hits += 1
+                self._remember(key, value)
+                return value
+        return None
+
+    def store(self, key: str, value: Any):
+        """Caches a value computed outside get_or_compute (e.g. by a stream)."""
+        self._remember(key, value)
+        if self.shared is not None:
+            self.shared.aset(f"{self.namespace}:{key}", value, self.ttl_seconds)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                             cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        The cached value for `key`, else the result of `compute()`, which is
+        cached unless `cacheable(result)` is false (it is still returned to
+        every waiter).
+        """
+        entry = self._cached(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+
+        if self.shared is not None and key not in self._inflight:
+            value = await self.shared.aget(f"{self.namespace}:{key}")
+            if value is not None:
+                self.shared_hits += 1
+                self._remember(key, value)
+                return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._inflight[key] = asyncio.create_task(self._run(key, compute, cacheable))
+            # Keeps an unobserved failure (every caller disconnected) from being logged as never retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        # Shielded so one caller disconnecting doesn't cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, float]:
+        requests = self.hits + self.shared_hits + self.coalesced + self.misses
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "failures": self.failures,
+            "dedup_rate": (self.hits + self.shared_hits + self.coalesced) / requests if requests else 0.0,
+        }
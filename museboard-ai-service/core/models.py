@@ -30,8 +30,11 @@ class ShadowContext(BaseModel):
     topCategories: List[str]
     conversationHistory: List[AIMessage]
 
-# This is the expected request body for our main chat endpoint
+# This is the expected request body for our main chat endpoint. With a
+# user_id the service builds the context from its own profile of the user,
+# so the client no longer needs to query and send its items on every turn.
 class ShadowChatRequest(BaseModel):
-    context: ShadowContext
     user_message: str = Field(..., min_length=1)
-    conversation_id: str
\ No newline at end of file
+    conversation_id: str
+    user_id: Optional[str] = None
+    context: Optional[ShadowContext] = None
\ No newline at end of file
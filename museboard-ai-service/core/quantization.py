@@ -0,0 +1,102 @@
+# museboard-ai-service/core/quantization.py
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+SCHEMES = ("int8", "binary")
+
+# Components converted to float32 at a time when scanning int8 codes; numpy
+# has no fast int8 matrix product, and converting in blocks keeps the copy in cache.
+_SCAN_BLOCK_VALUES = 1 << 18
+
+
+def reduce_dimensions(vectors, dims: int) -> np.ndarray:
+    """
+    Shortens embeddings to their first `dims` components and renormalizes them.
+
+    text-embedding-3 models are trained so that a prefix of an embedding is
+    itself a usable embedding; this is what the API returns when asked for
+    `dimensions=dims`, so one full-size embedding yields both forms.
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))[:, :dims]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector quantization: each row is approximated by codes * scale, with scale = max|x| / 127."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """One bit per component (its sign), packed eight to a byte."""
+    return np.packbits(vectors > 0, axis=1)
+
+
+class CompactCodec:
+    """
+    Encodes L2-normalized embeddings as compact codes and scores queries
+    against them.
+
+    `int8` keeps `dims` int8 components and a float32 scale per vector, and
+    scores approximate the cosine similarity of the reduced vectors. `binary`
+    keeps one bit per component; its scores only rank candidates (fewer
+    differing bits first) and must be rescored before use as similarities.
+    """
+
+    def __init__(self, dims: int = 512, scheme: str = "int8"):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown quantization scheme {scheme!r}; expected one of {SCHEMES}")
+        if scheme == "binary" and dims % 64:
+            raise ValueError("Binary codes need a multiple of 64 dimensions")
+        self.dims = dims
+        self.scheme = scheme
+
+    @property
+    def code_width(self) -> int:
+        """Bytes of code per vector, not counting the int8 scale."""
+        return self.dims if self.scheme == "int8" else self.dims // 8
+
+    @property
+    def code_dtype(self):
+        return np.int8 if self.scheme == "int8" else np.uint8
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.code_width + (4 if self.scheme == "int8" else 0)
+
+    @property
+    def yields_similarity(self) -> bool:
+        """Whether scores can stand in for cosine similarities without rescoring."""
+        return self.scheme == "int8"
+
+    def encode(self, vectors) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Returns (codes, scales) for an (n, dim) array; scales is None for binary codes."""
+        reduced = reduce_dimensions(vectors, self.dims)
+        if self.scheme == "int8":
+            return quantize_int8(reduced)
+        return quantize_binary(reduced), None
+
+    def scores(self, queries, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        """A (queries x codes) score matrix; higher is more similar."""
+        reduced = reduce_dimensions(queries, self.dims)
+        if self.scheme == "binary":
+            # Hamming distance over 64-bit words, negated so higher is better
+            # (np.bitwise_count needs NumPy 2.0, as pinned in requirements.txt)
+            words = codes.view(np.uint64)
+            query_words = quantize_binary(reduced).view(np.uint64)
+            return -np.stack([
+                np.bitwise_count(words ^ query).sum(axis=1, dtype=np.int32) for query in query_words
+            ]).astype(np.float32)
+
+        scores = np.empty((len(reduced), len(codes)), dtype=np.float32)
+        block_rows = max(1, _SCAN_BLOCK_VALUES // self.dims)
+        for start in range(0, len(codes), block_rows):
+            block = codes[start:start + block_rows].astype(np.float32)
+            scores[:, start:start + len(block)] = reduced @ block.T
+        return scores * scales
@@ -0,0 +1,246 @@
+# museboard-ai-service/core/shared_cache.py
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def default_shared_path(name: str) -> str:
+    """A file in shared memory (/dev/shm) when the host has it, else in the temp directory."""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else (os.getenv("TMPDIR") or "/tmp")
+    return os.path.join(directory, name)
+
+
+class SharedCache:
+    """
+    A key-value cache that every worker process on the host reads and writes,
+    kept in one SQLite file (in WAL mode, so readers never wait on a writer).
+    Placed on /dev/shm it lives in shared memory and a lookup costs tens of
+    microseconds, well under any LM or embeddings round-trip.
+
+    Values are JSON and expire after their TTL. Once the cache holds more
+    than `max_entries`, `prune` drops the entries closest to expiry.
+
+    The event loop uses the `a`-prefixed methods: lookups run in a worker
+    thread, since a writer in another process can hold the file for up to
+    the busy timeout, and writes and events are queued and written in
+    batches by a background task, as EmbeddingCache does.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # The cache is rebuilt from scratch if lost, so commits needn't wait for the disk
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, origin INTEGER NOT NULL, "
+            "event TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._unwritten: List[Tuple[str, str, float]] = []
+        self._unpublished: List[Tuple[int, str, str, float]] = []
+        self._writer: Optional[asyncio.Task] = None
+        # COUNT(*) scans the table, so the entry count is taken when pruning
+        self.entries = self._execute("SELECT COUNT(*) FROM cache")[0][0]
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _execute(self, sql: str, params=()) -> List[Tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # --- Key-value tier ---
+
+    # Lookups and writes never fail the caller: a broken shared tier is only a miss
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            rows = self._execute("SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time()))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache read failed: {e}")
+            rows = []
+        if not rows:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(rows[0][0])
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        try:
+            self._write([(key, json.dumps(value), time.time() + ttl_seconds)], [])
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache write failed: {e}")
+
+    def aset(self, key: str, value: Any, ttl_seconds: float):
+        """set() from the event loop: the entry reaches SQLite in the next batch."""
+        self._unwritten.append((key, json.dumps(value), time.time() + ttl_seconds))
+        self._schedule_write()
+
+    # --- Event log ---
+
+    def publish(self, event: str, payload: Any):
+        self._write([], [(os.getpid(), event, json.dumps(payload), time.time())])
+
+    def apublish(self, event: str, payload: Any):
+        """publish() from the event loop: the event reaches the log in the next batch."""
+        self._unpublished.append((os.getpid(), event, json.dumps(payload), time.time()))
+        self._schedule_write()
+
+    def last_event_id(self) -> int:
+        return self._execute("SELECT COALESCE(MAX(id), 0) FROM events")[0][0]
+
+    def events_since(self, after_id: int) -> List[Tuple[int, int, str, Any]]:
+        """(id, origin pid, event, payload) for every event published after `after_id`."""
+        rows = self._execute("SELECT id, origin, event, payload FROM events WHERE id > ? ORDER BY id", (after_id,))
+        return [(row[0], row[1], row[2], json.loads(row[3])) for row in rows]
+
+    async def aevents_since(self, after_id: int) -> List[Tuple[int, int, str, Any]]:
+        return await asyncio.to_thread(self.events_since, after_id)
+
+    # --- Writes ---
+
+    def _write(self, entries: List[Tuple[str, str, float]], events: List[Tuple[int, str, str, float]]):
+        with self._lock:
+            if entries:
+                self._db.executemany("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", entries)
+            if events:
+                self._db.executemany(
+                    "INSERT INTO events (origin, event, payload, created_at) VALUES (?, ?, ?, ?)", events
+                )
+        self.writes += len(entries)
+
+    def _schedule_write(self):
+        if self._writer is None:
+            self._writer = asyncio.get_running_loop().create_task(self._write_behind())
+
+    async def _write_behind(self):
+        # Whatever is queued while a batch is being written goes in the next one
+        try:
+            while self._unwritten or self._unpublished:
+                entries, self._unwritten = self._unwritten, []
+                events, self._unpublished = self._unpublished, []
+                try:
+                    await asyncio.to_thread(self._write, entries, events)
+                except sqlite3.Error as e:
+                    logger.warning(f"Shared cache write of {len(entries)} entries and {len(events)} events failed: {e}")
+        finally:
+            self._writer = None
+
+    async def aflush(self):
+        """Writes the entries and events still waiting for the next batch."""
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        entries, self._unwritten = self._unwritten, []
+        events, self._unpublished = self._unpublished, []
+        await asyncio.to_thread(self._write, entries, events)
+
+    # --- Housekeeping ---
+
+    def prune(self, event_retention_seconds: float = 300):
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.execute("DELETE FROM events WHERE created_at < ?", (now - event_retention_seconds,))
+            self.entries = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    async def aprune(self, event_retention_seconds: float = 300):
+        await asyncio.to_thread(self.prune, event_retention_seconds)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            # As of the last prune
+            "entries": self.entries,
+            "unwritten": len(self._unwritten) + len(self._unpublished),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        entries, self._unwritten = self._unwritten, []
+        events, self._unpublished = self._unpublished, []
+        self._write(entries, events)
+        with self._lock:
+            self._db.close()
+
+
+class SharedEventRelay:
+    """
+    Carries events between worker processes through a SharedCache's event log.
+
+    Events emitted on this process's bus are published to the log, and `run`
+    polls the log and re-emits the events other workers published, so a
+    notification that reached one worker (e.g. items-changed) reaches all.
+    """
+
+    def __init__(self, cache: SharedCache, event_bus, events: List[str], poll_interval: float = 0.5,
+                 prune_interval: float = 60.0):
+        self.cache = cache
+        self.event_bus = event_bus
+        self.poll_interval = poll_interval
+        self.prune_interval = prune_interval
+        self._last_id = cache.last_event_id()
+        self._replaying = False
+        self.published = 0
+        self.replayed = 0
+        for event in events:
+            event_bus.on(event, self._publisher(event))
+
+    def _publisher(self, event: str) -> Callable[..., None]:
+        def publish(*args):
+            if not self._replaying:
+                self.cache.apublish(event, list(args))
+                self.published += 1
+        publish.__name__ = f"publish_{event}"
+        return publish
+
+    async def poll(self):
+        pid = os.getpid()
+        for event_id, origin, event, args in await self.cache.aevents_since(self._last_id):
+            self._last_id = event_id
+            if origin == pid:
+                continue
+            self._replaying = True
+            try:
+                self.event_bus.emit(event, *args)
+            finally:
+                self._replaying = False
+            self.replayed += 1
+
+    async def run(self):
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+                if time.monotonic() - last_prune > self.prune_interval:
+                    await self.cache.aprune()
+                    last_prune = time.monotonic()
+            except Exception as e:
+                logger.warning(f"Shared event relay failed to poll: {e}")
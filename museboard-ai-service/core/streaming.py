@@ -0,0 +1,42 @@
+# museboard-ai-service/core/streaming.py
+
+import json
+from typing import TYPE_CHECKING, Any, AsyncIterator, Tuple
+
+if TYPE_CHECKING:
+    import dspy
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stops reverse proxies (e.g. nginx) from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_field(program: "dspy.Module", field: str, **kwargs) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Runs a DSPy program and yields ("token", text) for each chunk of `field`
+    as the LM produces it, then ("prediction", prediction) once it finishes.
+
+    Listeners keep per-stream state, so a fresh one is built for every call.
+    """
+    # Imported here so the SSE helpers above stay cheap to import
+    import dspy
+    from dspy.streaming import StreamListener, StreamResponse
+
+    streaming_program = dspy.streamify(
+        program,
+        stream_listeners=[StreamListener(signature_field_name=field)],
+        is_async_program=True,
+    )
+    async for value in streaming_program(**kwargs):
+        if isinstance(value, StreamResponse):
+            if value.chunk:
+                yield "token", value.chunk
+        elif isinstance(value, dspy.Prediction):
+            yield "prediction", value
@@ -0,0 +1,261 @@
+# museboard-ai-service/core/telemetry.py
+
+import bisect
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from cache hits up to long ChainOfThought generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_ID_HEADER = "x-request-id"
+
+
+# --- Request Context ---
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+# Stages recorded for the current request, as (stage, seconds) pairs
+_trace_var: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("trace", default=None)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps every log record with the ID of the request it was logged under."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+def configure_logging(level: str = "INFO"):
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+# --- Metric Types ---
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total:g}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    """Holds the service's metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._gauge_callbacks: List[Tuple[str, str, Sequence[str], Callable[[], Iterable[Tuple[Sequence[str], float]]]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(self, name: str, help: str, labelnames: Sequence[str],
+                       callback: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        """Registers a gauge whose (labels, value) samples are read from `callback` at scrape time."""
+        self._gauge_callbacks.append((name, help, tuple(labelnames), callback))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for name, help, labelnames, callback in self._gauge_callbacks:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            try:
+                for labels, value in callback():
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {float(value):g}")
+            except Exception as e:
+                logger.warning(f"Failed to collect gauge {name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    "museboard_request_duration_seconds", "HTTP request latency, until the last body byte is sent.",
+    ("endpoint", "method", "status"),
+)
+STAGE_DURATION = registry.histogram(
+    "museboard_stage_duration_seconds", "Latency of individual pipeline stages.", ("stage",),
+)
+LM_DURATION = registry.histogram(
+    "museboard_lm_duration_seconds", "Latency of LM calls, including cache hits.", ("model",),
+)
+LM_CALLS = registry.counter(
+    "museboard_lm_calls_total", "LM calls by outcome: hit (served from the DSPy cache), miss or error.",
+    ("model", "result"),
+)
+LM_TOKENS = registry.counter(
+    "museboard_lm_tokens_total", "Tokens billed by the LM provider.", ("model", "kind"),
+)
+LM_HEDGES = registry.counter(
+    "museboard_lm_hedges_total", "Duplicate LM calls sent after a slow first call, and how many of them won.",
+    ("endpoint", "outcome"),
+)
+DEADLINE_FALLBACKS = registry.counter(
+    "museboard_deadline_fallbacks_total", "Response paths given up on: timed out, failed, or skipped for lack of budget.",
+    ("endpoint", "path", "reason"),
+)
+RESPONSE_PATHS = registry.counter(
+    "museboard_response_paths_total", "Responses by the path that produced them (primary, fast, cache, degraded).",
+    ("endpoint", "path"),
+)
+STRUCTURED_OUTPUTS = registry.counter(
+    "museboard_structured_outputs_total",
+    "Structured LM outputs by how they parsed: valid, repaired, salvaged (cut off) or failed.",
+    ("program", "outcome"),
+)
+
+
+# --- Tracing ---
+
+@contextmanager
+def span(stage: str):
+    """Times one stage of the current request into the stage histogram and the request's trace."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage)
+        trace = _trace_var.get()
+        if trace is not None:
+            trace.append((stage, elapsed))
+
+
+def format_trace(trace: List[Tuple[str, float]]) -> str:
+    return " ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in trace)
+
+
+class RequestTelemetryMiddleware:
+    """
+    ASGI middleware that assigns each request an ID (reusing the caller's
+    X-Request-ID if present), echoes it in the response headers, records the
+    request in the latency histogram and logs a one-line trace of its stages.
+
+    Written against raw ASGI rather than BaseHTTPMiddleware so streaming
+    responses pass through untouched and are timed until their last byte.
+    """
+
+    def __init__(self, app, excluded_paths: Sequence[str] = ("/metrics", "/")):
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_ID_HEADER.encode("latin-1"):
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        request_id_token = request_id_var.set(request_id)
+        trace: List[Tuple[str, float]] = []
+        trace_token = _trace_var.set(trace)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.encode("latin-1"), request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            # Label by route template so unknown paths can't blow up the series count
+            endpoint = getattr(route, "path", "unmatched")
+            if scope["path"] not in self.excluded_paths:
+                REQUEST_DURATION.observe(elapsed, endpoint, scope["method"], str(status))
+                logger.info(
+                    f"{scope['method']} {scope['path']} {status} {elapsed * 1000:.0f}ms {format_trace(trace)}".rstrip()
+                )
+            _trace_var.reset(trace_token)
+            request_id_var.reset(request_id_token)
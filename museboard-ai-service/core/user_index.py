@@ -0,0 +1,259 @@
+# museboard-ai-service/core/user_index.py
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Columns returned with each match, mirroring what match_muse_items hands back to the client.
+ITEM_COLUMNS = "id, user_id, content, content_type, description, source_url, ai_categories, created_at"
+
+
+class _UserLock:
+    """A user's lock, and how many callers hold or wait for it."""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class UserIndexCache:
+    """
+    Holds one in-memory index per user, built from their muse_items rows.
+
+    A user's index is warmed from Supabase on their first search and kept up
+    to date through items-changed events: changed items are marked stale and
+    re-fetched before the next search. Not every writer announces its
+    changes, so with `max_age` an index older than that many seconds is also
+    rebuilt in the background, and swapped in once it is loaded; until then
+    the current one keeps serving. Whole user indexes are evicted LRU once
+    the total number of indexed items exceeds `max_items`.
+
+    Subclasses decide which columns to load and how rows become an index
+    through `_load_page` and `_apply`. Both run in a worker thread (parsing
+    a page of embeddings takes a good fraction of a second), one at a time
+    per user: warm-ups build an index no one else sees yet, and refreshes
+    hold the user's lock, as searches do. A subclass whose index is read
+    outside `query` sets `refresh_in_thread` false.
+    """
+
+    # Columns selected when warming and refreshing, in addition to ITEM_COLUMNS
+    extra_columns: tuple = ()
+    refresh_in_thread = True
+
+    def __init__(self, client_factory: Callable[[], Awaitable[Any]], max_items: int = 1_000_000,
+                 page_size: int = 1000, max_age: Optional[float] = None):
+        self.client_factory = client_factory
+        self.max_items = max_items
+        self.page_size = page_size
+        self.max_age = max_age
+        self._indexes: "OrderedDict[str, Any]" = OrderedDict()
+        self._built_at: Dict[str, float] = {}
+        self._stale: Dict[str, Set[str]] = {}
+        self._locks: Dict[str, _UserLock] = {}
+        self._rebuilding: Dict[str, asyncio.Task] = {}
+        self.warms = 0
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.evictions = 0
+
+    # --- Subclass Hooks ---
+
+    def _filter_warm(self, query):
+        """Narrows the warm-up query, e.g. to rows that have an embedding."""
+        return query
+
+    def _load_page(self, index: Optional[Any], rows: List[Dict[str, Any]]) -> Any:
+        """Adds a page of rows to `index` (None before the first page) and returns the index."""
+        raise NotImplementedError
+
+    def _apply(self, index: Any, item_id: str, row: Optional[Dict[str, Any]]):
+        """Upserts a refreshed row, or removes the item when `row` is None (deleted or no longer indexable)."""
+        raise NotImplementedError
+
+    def _is_live(self, row: Dict[str, Any]) -> bool:
+        return row.get("deleted_at") is None
+
+    # --- Keeping indexes current ---
+
+    def _columns(self, *extra: str) -> str:
+        return ", ".join((ITEM_COLUMNS,) + self.extra_columns + extra)
+
+    def _warm_columns(self) -> str:
+        return self._columns()
+
+    def _refresh_columns(self) -> str:
+        return self._columns("deleted_at")
+
+    def mark_stale(self, user_id: str, item_ids: Optional[List[str]] = None):
+        """
+        Subscriber for items-changed events. Without item IDs the user's whole
+        index is dropped and rebuilt on their next search.
+        """
+        if user_id not in self._indexes:
+            return
+        if not item_ids:
+            self._drop(user_id)
+            return
+        self._stale.setdefault(user_id, set()).update(item_ids)
+
+    def _drop(self, user_id: str):
+        self._indexes.pop(user_id, None)
+        self._built_at.pop(user_id, None)
+        self._stale.pop(user_id, None)
+        # The lock goes with the index, unless a caller still holds or waits for it
+        entry = self._locks.get(user_id)
+        if entry is not None and not entry.users:
+            del self._locks[user_id]
+
+    @asynccontextmanager
+    async def _locked(self, user_id: str):
+        entry = self._locks.get(user_id)
+        if entry is None:
+            entry = self._locks[user_id] = _UserLock()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            # Users without an index (nothing to index, or evicted meanwhile) don't keep a lock
+            if not entry.users and user_id not in self._indexes and self._locks.get(user_id) is entry:
+                del self._locks[user_id]
+
+    async def _warm(self, user_id: str) -> Optional[Any]:
+        client = await self.client_factory()
+        index = None
+        last_id = None
+        while True:
+            query = self._filter_warm(
+                client.from_("muse_items")
+                .select(self._warm_columns())
+                .eq("user_id", user_id)
+                .is_("deleted_at", "null")
+            ).order("id").limit(self.page_size)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            rows = (await query.execute()).data
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            index = await asyncio.to_thread(self._load_page, index, rows)
+        self.warms += 1
+        return index
+
+    async def _refresh(self, user_id: str, index: Any):
+        item_ids = list(self._stale.pop(user_id, ()))
+        if not item_ids:
+            return
+        client = await self.client_factory()
+        # Scoped to the user: the IDs come from items-changed notifications, and
+        # another user's item must never enter this user's index
+        rows = (
+            await client.from_("muse_items")
+            .select(self._refresh_columns())
+            .in_("id", item_ids)
+            .eq("user_id", user_id)
+            .execute()
+        ).data
+        live = {row["id"]: row for row in rows if row.get("user_id") == user_id and self._is_live(row)}
+        if self.refresh_in_thread:
+            await asyncio.to_thread(self._apply_all, index, item_ids, live)
+        else:
+            self._apply_all(index, item_ids, live)
+        self.refreshes += 1
+
+    def _apply_all(self, index: Any, item_ids: List[str], live: Dict[str, Dict[str, Any]]):
+        for item_id in item_ids:
+            row = live.get(item_id)
+            if row is not None:
+                row.pop("deleted_at", None)
+            self._apply(index, item_id, row)
+
+    def _install(self, user_id: str, index: Any):
+        self._indexes[user_id] = index
+        self._built_at[user_id] = time.monotonic()
+        self._evict(keep=user_id)
+
+    def _evict(self, keep: str):
+        total = sum(len(index) for index in self._indexes.values())
+        while total > self.max_items and len(self._indexes) > 1:
+            user_id, index = next(iter(self._indexes.items()))
+            if user_id == keep:
+                self._indexes.move_to_end(user_id)
+                continue
+            self._drop(user_id)
+            total -= len(index)
+            self.evictions += 1
+
+    def _rebuild_if_old(self, user_id: str, index: Any):
+        if self.max_age is None or user_id in self._rebuilding:
+            return
+        if time.monotonic() - self._built_at.get(user_id, 0.0) <= self.max_age:
+            return
+        task = self._rebuilding[user_id] = asyncio.create_task(self._rebuild(user_id, index))
+        task.add_done_callback(lambda t: self._rebuilding.pop(user_id, None))
+
+    async def _rebuild(self, user_id: str, index: Any):
+        try:
+            fresh = await self._warm(user_id)
+        except Exception as e:
+            # Keep serving the current index, and try again after another max_age
+            logger.warning(f"Failed to rebuild the index of user {user_id}: {e}")
+            self._built_at[user_id] = time.monotonic()
+            return
+        async with self._locked(user_id):
+            if self._indexes.get(user_id) is not index:
+                return  # dropped or replaced meanwhile
+            if fresh is None:
+                self._drop(user_id)
+            else:
+                # Items marked stale during the rebuild stay marked, and are re-fetched into it
+                self._install(user_id, fresh)
+            self.rebuilds += 1
+
+    async def _current(self, user_id: str) -> Optional[Any]:
+        index = self._indexes.get(user_id)
+        if index is None:
+            index = await self._warm(user_id)
+            if index is None:
+                return None
+            self._install(user_id, index)
+        else:
+            await self._refresh(user_id, index)
+            self._rebuild_if_old(user_id, index)
+        self._indexes.move_to_end(user_id)
+        return index
+
+    async def get_index(self, user_id: str) -> Optional[Any]:
+        async with self._locked(user_id):
+            return await self._current(user_id)
+
+    async def query(self, user_id: str, search: Callable[[Any], T], default: T) -> T:
+        """
+        Runs `search` on the user's index in a worker thread, so a large scan
+        doesn't hold up the event loop. Refreshes wait for it to finish.
+        """
+        async with self._locked(user_id):
+            index = await self._current(user_id)
+            if index is None:
+                return default
+            return await asyncio.to_thread(search, index)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._indexes),
+            "items": sum(len(index) for index in self._indexes.values()),
+            "warms": self.warms,
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,217 @@
+# museboard-ai-service/core/user_profile.py
+
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from core.user_index import ITEM_COLUMNS, UserIndexCache
+from core.vector_index import parse_embedding
+
+# Enough to count and categorize every item without loading its content
+FACT_COLUMNS = "id, content_type, ai_categories, created_at"
+# Characters of an item's content kept for the recent-items list
+RECENT_CONTENT_CHARS = 160
+
+
+class ItemFacts(NamedTuple):
+    """What one item contributes to its user's profile, kept so an edit or delete can be undone exactly."""
+    content_type: str
+    categories: Tuple[str, ...]
+    created_at: str
+    # hash() of the embedding last folded into the centroid, so an unchanged one isn't folded twice
+    embedding_key: Optional[int] = None
+
+
+class UserProfile:
+    """
+    Running aggregates over one user's items: item and content-type counts,
+    category frequencies, the most recent items and an interest centroid.
+
+    Every aggregate is updated in place as items are added, edited or
+    removed. The centroid is an exponential moving average of the user's
+    embeddings in the order they arrive, so it follows what the user has
+    been saving lately; a new embedding moves it with weight `centroid_alpha`.
+    """
+
+    def __init__(self, recent_size: int = 10, centroid_alpha: float = 0.05):
+        self.recent_size = recent_size
+        self.centroid_alpha = centroid_alpha
+        self.mission = ""
+        self.categories: Counter = Counter()
+        self.content_types: Counter = Counter()
+        self.centroid: Optional[np.ndarray] = None
+        self.embedded = 0
+        self._facts: Dict[str, ItemFacts] = {}
+        # Newest first; a few more than are shown, so deletes rarely leave it short
+        self._recent: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        # Counts the profile itself too, so profiles of users without items are bounded as well
+        return len(self._facts) + 1
+
+    @property
+    def total_items(self) -> int:
+        return len(self._facts)
+
+    # --- Updates ---
+
+    def upsert(self, row: Dict[str, Any]):
+        item_id = row["id"]
+        previous = self._facts.get(item_id)
+        if previous is not None:
+            self._count(previous, -1)
+        facts = ItemFacts(
+            content_type=row.get("content_type") or "unknown",
+            categories=tuple(row.get("ai_categories") or ()),
+            created_at=str(row.get("created_at") or ""),
+            embedding_key=previous.embedding_key if previous is not None else None,
+        )
+        embedding = row.get("embedding")
+        if embedding is not None:
+            key = hash(embedding if isinstance(embedding, str) else tuple(embedding))
+            if key != facts.embedding_key:
+                self.add_embedding(parse_embedding(embedding))
+                facts = facts._replace(embedding_key=key)
+        self._facts[item_id] = facts
+        self._count(facts, 1)
+        if "content" in row:
+            self._remember_recent(row)
+
+    def remove(self, item_id: str):
+        facts = self._facts.pop(item_id, None)
+        if facts is not None:
+            self._count(facts, -1)
+        self._recent = [item for item in self._recent if item["id"] != item_id]
+
+    def add_embedding(self, embedding: np.ndarray):
+        embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+        if self.centroid is None:
+            self.centroid = embedding.astype(np.float32)
+        else:
+            centroid = (1 - self.centroid_alpha) * self.centroid + self.centroid_alpha * embedding
+            self.centroid = (centroid / (np.linalg.norm(centroid) or 1.0)).astype(np.float32)
+        self.embedded += 1
+
+    def _count(self, facts: ItemFacts, delta: int):
+        for counter, keys in ((self.content_types, (facts.content_type,)), (self.categories, facts.categories)):
+            for key in keys:
+                counter[key] += delta
+                if counter[key] <= 0:
+                    del counter[key]
+
+    def _remember_recent(self, row: Dict[str, Any]):
+        item = {
+            "id": row["id"],
+            "content": str(row.get("content") or "")[:RECENT_CONTENT_CHARS],
+            "content_type": row.get("content_type"),
+            "ai_categories": list(row.get("ai_categories") or []),
+            "created_at": str(row.get("created_at") or ""),
+        }
+        recent = [existing for existing in self._recent if existing["id"] != item["id"]] + [item]
+        recent.sort(key=lambda existing: existing["created_at"], reverse=True)
+        self._recent = recent[:self.recent_size * 2]
+
+    # --- Reading ---
+
+    def top_categories(self, count: int = 10) -> List[str]:
+        return [category for category, _ in self.categories.most_common(count)]
+
+    def recent_items(self) -> List[Dict[str, Any]]:
+        return self._recent[:self.recent_size]
+
+    def describe(self, categories: int = 10) -> str:
+        """The Museboard summary Shadow gets with every chat turn, most important facts first."""
+        types = ", ".join(f"{count} {content_type}" for content_type, count in self.content_types.most_common(4))
+        lines = [f"User has {self.total_items} items" + (f" ({types})" if types else "") + "."]
+        if self.categories:
+            lines.append(f"Recent themes: {', '.join(self.top_categories(categories))}")
+        recent = self.recent_items()
+        if recent:
+            lines.append("Latest items:")
+            lines.extend(f"- [{item['content_type']}] {item['content']}" for item in recent)
+        return "\n".join(lines)
+
+    def to_dict(self, include_centroid: bool = False) -> Dict[str, Any]:
+        profile = {
+            "mission": self.mission,
+            "total_items": self.total_items,
+            "content_types": dict(self.content_types.most_common()),
+            "top_categories": dict(self.categories.most_common(10)),
+            "recent_items": self.recent_items(),
+            "embedded_items": self.embedded,
+        }
+        if include_centroid:
+            profile["centroid"] = self.centroid.tolist() if self.centroid is not None else None
+        return profile
+
+
+class UserProfileCache(UserIndexCache):
+    """
+    Keeps a UserProfile per user, built from their items and mission on
+    first use and then kept current through items-changed events (which the
+    ingestion worker emits once an item's embedding is written), as
+    described in UserIndexCache. Building a profile reads every item's
+    facts once, and the content and embeddings of the most recent items.
+
+    Rebuilding a profile after `max_age` seconds also picks up mission changes.
+    """
+
+    # Profiles are read on the event loop by chat, without the user's lock; a
+    # refresh is a few items, so it is applied there too
+    refresh_in_thread = False
+
+    def __init__(self, client_factory: Callable[[], Awaitable[Any]], max_items: int = 1_000_000, page_size: int = 1000,
+                 recent_size: int = 10, centroid_alpha: float = 0.05, max_age: float = 900):
+        super().__init__(client_factory, max_items=max_items, page_size=page_size, max_age=max_age)
+        self.recent_size = recent_size
+        self.centroid_alpha = centroid_alpha
+
+    def _new_profile(self) -> UserProfile:
+        return UserProfile(recent_size=self.recent_size, centroid_alpha=self.centroid_alpha)
+
+    def _warm_columns(self) -> str:
+        return FACT_COLUMNS
+
+    def _refresh_columns(self) -> str:
+        return f"{ITEM_COLUMNS}, embedding, deleted_at"
+
+    def _load_page(self, profile: Optional[UserProfile], rows: List[Dict[str, Any]]) -> UserProfile:
+        profile = profile or self._new_profile()
+        for row in rows:
+            profile.upsert(row)
+        return profile
+
+    def _apply(self, profile: UserProfile, item_id: str, row: Optional[Dict[str, Any]]):
+        if row is None:
+            profile.remove(item_id)
+        else:
+            profile.upsert(row)
+
+    async def _warm(self, user_id: str) -> UserProfile:
+        profile = await super()._warm(user_id) or self._new_profile()
+        client = await self.client_factory()
+        recent, mission = await asyncio.gather(
+            client.from_("muse_items")
+            .select(f"{ITEM_COLUMNS}, embedding")
+            .eq("user_id", user_id)
+            .is_("deleted_at", "null")
+            .order("created_at", desc=True)
+            .limit(self.recent_size * 2)
+            .execute(),
+            client.from_("user_missions").select("mission_statement").eq("user_id", user_id).limit(1).execute(),
+        )
+        # Oldest first, so the newest embedding has the most weight in the centroid
+        await asyncio.to_thread(self._load_page, profile, list(reversed(recent.data)))
+        if mission.data:
+            profile.mission = mission.data[0].get("mission_statement") or ""
+        return profile
+
+    async def get_profile(self, user_id: str) -> UserProfile:
+        return await self.get_index(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats["items"] -= stats["users"]
+        return stats
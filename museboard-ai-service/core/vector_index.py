@@ -0,0 +1,242 @@
+# museboard-ai-service/core/vector_index.py
+
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.quantization import CompactCodec
+from core.user_index import UserIndexCache
+
+
+def parse_embedding(value) -> np.ndarray:
+    """PostgREST returns pgvector columns as a '[0.1,0.2,...]' string."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+class UserVectorIndex:
+    """
+    One user's item embeddings as a contiguous, L2-normalized float32 matrix,
+    so a top-k cosine search is a single matrix-vector product.
+    Rows are appended into spare capacity and removed by swapping in the last row.
+
+    With a `codec`, every row is also kept as a compact code (see
+    core/quantization.py) and searches scan the codes instead: the top
+    k x `rescore_multiplier` candidates are then rescored against the full
+    vectors. With `rescore_multiplier=0` the full vectors aren't kept at all
+    and similarities come from the codes, trading some recall for memory.
+    """
+
+    def __init__(self, dim: int, capacity: int = 64, codec: Optional[CompactCodec] = None,
+                 rescore_multiplier: int = 4):
+        if codec is not None and not rescore_multiplier and not codec.yields_similarity:
+            raise ValueError(f"{codec.scheme} codes can't be searched without rescoring")
+        self.dim = dim
+        self.codec = codec
+        self.rescore_multiplier = rescore_multiplier if codec is not None else 0
+        self.keeps_full = codec is None or rescore_multiplier > 0
+        self._matrix = np.empty((capacity if self.keeps_full else 0, dim), dtype=np.float32)
+        if codec is not None:
+            self._codes = np.empty((capacity, codec.code_width), dtype=codec.code_dtype)
+            self._scales = np.empty(capacity, dtype=np.float32)
+        self._capacity = capacity
+        self._size = 0
+        self._ids: List[str] = []
+        self._items: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        nbytes = self._matrix.nbytes
+        if self.codec is not None:
+            nbytes += self._codes.nbytes + (self._scales.nbytes if self.codec.scheme == "int8" else 0)
+        return nbytes
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= self._capacity:
+            return
+        self._capacity = max(needed, self._capacity * 2)
+
+        def grow(array: np.ndarray) -> np.ndarray:
+            grown = np.empty((self._capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            return grown
+
+        if self.keeps_full:
+            self._matrix = grow(self._matrix)
+        if self.codec is not None:
+            self._codes = grow(self._codes)
+            self._scales = grow(self._scales)
+
+    def _write(self, start: int, vectors: np.ndarray):
+        """Stores normalized vectors (and their codes) in rows start..start + len(vectors)."""
+        if self.keeps_full:
+            self._matrix[start:start + len(vectors)] = vectors
+        if self.codec is not None:
+            codes, scales = self.codec.encode(vectors)
+            self._codes[start:start + len(vectors)] = codes
+            if scales is not None:
+                self._scales[start:start + len(vectors)] = scales
+
+    def bulk_load(self, items: List[Dict[str, Any]], embeddings: np.ndarray):
+        """Appends many items at once; `embeddings` is an (n, dim) array in item order."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._reserve(len(items))
+        start = self._size
+        self._write(start, embeddings / norms)
+        for offset, item in enumerate(items):
+            self._rows[item["id"]] = start + offset
+            self._ids.append(item["id"])
+            self._items.append(item)
+        self._size += len(items)
+
+    def upsert(self, item: Dict[str, Any], embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else vector
+        row = self._rows.get(item["id"])
+        if row is None:
+            self._reserve(1)
+            row = self._size
+            self._size += 1
+            self._rows[item["id"]] = row
+            self._ids.append(item["id"])
+            self._items.append(item)
+        else:
+            self._items[row] = item
+        self._write(row, vector[None, :])
+
+    def remove(self, item_id: str):
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            if self.keeps_full:
+                self._matrix[row] = self._matrix[last]
+            if self.codec is not None:
+                self._codes[row] = self._codes[last]
+                self._scales[row] = self._scales[last]
+            self._ids[row] = self._ids[last]
+            self._items[row] = self._items[last]
+            self._rows[self._ids[row]] = row
+        self._ids.pop()
+        self._items.pop()
+        self._size -= 1
+
+    def search(self, query_embedding, match_count: int, match_threshold: float) -> List[Dict[str, Any]]:
+        return self.search_many([query_embedding], match_count, match_threshold)[0]
+
+    def _scores(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Each query's k best rows, best first, and their similarities."""
+        if self.codec is None:
+            return _top_k(queries @ self._matrix[:self._size].T, k)
+        coarse = self.codec.scores(queries, self._codes[:self._size], self._scales[:self._size])
+        if not self.rescore_multiplier:
+            return _top_k(coarse, k)
+
+        # Rescore the coarse candidates at full precision
+        candidates, _ = _top_k(coarse, min(k * self.rescore_multiplier, self._size))
+        exact = np.einsum("qcd,qd->qc", self._matrix[candidates], queries)
+        order, scores = _top_k(exact, k)
+        return np.take_along_axis(candidates, order, axis=1), scores
+
+    def search_many(self, query_embeddings, match_count: int, match_threshold: float) -> List[List[Dict[str, Any]]]:
+        """Top-k for several queries at once: one (queries x items) matrix product instead of a scan per query."""
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        if self._size == 0 or match_count <= 0:
+            return [[] for _ in range(len(queries))]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+
+        rows, scores = self._scores(queries, min(match_count, self._size))
+        return [
+            [
+                {**self._items[row], "similarity": float(score)}
+                for row, score in zip(query_rows, query_scores)
+                if score >= match_threshold
+            ]
+            for query_rows, query_scores in zip(rows, scores)
+        ]
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices of the k highest scores in each row, best first, and those scores."""
+    # argpartition finds the top-k in linear time; only those k get sorted
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class LocalVectorIndex(UserIndexCache):
+    """
+    In-process retrieval engine holding a UserVectorIndex per user, warmed
+    and kept current as described in UserIndexCache. Only items that have
+    an embedding are indexed. A `codec` makes every user index compact.
+    Scans run in a worker thread; numpy releases the GIL for them.
+    """
+
+    extra_columns = ("embedding",)
+
+    def __init__(self, client_factory: Callable[[], Awaitable[Any]], max_vectors: int = 1_000_000,
+                 page_size: int = 1000, codec: Optional[CompactCodec] = None, rescore_multiplier: int = 4,
+                 max_age: Optional[float] = None):
+        super().__init__(client_factory, max_items=max_vectors, page_size=page_size, max_age=max_age)
+        self.codec = codec
+        self.rescore_multiplier = rescore_multiplier
+
+    def _filter_warm(self, query):
+        return query.not_.is_("embedding", "null")
+
+    def _is_live(self, row: Dict[str, Any]) -> bool:
+        return super()._is_live(row) and row.get("embedding") is not None
+
+    def _load_page(self, index: Optional[UserVectorIndex], rows: List[Dict[str, Any]]) -> UserVectorIndex:
+        embeddings = np.stack([parse_embedding(row.pop("embedding")) for row in rows])
+        if index is None:
+            index = UserVectorIndex(dim=embeddings.shape[1], capacity=len(rows), codec=self.codec,
+                                    rescore_multiplier=self.rescore_multiplier)
+        index.bulk_load(rows, embeddings)
+        return index
+
+    def _apply(self, index: UserVectorIndex, item_id: str, row: Optional[Dict[str, Any]]):
+        if row is None:
+            index.remove(item_id)
+        else:
+            index.upsert(row, parse_embedding(row.pop("embedding")))
+
+    # --- Queries ---
+
+    async def search(self, user_id: str, query_embedding, match_count: int, match_threshold: float) -> List[Dict[str, Any]]:
+        return await self.query(
+            user_id, lambda index: index.search(query_embedding, match_count, match_threshold), [],
+        )
+
+    async def search_many(self, user_id: str, query_embeddings, match_count: int,
+                          match_threshold: float) -> List[List[Dict[str, Any]]]:
+        return await self.query(
+            user_id, lambda index: index.search_many(query_embeddings, match_count, match_threshold),
+            [[] for _ in query_embeddings],
+        )
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        return {
+            "users": stats["users"],
+            "vectors": stats["items"],
+            "bytes": sum(index.nbytes for index in self._indexes.values()),
+            "warms": self.warms,
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,427 @@
+# museboard-ai-service/curation_worker.py
+
+"""
+Onboarding content curation worker.
+
+Finishing onboarding queues a 'curation' job in ai_processing_jobs (POST
+/api/v1/onboarding/content/curate) with the user's mission, heroes and
+interests as its input_data, and returns straight away. This worker claims
+the jobs and fills the user's Museboard:
+
+- Slices: the heroes and interests are split into up to CURATION_SLICES
+  groups, and each group gets its own ContentCurator call, all in parallel.
+  Each call writes a few items instead of one call writing the whole list,
+  so a job takes about as long as its slowest short call.
+- Early results: each call's JSON is parsed as it streams (core/json_stream.py),
+  and every content item is added to the job's result_data as soon as its
+  closing brace arrives. GET /api/v1/onboarding/content/curate/{job_id}
+  returns them while the job is still running.
+- Writes: a slice's items are inserted into muse_items in one statement once
+  the slice finishes (the insert trigger then queues their embeddings).
+- Failures: a job with no items is retried with a backoff; after the last
+  attempt it completes with a small fallback set, so onboarding always
+  leaves something on the board.
+
+Runs inside the API process by default (CURATION_WORKER=true), or standalone.
+Claiming goes through claim_ai_jobs, so any number of workers share the queue.
+
+Usage (from museboard-ai-service/):
+    python curation_worker.py --concurrency 8
+"""
+
+import argparse
+import asyncio
+import datetime
+import inspect
+import logging
+import math
+import signal
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.json_stream import JSONItemStream
+from core.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+CURATION_JOB = "curation"
+
+# Put on the board when curation fails for good
+FALLBACK_CONTENT = [
+    {"type": "quote", "content": "The only way to do great work is to love what you do.", "source": "Steve Jobs", "category": "Passion", "relevance_reason": "Aligns passion with purpose."},
+    {"type": "quote", "content": "Success is not final, failure is not fatal: it is the courage to continue that counts.", "source": "Winston Churchill", "category": "Resilience", "relevance_reason": "Persistence is key."}
+]
+
+
+class CurationFailed(Exception):
+    """Raised when a slice produced no usable content."""
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def plan_slices(heroes: List[str], interests: List[str], max_slices: int,
+                total_items: int) -> List[Tuple[List[str], List[str], int]]:
+    """
+    Splits the heroes and interests round-robin into at most `max_slices`
+    groups, as (heroes, interests, item count) per slice. Without either,
+    one slice curates from the mission alone.
+    """
+    focus = [(True, hero) for hero in heroes] + [(False, interest) for interest in interests]
+    count = max(1, min(max_slices, len(focus)))
+    groups: List[Tuple[List[str], List[str]]] = [([], []) for _ in range(count)]
+    for i, (is_hero, name) in enumerate(focus):
+        groups[i % count][0 if is_hero else 1].append(name)
+    per_slice = max(1, math.ceil(total_items / count))
+    return [(slice_heroes, slice_interests, per_slice) for slice_heroes, slice_interests in groups]
+
+
+def content_item(element: Any) -> Optional[Dict[str, str]]:
+    """A curated content element in the shape the API returns, or None if it has no content."""
+    if not isinstance(element, dict) or not str(element.get("content") or "").strip():
+        return None
+    return {
+        "type": str(element.get("type") or "quote"),
+        "content": str(element["content"]).strip(),
+        "source": str(element.get("source") or ""),
+        "category": str(element.get("category") or ""),
+        "relevance_reason": str(element.get("relevance_reason") or ""),
+    }
+
+
+def muse_item_row(user_id: str, item: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "content": item["content"],
+        "content_type": "text",
+        "description": item["source"],
+        "ai_status": "completed",
+        "ai_categories": [item["category"]] if item["category"] else [],
+        "ai_summary": item["relevance_reason"],
+        "ai_relevance_score": 0.9,
+    }
+
+
+class _Progress:
+    """A job's results so far; its result_data."""
+
+    def __init__(self, slices: int):
+        self.content: List[Dict[str, str]] = []
+        self.categories: List[str] = []
+        self.slices = slices
+        self.slices_done = 0
+        self.inserted = 0
+        self.degraded = False
+        self.dirty = False
+        self.saving = False
+        self.saved_at = 0.0
+
+    def add(self, key: Optional[str], element: Any):
+        if key == "content":
+            item = content_item(element)
+            if item is not None:
+                self.content.append(item)
+                self.dirty = True
+                return item
+        elif key == "categories" and isinstance(element, str) and element not in self.categories:
+            self.categories.append(element)
+            self.dirty = True
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "content": self.content,
+            "categories": self.categories,
+            "slices": self.slices,
+            "slices_done": self.slices_done,
+            "inserted": self.inserted,
+            "degraded": self.degraded,
+        }
+
+
+class CurationWorker:
+    """
+    Claims curation jobs, runs their slices in parallel and writes the
+    results back. `run()` works until `stop()` is called, then finishes the
+    jobs it has already claimed before returning.
+    """
+
+    def __init__(self, supabase, curator_factory: Callable[[], Awaitable[Any]], concurrency: int = 4,
+                 slices: int = 4, items: int = 12, slice_timeout: float = 60.0, max_attempts: int = 3,
+                 poll_interval: float = 2.0, lease_seconds: int = 300, backoff_seconds: int = 10,
+                 progress_interval: float = 0.25, on_inserted: Optional[Callable[[str, List[str]], Any]] = None):
+        self.supabase = supabase
+        self.curator_factory = curator_factory
+        self.concurrency = concurrency
+        self.slices = slices
+        self.items = items
+        self.slice_timeout = slice_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.backoff_seconds = backoff_seconds
+        self.progress_interval = progress_interval
+        self.on_inserted = on_inserted
+
+        self._stopping = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._in_flight: set = set()
+
+        self.claimed = 0
+        self.completed = 0
+        self.retried = 0
+        self.degraded = 0
+        self.slices_run = 0
+        self.slice_failures = 0
+        self.items_curated = 0
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def wake(self):
+        """Claims right away instead of at the next poll; called when a job is queued in this process."""
+        self._wake.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "jobs_in_flight": len(self._in_flight),
+            "claimed": self.claimed,
+            "completed": self.completed,
+            "retried": self.retried,
+            "degraded": self.degraded,
+            "slices": self.slices_run,
+            "slice_failures": self.slice_failures,
+            "items": self.items_curated,
+        }
+
+    # --- Claiming ---
+
+    async def _idle(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    async def run(self):
+        try:
+            while not self._stopping.is_set():
+                room = self.concurrency - len(self._in_flight)
+                if room <= 0:
+                    # Woken when a job finishes
+                    await self._idle(self.poll_interval)
+                    continue
+                try:
+                    jobs = (await self.supabase.rpc("claim_ai_jobs", {
+                        "p_job_type": CURATION_JOB, "p_limit": room, "p_lease_seconds": self.lease_seconds,
+                    }).execute()).data or []
+                except Exception as e:
+                    logger.warning(f"Failed to claim curation jobs: {e}")
+                    jobs = []
+                self.claimed += len(jobs)
+                for job in jobs:
+                    task = asyncio.create_task(self._process(job))
+                    self._in_flight.add(task)
+                    task.add_done_callback(self._job_done)
+                if len(jobs) < room:
+                    await self._idle(self.poll_interval)
+        finally:
+            if self._in_flight:
+                await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def _job_done(self, task: asyncio.Task):
+        self._in_flight.discard(task)
+        self._wake.set()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Curation job crashed: {task.exception()}")
+
+    # --- Processing ---
+
+    async def _process(self, job: Dict[str, Any]):
+        previous = job.get("result_data") or {}
+        if previous.get("inserted"):
+            # A worker inserted this job's items and stopped before completing it
+            await self._complete(job, previous)
+            return
+
+        inputs = job.get("input_data") or {}
+        slices = plan_slices(inputs.get("heroes") or [], inputs.get("interests") or [], self.slices, self.items)
+        progress = _Progress(len(slices))
+        started = time.monotonic()
+        with span("curation.job"):
+            try:
+                curator = await self.curator_factory()
+                results = await asyncio.gather(
+                    *(self._run_slice(job, progress, curator, inputs.get("mission") or "", *s) for s in slices),
+                    return_exceptions=True,
+                )
+            except Exception as e:
+                results = [e]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        for error in errors:
+            logger.warning(f"Curation slice failed for job {job['id']}: {error!r}")
+
+        if not progress.inserted:
+            error = "; ".join(repr(e) for e in errors) or "No content curated"
+            if job.get("attempts", 0) < self.max_attempts:
+                await self._fail(job, error)
+                return
+            progress.content, progress.degraded = [dict(item) for item in FALLBACK_CONTENT], True
+            try:
+                await self._insert(job, progress.content, progress)
+            except Exception as e:
+                await self._fail(job, f"{error}; fallback insert failed: {e}")
+                return
+            self.degraded += 1
+
+        await self._complete(job, progress.to_dict())
+        logger.info(
+            f"curation job={job['id']} slices={progress.slices_done}/{progress.slices} items={progress.inserted} "
+            f"degraded={progress.degraded} latency_ms={(time.monotonic() - started) * 1000:.0f}"
+        )
+
+    async def _run_slice(self, job: Dict[str, Any], progress: _Progress, curator, mission: str,
+                         heroes: List[str], interests: List[str], count: int):
+        self.slices_run += 1
+        parser = JSONItemStream()
+        items: List[Dict[str, str]] = []
+        try:
+            async with asyncio.timeout(self.slice_timeout):
+                async for kind, value in curator.astream(mission, heroes, interests, count):
+                    if kind == "token":
+                        chunk = value
+                    else:
+                        # Nothing was streamed (e.g. the adapter fell back to a non-streaming call)
+                        chunk = "" if parser.started else str(value.content_json or "")
+                    for key, element in parser.feed(chunk):
+                        item = progress.add(key, element)
+                        if item is not None:
+                            items.append(item)
+                    await self._save_progress(job, progress)
+            if not items:
+                raise CurationFailed("No content items in the curator's output")
+            await self._insert(job, items, progress)
+        except BaseException:
+            self.slice_failures += 1
+            raise
+        progress.slices_done += 1
+        progress.dirty = True
+        await self._save_progress(job, progress)
+
+    async def _insert(self, job: Dict[str, Any], items: List[Dict[str, str]], progress: _Progress):
+        user_id = job["user_id"]
+        rows = (
+            await self.supabase.from_("muse_items").insert([muse_item_row(user_id, item) for item in items]).execute()
+        ).data or []
+        progress.inserted += len(items)
+        self.items_curated += len(items)
+        if self.on_inserted is not None:
+            try:
+                result = self.on_inserted(user_id, [row["id"] for row in rows])
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Failed to announce curated items for user {user_id}: {e}")
+
+    async def _save_progress(self, job: Dict[str, Any], progress: _Progress):
+        """Writes the results so far for pollers, at most every `progress_interval` seconds."""
+        if not progress.dirty or progress.saving or time.monotonic() - progress.saved_at < self.progress_interval:
+            return
+        progress.saving, progress.dirty = True, False
+        try:
+            await self.supabase.from_("ai_processing_jobs").update(
+                {"result_data": progress.to_dict()},
+            ).eq("id", job["id"]).execute()
+        except Exception as e:
+            logger.warning(f"Failed to save progress of curation job {job['id']}: {e}")
+        finally:
+            progress.saving = False
+            progress.saved_at = time.monotonic()
+
+    async def _complete(self, job: Dict[str, Any], result: Dict[str, Any]):
+        try:
+            await self.supabase.from_("ai_processing_jobs").update({
+                "status": "completed", "completed_at": _now(), "locked_at": None, "error_message": None,
+                "result_data": result,
+            }).eq("id", job["id"]).execute()
+        except Exception as e:
+            # The items are on the board; the job is claimed again after its lease and completes at once
+            logger.warning(f"Failed to mark curation job {job['id']} completed: {e}")
+        self.completed += 1
+
+    async def _fail(self, job: Dict[str, Any], error: str):
+        logger.warning(f"Curation job {job['id']} failed (attempt {job.get('attempts', 0)}): {error}")
+        try:
+            await self.supabase.rpc("fail_ai_jobs", {
+                "p_ids": [job["id"]], "p_error": error[:1000],
+                "p_max_attempts": self.max_attempts, "p_backoff_seconds": self.backoff_seconds,
+            }).execute()
+        except Exception as e:
+            logger.warning(f"Failed to record failed curation job; it retries when its lease expires: {e}")
+        self.retried += 1
+
+
+def build_worker(supabase, curator_factory: Callable[[], Awaitable[Any]], **overrides) -> CurationWorker:
+    """A CurationWorker with the CURATION_* settings from core.config, overridable per argument."""
+    from core import config
+
+    settings = dict(
+        concurrency=config.CURATION_CONCURRENCY,
+        slices=config.CURATION_SLICES,
+        items=config.CURATION_ITEMS,
+        slice_timeout=config.CURATION_SLICE_TIMEOUT,
+        max_attempts=config.CURATION_MAX_ATTEMPTS,
+        poll_interval=config.CURATION_POLL_INTERVAL,
+        lease_seconds=config.CURATION_LEASE_SECONDS,
+    )
+    settings.update(overrides)
+    return CurationWorker(supabase, curator_factory, **settings)
+
+
+async def main(args):
+    from core.config import services
+    from core.telemetry import configure_logging
+
+    configure_logging(args.log_level)
+    supabase = await services.aget("async_supabase")
+    await services.aget("dspy")
+    from dspy_modules.onboarding import ContentCurator
+
+    curator = ContentCurator()
+
+    async def curator_factory():
+        return curator
+
+    overrides = {
+        name: value for name, value in {"concurrency": args.concurrency, "slices": args.slices}.items()
+        if value is not None
+    }
+    on_inserted = None
+    if args.notify_url:
+        import httpx
+
+        http = httpx.AsyncClient(timeout=10)
+
+        async def on_inserted(user_id, item_ids):
+            # Lets the API refresh the user's profile
+            await http.post(args.notify_url, json={"user_id": user_id, "item_ids": item_ids})
+
+    worker = build_worker(supabase, curator_factory, on_inserted=on_inserted, **overrides)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    logger.info(f"Curation worker started (concurrency {worker.concurrency}, {worker.slices} slices per job)")
+    await worker.run()
+    logger.info(f"Curation worker stopped: {worker.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, help="Most jobs curated at once.")
+    parser.add_argument("--slices", type=int, help="Most parallel curator calls per job.")
+    parser.add_argument("--notify-url", help="The API's /api/v1/items/changed URL, called for each inserted slice.")
+    parser.add_argument("--log-level", default="INFO")
+    asyncio.run(main(parser.parse_args()))
@@ -1,6 +1,8 @@
 # museboard-ai-service/dspy_modules/chat.py
 
 import dspy
+from core.streaming import stream_field
+from core.telemetry import span
 
 class GenerateShadowResponse(dspy.Signature):
     """
@@ -15,20 +17,68 @@ class GenerateShadowResponse(dspy.Signature):
     
     response = dspy.OutputField(desc="A concise and focused response from Shadow that is directly helpful.")
 
+class SummarizeConversation(dspy.Signature):
+    """
+    Fold new turns of a conversation between a user and Shadow into the running summary.
+    Keep decisions, facts about the user and open questions; drop pleasantries.
+    """
+    previous_summary = dspy.InputField(desc="The summary of the conversation so far. May be empty.")
+    new_turns = dspy.InputField(desc="Conversation turns to fold into the summary, oldest first.")
+
+    summary = dspy.OutputField(desc="The updated summary, a few sentences at most.")
+
 class ShadowAgent(dspy.Module):
     def __init__(self):
         super().__init__()
         # Use ChainOfThought to encourage the LM to reason before responding
         self.generate_response = dspy.ChainOfThought(GenerateShadowResponse)
+        # The same signature without the reasoning step, for when time is short
+        self.generate_response_fast = dspy.Predict(GenerateShadowResponse)
+        # A plain Predict is enough for summarizing older turns
+        self.summarize_turns = dspy.Predict(SummarizeConversation)
+
+    def _build_context(self, recent_items_summary, history_summary):
+        # We synthesize the context into a more digestible format for the LM.
+        # The history goes last: it is what grows each turn, so everything
+        # before it stays a stable prefix a provider's prompt cache can reuse.
+        return f"MUSEBOARD SUMMARY:\n{recent_items_summary}\n\nCONVERSATION HISTORY:\n{history_summary}"
 
     def forward(self, mission, question, recent_items_summary, history_summary):
-        # We synthesize the context into a more digestible format for the LM
-        context_str = f"CONVERSATION HISTORY:\n{history_summary}\n\nMUSEBOARD SUMMARY:\n{recent_items_summary}"
+        with span("chat.generate"):
+            prediction = self.generate_response(
+                mission=mission,
+                context=self._build_context(recent_items_summary, history_summary),
+                question=question
+            )
         
-        prediction = self.generate_response(
-            mission=mission,
-            context=context_str,
-            question=question
-        )
-        
-        return prediction
\ No newline at end of file
+        return prediction
+
+    async def aforward(self, mission, question, recent_items_summary, history_summary, fast=False):
+        generate = self.generate_response_fast if fast else self.generate_response
+        with span("chat.generate"):
+            return await generate.acall(
+                mission=mission,
+                context=self._build_context(recent_items_summary, history_summary),
+                question=question
+            )
+
+    async def asummarize(self, previous_summary: str, new_turns: str) -> str:
+        """Folds older conversation turns into the rolling summary."""
+        with span("chat.summarize"):
+            prediction = await self.summarize_turns.acall(previous_summary=previous_summary, new_turns=new_turns)
+        return prediction.summary
+
+    async def astream(self, mission, question, recent_items_summary, history_summary):
+        """
+        Streaming variant of aforward(). Yields ("token", text) chunks of the
+        response as they are generated, then ("prediction", prediction).
+        """
+        with span("chat.generate"):
+            async for event in stream_field(
+                self.generate_response,
+                "response",
+                mission=mission,
+                context=self._build_context(recent_items_summary, history_summary),
+                question=question
+            ):
+                yield event
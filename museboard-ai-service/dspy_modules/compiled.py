@@ -0,0 +1,33 @@
+# museboard-ai-service/dspy_modules/compiled.py
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Programs compile_programs.py optimizes, by the agent attribute they are served as
+COMPILED_PROGRAMS = ("mission_enhancer", "interest_suggester")
+
+
+def compiled_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.json")
+
+
+def load_compiled(program, name: str, directory: str) -> bool:
+    """
+    Loads the compiled state (demos and instructions) saved for `name` into
+    `program`. Returns False, leaving the program as built, when there is no
+    compiled file or it doesn't fit the program any more.
+    """
+    path = compiled_path(directory, name)
+    if not os.path.exists(path):
+        logger.info(f"No compiled {name} at {path}; using its signature as written")
+        return False
+    try:
+        program.load(path)
+    except Exception as e:
+        logger.warning(f"Could not load compiled {name} from {path}: {e}")
+        return False
+    demos = sum(len(predictor.demos) for _, predictor in program.named_predictors())
+    logger.info(f"Loaded compiled {name} from {path} ({demos} demos)")
+    return True
@@ -1,8 +1,16 @@
 # museboard-ai-service/dspy_modules/onboarding.py
 
 import dspy
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import json
+import re
+
+from dspy.utils.exceptions import AdapterParseError
+from pydantic import BaseModel, Field, ValidationError
+
+from core.json_stream import JSONItemStream, StructuredOutputError
+from core.streaming import stream_field
+from core.telemetry import STRUCTURED_OUTPUTS, span
 
 class MissionCrafter(dspy.Module):
     """
@@ -46,108 +54,259 @@ class MissionCrafter(dspy.Module):
         )
 
 
-# --- 👇 THIS MODULE AND SIGNATURE ARE UPDATED ---
+# --- Interest Suggestions ---
+
+class HeroSuggestion(BaseModel):
+    name: str = Field(min_length=1)
+    reason: str = ""
+
+
+class InterestSuggestion(BaseModel):
+    category: str = Field(min_length=1)
+    description: str = ""
+
+
+# Output key -> (element model, event name when streamed)
+SUGGESTION_FIELDS = {
+    "heroes": (HeroSuggestion, "hero"),
+    "interests": (InterestSuggestion, "interest"),
+}
+
+_FIELD_MARKER = re.compile(r"\[\[ ## \w+ ## \]\]")
+
+
+class SuggestionsParseError(StructuredOutputError):
+    """The LM's output held no usable hero or interest."""
+
 
 class InterestSuggestionSignature(dspy.Signature):
-    """Suggests heroes and interests based on user's mission and outputs them as a single JSON object."""
-    
+    """
+    Analyze the user's mission and suggest 8-10 inspiring figures (heroes) and 5-6 broad
+    interest categories relevant to it. List the heroes first.
+    """
+
     mission_statement = dspy.InputField(desc="The user's refined mission statement")
-    
-    suggestions_json = dspy.OutputField(desc="A single, valid JSON object containing lists of suggested heroes and interests.")
+
+    suggestions_json = dspy.OutputField(
+        desc='A single JSON object: {"heroes": [{"name": "Person Name", "reason": "Why they are relevant"}, ...], '
+             '"interests": [{"category": "Category Name", "description": "Why it is relevant"}, ...]}. '
+             'No text outside the JSON object.'
+    )
+
+
+class SuggestionsParser:
+    """
+    Parses suggestions_json as it arrives. Each hero and interest is
+    validated against its model as soon as it is complete, so a stream can
+    show heroes before the interests are written. A broken or cut-off
+    document is repaired or salvaged from the elements that did parse,
+    rather than thrown away.
+    """
+
+    def __init__(self):
+        self._stream = JSONItemStream()
+        self.heroes: List[Dict[str, Any]] = []
+        self.interests: List[Dict[str, Any]] = []
+        self.rejected = 0
+
+    @property
+    def started(self) -> bool:
+        return self._stream.started
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Returns ("hero" | "interest", item) for each element completed by `chunk`."""
+        items = []
+        for key, value in self._stream.feed(_FIELD_MARKER.sub("", chunk)):
+            if key not in SUGGESTION_FIELDS:
+                continue
+            model, event = SUGGESTION_FIELDS[key]
+            if isinstance(value, str):
+                # A bare name instead of an object
+                value = {next(iter(model.model_fields)): value}
+                self._stream.repaired += 1
+            try:
+                item = model.model_validate(value).model_dump()
+            except ValidationError:
+                self.rejected += 1
+                continue
+            getattr(self, key).append(item)
+            items.append((event, item))
+        return items
+
+    def result(self, raw: str) -> dspy.Prediction:
+        """
+        The parsed suggestions, with `outcome` set to "valid", "repaired"
+        (text around the JSON, or elements fixed up or dropped), or
+        "salvaged" (the document was cut off). Raises SuggestionsParseError when nothing usable arrived.
+        """
+        stream = self._stream
+        if not self.heroes and not self.interests:
+            outcome = "failed"
+        elif not stream.done:
+            outcome = "salvaged"
+        elif stream.repaired or stream.invalid or self.rejected or not stream.clean or stream.close() is None:
+            outcome = "repaired"
+        else:
+            outcome = "valid"
+        STRUCTURED_OUTPUTS.inc("suggestions", outcome)
+        if outcome == "failed":
+            raise SuggestionsParseError(f"No usable suggestions in LM output: {raw[:200]!r}")
+        return dspy.Prediction(
+            heroes=self.heroes, interests=self.interests, outcome=outcome, suggestions_json=raw,
+        )
 
 
 class InterestSuggester(dspy.Module):
     """
     DSPy module for suggesting heroes, role models, and interests based on user's mission.
+
+    The output is parsed with SuggestionsParser instead of json.loads, so a
+    slightly malformed or truncated answer is still used. The JSON adapter
+    fallback is off: it would re-ask the LM for the whole answer, which the
+    parser can almost always recover without. When even that fails the
+    call raises, and the deadline policy moves on to the cheaper fast tier.
+
+    `fresh` skips DSPy's LM response cache, which would otherwise replay a
+    cut-off answer to every later request for the same mission.
     """
-    
+
     def __init__(self):
         super().__init__()
-        # Use a Predict module with the updated signature for more reliable JSON output
         self.suggest_interests = dspy.Predict(InterestSuggestionSignature)
-        
-    def forward(self, mission_statement: str) -> dspy.Prediction:
+        self.adapter = dspy.ChatAdapter(use_json_adapter_fallback=False)
+
+    @staticmethod
+    def parse(raw: str) -> dspy.Prediction:
+        parser = SuggestionsParser()
+        parser.feed(raw or "")
+        return parser.result(raw or "")
+
+    @staticmethod
+    def _inputs(mission_statement: str, fresh: bool) -> Dict[str, Any]:
+        inputs: Dict[str, Any] = {"mission_statement": mission_statement}
+        if fresh:
+            inputs["config"] = {"cache": False}
+        return inputs
+
+    def forward(self, mission_statement: str, fresh: bool = False) -> dspy.Prediction:
         """
         Analyzes the user's mission to suggest relevant heroes and interest categories.
         """
-        
-        # The new prompt guides the LM to produce a single, well-formed JSON output
-        prediction = self.suggest_interests(
-            mission_statement=f"""
-            Analyze the user's mission: "{mission_statement}"
-
-            Your task is to generate a list of 8-10 inspiring figures (heroes) and 5-6 broad interest categories relevant to this mission.
-            
-            You MUST format your entire response as a single, valid JSON object, structured exactly like this:
-            {{
-              "heroes": [
-                {{"name": "Person Name", "reason": "A brief explanation of why they are relevant."}},
-                ...
-              ],
-              "interests": [
-                {{"category": "Category Name", "description": "A brief explanation of its relevance."}},
-                ...
-              ]
-            }}
-
-            Ensure the JSON is perfectly formed. Do not include any text, explanations, or markdown backticks outside of the JSON object itself.
-            """
-        )
-        
-        return prediction
+        with span("suggestions.generate"), dspy.context(adapter=self.adapter):
+            try:
+                raw = self.suggest_interests(**self._inputs(mission_statement, fresh)).suggestions_json
+            except AdapterParseError as e:
+                # No field markers, but the JSON itself is often there
+                raw = e.lm_response
+        with span("suggestions.parse"):
+            return self.parse(raw)
+
+    async def aforward(self, mission_statement: str, fresh: bool = False) -> dspy.Prediction:
+        """
+        Async variant of forward() for use on the request path.
+        """
+        with span("suggestions.generate"), dspy.context(adapter=self.adapter):
+            try:
+                raw = (await self.suggest_interests.acall(**self._inputs(mission_statement, fresh))).suggestions_json
+            except AdapterParseError as e:
+                raw = e.lm_response
+        with span("suggestions.parse"):
+            return self.parse(raw)
+
+    async def astream(self, mission_statement: str, fresh: bool = False):
+        """
+        Streaming variant of aforward(). Yields ("hero", item) and
+        ("interest", item) as each one is generated, then ("prediction",
+        prediction) as aforward() would return it.
+        """
+        parser = SuggestionsParser()
+        raw = ""
+        with span("suggestions.generate"), dspy.context(adapter=self.adapter):
+            try:
+                async for kind, value in stream_field(
+                    self.suggest_interests, "suggestions_json", **self._inputs(mission_statement, fresh),
+                ):
+                    if kind == "token":
+                        raw += value
+                        for item in parser.feed(value):
+                            yield item
+                    elif not parser.started:
+                        # Nothing was streamed (e.g. a cached answer); parse it whole
+                        raw = value.suggestions_json
+                        for item in parser.feed(raw):
+                            yield item
+            except AdapterParseError as e:
+                if not parser.started:
+                    raw = e.lm_response
+                    for item in parser.feed(raw):
+                        yield item
+        yield "prediction", parser.result(raw)
+
+
+class CurateContentSlice(dspy.Signature):
+    """
+    Curate inspirational content that would perfectly fit the user's Museboard: quotes, insights,
+    principles and actionable advice from the heroes or related to the interests in focus.
+    Make each piece deeply relevant to the mission, something they'd genuinely want to remember and revisit.
+    """
+
+    mission = dspy.InputField(desc="The user's mission statement")
+    focus = dspy.InputField(desc="The heroes and interests this content should draw on")
+    count = dspy.InputField(desc="How many pieces of content to create")
+
+    content_json = dspy.OutputField(
+        desc='A single JSON object: {"content": [{"type": "quote", "content": "The actual quote or insight", '
+             '"source": "Who said it or where it is from", "category": "Suggested category", '
+             '"relevance_reason": "Why this matters for their mission"}, ...], '
+             '"categories": ["Suggested categories for organization"]}. No text outside the JSON object.'
+    )
 
 
 class ContentCurator(dspy.Module):
     """
     DSPy module for curating external content based on mission and interests.
     This will be enhanced in Phase 3.3 with actual web search capabilities.
+
+    Curation runs in the background (see curation_worker.py), one slice of
+    the user's heroes and interests per call, so the slices can be generated
+    in parallel and each call writes a short list.
     """
     
     def __init__(self):
         super().__init__()
-        self.curate_content = dspy.ChainOfThought(
-            "mission, heroes, interests -> content_suggestions, categories"
+        # A plain Predict: the slices are short, and the JSON is parsed as it streams
+        self.curate_content = dspy.Predict(CurateContentSlice)
+
+    def _inputs(self, mission: str, heroes: List[str], interests: List[str], count: int) -> Dict[str, Any]:
+        focus = "; ".join(
+            part for part in (
+                f"Heroes: {', '.join(heroes)}" if heroes else "",
+                f"Interests: {', '.join(interests)}" if interests else "",
+            ) if part
         )
-        
-    def forward(self, mission: str, heroes: List[str], interests: List[str]) -> dspy.Prediction:
+        return {"mission": mission, "focus": focus or "The mission itself", "count": str(count)}
+
+    def forward(self, mission: str, heroes: List[str], interests: List[str], count: int = 12) -> dspy.Prediction:
         """
         Suggests content that would be valuable for pre-populating the user's Museboard.
         """
-        
-        heroes_str = ", ".join(heroes)
-        interests_str = ", ".join(interests)
-        
-        context = f"""
-        User's Mission: {mission}
-        Their Heroes: {heroes_str}
-        Their Interests: {interests_str}
-        
-        Create 10-15 pieces of inspirational content that would perfectly fit their Museboard.
-        Include quotes, insights, principles, and actionable advice from their heroes or related to their interests.
-        
-        Format as JSON:
-        {{
-            "content": [
-                {{
-                    "type": "quote",
-                    "content": "The actual quote or insight",
-                    "source": "Who said it or where it's from",
-                    "category": "Suggested category",
-                    "relevance_reason": "Why this matters for their mission"
-                }},
-                ...
-            ],
-            "categories": ["List of suggested categories for organization"]
-        }}
-        
-        Make these deeply relevant and inspirational - content they'd genuinely want to remember and revisit.
+        with span("curation.generate"):
+            return self.curate_content(**self._inputs(mission, heroes, interests, count))
+
+    async def aforward(self, mission: str, heroes: List[str], interests: List[str], count: int = 12) -> dspy.Prediction:
+        with span("curation.generate"):
+            return await self.curate_content.acall(**self._inputs(mission, heroes, interests, count))
+
+    async def astream(self, mission: str, heroes: List[str], interests: List[str], count: int = 12):
         """
-        
-        return self.curate_content(
-            mission=mission,
-            heroes=heroes_str,
-            interests=interests_str
-        )
+        Streaming variant of aforward(). Yields ("token", text) chunks of the
+        JSON as they are generated, then ("prediction", prediction).
+        """
+        with span("curation.generate"):
+            async for event in stream_field(
+                self.curate_content, "content_json", **self._inputs(mission, heroes, interests, count),
+            ):
+                yield event
 
 
 # --- The rest of your signatures remain the same ---
@@ -1,6 +1,27 @@
 # museboard-ai-service/dspy_modules/search.py
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
 import dspy
-from core.config import supabase, openai_client
+from core.context_packer import ContextPacker
+from core.deadlines import Deadline, DeadlineExceeded, fallback_tiers, PATH_PRIMARY, PATH_CACHE, PATH_DEGRADED
+from core.hybrid import reciprocal_rank_fusion, rerank
+from core.streaming import stream_field
+from core.telemetry import span
+from core.config import (
+    services, embedding_cache, answer_cache, local_vector_index, local_lexical_index,
+    DEFAULT_MATCH_THRESHOLD, DEFAULT_MATCH_COUNT, COMPACT_EMBEDDINGS_ENABLED, COMPACT_RESCORE_MULTIPLIER,
+    HYBRID_RERANK_ENABLED, HYBRID_CANDIDATE_MULTIPLIER, HYBRID_RRF_K,
+    RAG_CONTEXT_TOKEN_BUDGET, RAG_ITEM_TOKEN_CAP, RAG_DEDUP_THRESHOLD,
+)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+NO_RESULTS_ANSWER = "I couldn't find any relevant items in your Museboard for that query."
+# Sent with the sources when no answer could be generated within the deadline
+DEGRADED_ANSWER = "Here are the most relevant items from your Museboard; I couldn't write a full answer in time."
+
+logger = logging.getLogger(__name__)
 
 class GenerateAnswer(dspy.Signature):
     """Answer the user's question based *only* on the provided context from their Museboard.
@@ -9,32 +30,315 @@ class GenerateAnswer(dspy.Signature):
     question = dspy.InputField(desc="The user's original question.")
     answer = dspy.OutputField(desc="A comprehensive answer synthesized from the context.")
 
+class GenerateAnswers(dspy.Signature):
+    """Answer each of the user's questions based *only* on the provided context from their Museboard.
+    Synthesize the information from the context into a cohesive answer for every question."""
+    context = dspy.InputField(desc="Relevant items from the user's Museboard, for all of the questions.")
+    questions = dspy.InputField(desc="The user's questions, numbered.")
+    answers: list[str] = dspy.OutputField(desc="One answer per question, in the same order as the questions.")
+
+# Answer modes for batch search: retrieval only, one LM call per query, or
+# one multi-question LM call for the whole batch.
+BATCH_ANSWER_MODES = ("none", "separate", "combined")
+
 class RAG(dspy.Module):
     def __init__(self):
         super().__init__()
         self.generate_answer = dspy.ChainOfThought(GenerateAnswer)
+        # Answers without the reasoning step, for when time is short
+        self.generate_answer_fast = dspy.Predict(GenerateAnswer)
+        self.generate_answers = dspy.ChainOfThought(GenerateAnswers)
+        self.context_packer = ContextPacker(
+            token_budget=RAG_CONTEXT_TOKEN_BUDGET, item_token_cap=RAG_ITEM_TOKEN_CAP,
+            dedup_threshold=RAG_DEDUP_THRESHOLD,
+        )
 
-    def _generate_embedding(self, text: str):
+    async def _agenerate_embedding(self, text: str):
         text = text.replace("\n", " ")
-        response = openai_client.embeddings.create(input=[text], model="text-embedding-3-small")
-        return response.data[0].embedding
-
-    def forward(self, question, user_id):
-        question_embedding = self._generate_embedding(question)
-        
-        retrieved_context = supabase.rpc('match_muse_items', {
-            'query_embedding': question_embedding, 'match_threshold': 0.70, 
-            'match_count': 5, 'p_user_id': user_id
-        }).execute()
-        
-        if not retrieved_context.data:
-            return dspy.Prediction(answer="I couldn't find any relevant items in your Museboard for that query.", sources=[])
-
-        context_str = "\n\n---\n\n".join([
-            f"Type: {item['content_type']}\nContent: {item['content'][:500]}\nDescription: {item.get('description', '') or 'N/A'}" 
-            for item in retrieved_context.data
-        ])
-
-        prediction = self.generate_answer(context=context_str, question=question)
-        
-        return dspy.Prediction(answer=prediction.answer, sources=retrieved_context.data)
\ No newline at end of file
+
+        async def embed(texts):
+            async_openai_client = await services.aget("async_openai")
+            response = await async_openai_client.embeddings.create(input=texts, model=EMBEDDING_MODEL)
+            return [d.embedding for d in response.data]
+
+        with span("search.embed"):
+            return (await embedding_cache.aembed(EMBEDDING_MODEL, [text], embed))[0]
+
+    def _match_rpc(self, question_embedding, user_id, match_threshold, match_count):
+        """The vector search RPC and its parameters: exact, or coarse-then-rescore on compact embeddings."""
+        params = {
+            'query_embedding': question_embedding, 'match_threshold': match_threshold,
+            'match_count': match_count, 'p_user_id': user_id
+        }
+        if COMPACT_EMBEDDINGS_ENABLED:
+            return 'match_muse_items_compact', {**params, 'p_rescore_count': match_count * COMPACT_RESCORE_MULTIPLIER}
+        return 'match_muse_items', params
+
+    async def _avector_match(self, question_embedding, user_id, match_threshold, match_count):
+        if local_vector_index is not None:
+            try:
+                with span("search.retrieve.local"):
+                    return await local_vector_index.search(user_id, question_embedding, match_count, match_threshold)
+            except Exception as e:
+                logger.warning(f"Local vector index failed for user {user_id}, falling back to match_muse_items: {e}")
+
+        with span("search.retrieve.rpc"):
+            async_supabase = await services.aget("async_supabase")
+            response = await async_supabase.rpc(
+                *self._match_rpc(question_embedding, user_id, match_threshold, match_count)
+            ).execute()
+            return response.data
+
+    def _build_context(self, question, items, token_budget=None):
+        # Packs the most relevant items and passages into the token budget
+        with span("search.pack"):
+            packed = self.context_packer.pack(question, items, token_budget)
+        logger.debug(
+            f"Packed {len(packed.items)}/{len(items)} items into {packed.tokens} tokens "
+            f"({packed.duplicates} duplicates, {packed.trimmed} trimmed, {packed.skipped} skipped)"
+        )
+        return packed.text
+
+    async def _avector_match_many(self, question_embeddings, user_id, match_threshold, match_count):
+        if local_vector_index is not None:
+            try:
+                with span("search.retrieve.local"):
+                    return await local_vector_index.search_many(user_id, question_embeddings, match_count, match_threshold)
+            except Exception as e:
+                logger.warning(f"Local vector index failed for user {user_id}, falling back to match_muse_items: {e}")
+
+        # One RPC per query, all in flight at once
+        return await asyncio.gather(*(
+            self._avector_match(embedding, user_id, match_threshold, match_count) for embedding in question_embeddings
+        ))
+
+    # --- Hybrid Retrieval ---
+
+    async def _akeyword_match_many(self, questions: List[str], user_id, match_count) -> List[List[Dict[str, Any]]]:
+        try:
+            with span("search.retrieve.lexical"):
+                return await local_lexical_index.search_many(user_id, questions, match_count)
+        except Exception as e:
+            logger.warning(f"Lexical index failed for user {user_id}, using vector matches only: {e}")
+            return [[] for _ in questions]
+
+    def _fuse(self, question, vector_matches, keyword_matches, match_count):
+        with span("search.fuse"):
+            fused = reciprocal_rank_fusion([vector_matches, keyword_matches], k=HYBRID_RRF_K)
+        if HYBRID_RERANK_ENABLED:
+            with span("search.rerank"):
+                fused = rerank(question, fused)
+        return fused[:match_count]
+
+    async def _amatch_items(self, question, question_embedding, user_id, match_threshold, match_count):
+        return (await self._amatch_many([question], [question_embedding], user_id, match_threshold, match_count))[0]
+
+    async def _amatch_many(self, questions, question_embeddings, user_id, match_threshold, match_count):
+        """
+        Vector matches per question, fused with keyword matches when hybrid
+        retrieval is enabled. Both retrievers fetch extra candidates so fusion
+        and reranking have room to reorder before the top `match_count` are kept.
+        """
+        if local_lexical_index is None:
+            return await self._avector_match_many(question_embeddings, user_id, match_threshold, match_count)
+
+        candidates = match_count * HYBRID_CANDIDATE_MULTIPLIER
+        vector_matches, keyword_matches = await asyncio.gather(
+            self._avector_match_many(question_embeddings, user_id, match_threshold, candidates),
+            self._akeyword_match_many(questions, user_id, candidates),
+        )
+        return [
+            self._fuse(question, vectors, keywords, match_count)
+            for question, vectors, keywords in zip(questions, vector_matches, keyword_matches)
+        ]
+
+    async def aretrieve(self, question, user_id, match_threshold=DEFAULT_MATCH_THRESHOLD, match_count=DEFAULT_MATCH_COUNT):
+        """Embeds the question and retrieves matching items. Returns (question_embedding, sources)."""
+        question_embedding = await self._agenerate_embedding(question)
+        sources = await self._amatch_items(question, question_embedding, user_id, match_threshold, match_count)
+        return question_embedding, sources
+
+    async def _agenerate(self, question, context, deadline: Optional[Deadline]):
+        """Generates the answer, within the deadline if there is one. Returns (answer, path)."""
+        async def generate(fast: bool):
+            program = self.generate_answer_fast if fast else self.generate_answer
+            with span("search.generate"):
+                return (await program.acall(context=context, question=question)).answer
+
+        if deadline is None:
+            return await generate(False), PATH_PRIMARY
+        return await deadline.run(fallback_tiers(generate, await services.aget("fallback_lm")))
+
+    async def aforward(self, question, user_id, match_threshold=DEFAULT_MATCH_THRESHOLD, match_count=DEFAULT_MATCH_COUNT,
+                       deadline: Optional[Deadline] = None):
+        # RAG has no synchronous forward(): every network hop is awaited so the
+        # event loop can serve other requests while this one waits. The
+        # prediction's `path` tells how the answer was produced.
+        question_embedding, sources = await self.aretrieve(question, user_id, match_threshold, match_count)
+
+        if not sources:
+            return dspy.Prediction(answer=NO_RESULTS_ANSWER, sources=[], path=PATH_PRIMARY)
+
+        # Retrieval is cheap next to generation, so it always runs; that lets
+        # the cache check that the answer would be built from the same items.
+        with span("search.answer_cache"):
+            cached = answer_cache.lookup(user_id, question_embedding, sources)
+        if cached is not None:
+            return dspy.Prediction(answer=cached.answer, sources=sources, path=PATH_CACHE)
+
+        context = self._build_context(question, sources)
+        try:
+            answer, path = await self._agenerate(question, context, deadline)
+        except DeadlineExceeded:
+            return dspy.Prediction(answer=DEGRADED_ANSWER, sources=sources, path=PATH_DEGRADED)
+        # Answers from the fast path aren't cached, so the next asker can get a full one
+        if path == PATH_PRIMARY:
+            answer_cache.store(user_id, question_embedding, sources, answer)
+
+        return dspy.Prediction(answer=answer, sources=sources, path=path)
+
+    async def astream(self, question, user_id, match_threshold=DEFAULT_MATCH_THRESHOLD, match_count=DEFAULT_MATCH_COUNT):
+        """
+        Streaming variant of aforward(). Yields ("sources", items) as soon as
+        retrieval finishes, then ("token", text) chunks of the answer, and
+        finally ("prediction", prediction) with the complete answer and sources.
+        """
+        question_embedding, sources = await self.aretrieve(question, user_id, match_threshold, match_count)
+        yield "sources", sources
+
+        if not sources:
+            yield "prediction", dspy.Prediction(answer=NO_RESULTS_ANSWER, sources=[])
+            return
+
+        with span("search.answer_cache"):
+            cached = answer_cache.lookup(user_id, question_embedding, sources)
+        if cached is not None:
+            yield "token", cached.answer
+            yield "prediction", dspy.Prediction(answer=cached.answer, sources=sources)
+            return
+
+        answer = ""
+        context = self._build_context(question, sources)
+        with span("search.generate"):
+            async for kind, value in stream_field(self.generate_answer, "answer", context=context, question=question):
+                if kind == "token":
+                    yield kind, value
+                else:
+                    answer = value.answer
+        answer_cache.store(user_id, question_embedding, sources, answer)
+
+        yield "prediction", dspy.Prediction(answer=answer, sources=sources)
+
+    # --- Batch Search ---
+
+    async def aretrieve_many(self, questions: List[str], user_id, match_threshold=DEFAULT_MATCH_THRESHOLD,
+                             match_count=DEFAULT_MATCH_COUNT):
+        """
+        Embeds all questions in one embeddings call and retrieves matches for
+        each. Returns (question_embeddings, sources_per_question).
+        """
+        texts = [question.replace("\n", " ") for question in questions]
+
+        async def embed(batch):
+            async_openai_client = await services.aget("async_openai")
+            response = await async_openai_client.embeddings.create(input=batch, model=EMBEDDING_MODEL)
+            return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+        with span("search.embed"):
+            question_embeddings = await embedding_cache.aembed(EMBEDDING_MODEL, texts, embed)
+        sources = await self._amatch_many(questions, question_embeddings, user_id, match_threshold, match_count)
+        return question_embeddings, sources
+
+    async def _acombined_answers(self, questions: List[str], sources: List[List[Dict[str, Any]]]) -> List[str]:
+        # Items retrieved for several questions go into the shared context once
+        unique_items = list({item["id"]: item for items in sources for item in items}.values())
+        numbered = "\n".join(f"Question {i}: {question}" for i, question in enumerate(questions, 1))
+        # The shared context gets the budget the questions would have had separately
+        context = self._build_context(" ".join(questions), unique_items, self.context_packer.token_budget * len(questions))
+        with span("search.generate"):
+            prediction = await self.generate_answers.acall(context=context, questions=numbered)
+        answers = list(prediction.answers or [])
+        if len(answers) != len(questions):
+            raise ValueError(f"Expected {len(questions)} answers, got {len(answers)}")
+        return [str(answer) for answer in answers]
+
+    async def _aseparate_answers(self, questions: List[str], sources: List[List[Dict[str, Any]]],
+                                 fast: bool = False) -> List[str]:
+        program = self.generate_answer_fast if fast else self.generate_answer
+
+        async def answer(question, items):
+            context = self._build_context(question, items)
+            with span("search.generate"):
+                prediction = await program.acall(context=context, question=question)
+            return prediction.answer
+
+        return list(await asyncio.gather(*(answer(q, items) for q, items in zip(questions, sources))))
+
+    async def _abatch_answers(self, questions: List[str], sources: List[List[Dict[str, Any]]], answer_mode: str,
+                              deadline: Optional[Deadline]):
+        """Answers the questions, within the deadline if there is one. Returns (answers, path, combined)."""
+        async def generate(fast: bool):
+            # The fast path answers each question on its own with the short program
+            if answer_mode == "combined" and len(questions) > 1 and not fast:
+                try:
+                    return await self._acombined_answers(questions, sources), True
+                except Exception as e:
+                    logger.warning(f"Combined answer generation failed, answering questions separately: {e}")
+            return await self._aseparate_answers(questions, sources, fast), False
+
+        if deadline is None:
+            (answers, combined), path = await generate(False), PATH_PRIMARY
+        else:
+            # Not hedged: a second attempt would repeat every question's LM call
+            tiers = fallback_tiers(generate, await services.aget("fallback_lm"), hedge=False)
+            (answers, combined), path = await deadline.run(tiers)
+        return answers, path, combined
+
+    async def abatch(self, questions: List[str], user_id, match_threshold=DEFAULT_MATCH_THRESHOLD,
+                     match_count=DEFAULT_MATCH_COUNT, answer_mode: str = "combined",
+                     deadline: Optional[Deadline] = None) -> dspy.Prediction:
+        """
+        Searches several questions for one user at once. The prediction's
+        `results` are {"query", "answer", "sources"} in question order
+        (`answer` is None when answer_mode is "none"), and its `path` tells
+        how the answers were produced, as in aforward().
+        """
+        question_embeddings, sources = await self.aretrieve_many(questions, user_id, match_threshold, match_count)
+        results = [{"query": q, "answer": None, "sources": items} for q, items in zip(questions, sources)]
+        if answer_mode == "none":
+            return dspy.Prediction(results=results, path=PATH_PRIMARY)
+
+        # Questions still needing an LM answer: not empty and not in the answer cache
+        pending, from_cache = [], False
+        with span("search.answer_cache"):
+            for i, (embedding, items) in enumerate(zip(question_embeddings, sources)):
+                if not items:
+                    results[i]["answer"] = NO_RESULTS_ANSWER
+                    continue
+                cached = answer_cache.lookup(user_id, embedding, items)
+                if cached is not None:
+                    results[i]["answer"] = cached.answer
+                    from_cache = True
+                else:
+                    pending.append(i)
+        if not pending:
+            return dspy.Prediction(results=results, path=PATH_CACHE if from_cache else PATH_PRIMARY)
+
+        pending_questions = [questions[i] for i in pending]
+        pending_sources = [sources[i] for i in pending]
+        try:
+            answers, path, combined = await self._abatch_answers(
+                pending_questions, pending_sources, answer_mode, deadline,
+            )
+        except DeadlineExceeded:
+            for i in pending:
+                results[i]["answer"] = DEGRADED_ANSWER
+            return dspy.Prediction(results=results, path=PATH_DEGRADED)
+
+        for i, answer in zip(pending, answers):
+            results[i]["answer"] = answer
+            # The cache serves single searches too, so it only keeps answers written for one
+            # question from the full program: not a combined answer, nor one from the fast path
+            if path == PATH_PRIMARY and not combined:
+                answer_cache.store(user_id, question_embeddings[i], sources[i], answer)
+        return dspy.Prediction(results=results, path=path)
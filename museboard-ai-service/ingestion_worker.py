@@ -0,0 +1,408 @@
+# museboard-ai-service/ingestion_worker.py
+
+"""
+Embedding ingestion worker.
+
+Consumes 'embedding' jobs that the muse_items trigger queues in
+ai_processing_jobs (see supabase/migrations/*_embedding_ingestion_queue.sql),
+micro-batches them by size and time window, embeds each batch with one
+OpenAI request and writes the vectors back with one bulk update, which also
+marks the items' ai_status 'completed'. It replaced invoking the
+generate-embedding edge function once per inserted row, and is the only
+thing that embeds new items.
+
+- Backpressure: jobs are only claimed while the in-memory queue has room,
+  and the queue only drains as fast as batches finish, so a slow or
+  rate-limited OpenAI keeps jobs in the database instead of in memory.
+- Leases: a claimed job is locked for INGESTION_LEASE_SECONDS, and the worker
+  renews the lease of every job it holds (queued or in a batch) every third
+  of that, so a deep queue behind a slow OpenAI isn't claimed again by
+  another worker. Only a worker that died stops renewing.
+- Retries: rate limits and transient errors are retried within a batch
+  (the backfill's adaptive limiter); a batch that still fails goes back to
+  the queue with an exponential backoff.
+- Dead-lettering: a job is left 'failed' after INGESTION_MAX_ATTEMPTS. A
+  batch rejected outright (e.g. one malformed input) is split in halves, so
+  only the offending items are dead-lettered.
+
+The text embedded for each item comes from backfill_embeddings.py, so both
+paths produce identical vectors.
+
+Runs inside the API process unless INGESTION_WORKER=false, or standalone.
+In-process, embedded items are announced on the items-changed event bus;
+standalone, pass --notify-url to have the API told over HTTP.
+
+Usage (from museboard-ai-service/):
+    python ingestion_worker.py --batch-size 256 --max-wait-ms 200
+    python ingestion_worker.py --requeue-failed
+"""
+
+import argparse
+import asyncio
+import datetime
+import inspect
+import logging
+import signal
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from backfill_embeddings import (
+    EMBEDDING_MODEL, MAX_INPUTS_PER_REQUEST, AdaptiveRateLimiter, EmbeddingFailed,
+    build_embedding_text, embed_texts, make_batches,
+)
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_JOB = "embedding"
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class IngestionWorker:
+    """
+    Claims embedding jobs, batches them and writes the embeddings back.
+    `run()` works until `stop()` is called, then finishes every job it has
+    already claimed before returning.
+    """
+
+    def __init__(self, supabase, openai_client, cache=None, batch_size: int = 256, max_wait: float = 0.2,
+                 max_pending: int = 2048, concurrency: int = 4, max_attempts: int = 5, max_retries: int = 4,
+                 poll_interval: float = 1.0, lease_seconds: int = 300, backoff_seconds: int = 10,
+                 on_embedded: Optional[Callable[[str, List[str]], Any]] = None):
+        self.supabase = supabase
+        self.openai_client = openai_client
+        self.cache = cache
+        self.batch_size = min(batch_size, MAX_INPUTS_PER_REQUEST)
+        self.max_wait = max_wait
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.backoff_seconds = backoff_seconds
+        self.on_embedded = on_embedded
+
+        self.limiter = AdaptiveRateLimiter(concurrency)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._stopping = asyncio.Event()
+        self._in_flight: set = set()
+        # IDs of the jobs claimed and not yet completed or failed
+        self._held: set = set()
+
+        self.claimed = 0
+        self.embedded = 0
+        self.skipped = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.batches = 0
+        self.requests = 0
+        self.renewals = 0
+
+    def stop(self):
+        self._stopping.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "batches_in_flight": len(self._in_flight),
+            "held": len(self._held),
+            "claimed": self.claimed,
+            "embedded": self.embedded,
+            "skipped": self.skipped,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "batches": self.batches,
+            "embedding_requests": self.requests,
+            "lease_renewals": self.renewals,
+            "concurrency_limit": self.limiter.limit,
+        }
+
+    # --- Claiming ---
+
+    async def _sleep(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _claim_loop(self):
+        while not self._stopping.is_set():
+            room = self._queue.maxsize - self._queue.qsize()
+            if room < min(self.batch_size, self._queue.maxsize):
+                # Backpressure: wait for the batches in flight to drain the queue
+                await self._sleep(self.max_wait)
+                continue
+            try:
+                jobs = (await self.supabase.rpc("claim_ai_jobs", {
+                    "p_job_type": EMBEDDING_JOB, "p_limit": room, "p_lease_seconds": self.lease_seconds,
+                }).execute()).data or []
+            except Exception as e:
+                logger.warning(f"Failed to claim embedding jobs: {e}")
+                jobs = []
+            for job in jobs:
+                self._held.add(job["id"])
+                self._queue.put_nowait(job)
+            self.claimed += len(jobs)
+            if len(jobs) < room:
+                # The queue table is drained for now
+                await self._sleep(self.poll_interval)
+
+    async def _renew_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            held = list(self._held)
+            if not held:
+                continue
+            try:
+                await self.supabase.rpc("renew_ai_jobs", {"p_ids": held}).execute()
+                self.renewals += 1
+            except Exception as e:
+                # Retried at the next interval; only a whole lease without a renewal lets the jobs go
+                logger.warning(f"Failed to renew the lease of {len(held)} embedding jobs: {e}")
+
+    # --- Batching ---
+
+    async def _next_job(self, timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        """The next claimed job, or None on timeout or when stopping with nothing left to do."""
+        if not self._queue.empty():
+            return self._queue.get_nowait()
+        if self._stopping.is_set():
+            return None
+        getter = asyncio.ensure_future(self._queue.get())
+        stopper = asyncio.ensure_future(self._stopping.wait())
+        done, _ = await asyncio.wait({getter, stopper}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        stopper.cancel()
+        if getter in done:
+            return getter.result()
+        getter.cancel()
+        # The queue may have handed over a job just as the wait timed out
+        if getter.done() and not getter.cancelled():
+            return getter.result()
+        return None
+
+    async def run(self):
+        claimer = asyncio.create_task(self._claim_loop())
+        renewer = asyncio.create_task(self._renew_loop())
+        try:
+            while True:
+                job = await self._next_job(timeout=None)
+                if job is None:
+                    break
+                batch = [job]
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    job = await self._next_job(timeout=remaining)
+                    if job is None:
+                        break
+                    batch.append(job)
+
+                await self._slots.acquire()
+                task = asyncio.create_task(self._process(batch))
+                self._in_flight.add(task)
+                task.add_done_callback(self._batch_done)
+        finally:
+            self._stopping.set()
+            await claimer
+            if self._in_flight:
+                await asyncio.gather(*self._in_flight, return_exceptions=True)
+            renewer.cancel()
+
+    def _batch_done(self, task: asyncio.Task):
+        self._in_flight.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Embedding batch crashed: {task.exception()}")
+
+    # --- Processing ---
+
+    async def _process(self, jobs: List[Dict[str, Any]]):
+        self.batches += 1
+        jobs_by_item: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for job in jobs:
+            jobs_by_item[job["item_id"]].append(job)
+
+        try:
+            rows = (
+                await self.supabase.from_("muse_items")
+                .select("id, user_id, content, content_type, description, deleted_at")
+                .in_("id", list(jobs_by_item))
+                .execute()
+            ).data
+        except Exception as e:
+            await self._fail(jobs, f"Failed to read items: {e}")
+            return
+
+        items = [row for row in rows if row.get("deleted_at") is None]
+        live_ids = {item["id"] for item in items}
+        # Deleted since they were queued: nothing left to embed
+        gone = [job for item_id, item_jobs in jobs_by_item.items() if item_id not in live_ids for job in item_jobs]
+        if gone:
+            self.skipped += len(gone)
+            await self._complete(gone)
+
+        for item in items:
+            item["text"] = build_embedding_text(item)
+        for sub_batch in make_batches(items, self.batch_size):
+            await self._embed_and_write(sub_batch, jobs_by_item)
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        async def embed_missing(missing):
+            self.requests += 1
+            return await embed_texts(missing, self.openai_client, self.limiter, self.max_retries)
+
+        if self.cache is None:
+            return await embed_missing(texts)
+        return await self.cache.aembed(EMBEDDING_MODEL, texts, embed_missing)
+
+    async def _embed_and_write(self, items: List[Dict[str, Any]], jobs_by_item: Dict[str, List[Dict[str, Any]]]):
+        jobs = [job for item in items for job in jobs_by_item[item["id"]]]
+        try:
+            embeddings = await self._embed([item["text"] for item in items])
+        except EmbeddingFailed as e:
+            # A request rejected outright (not merely out of retries) may be down
+            # to a single bad input; split the batch to isolate it.
+            if e.__cause__ is not None and len(items) > 1:
+                middle = len(items) // 2
+                await self._embed_and_write(items[:middle], jobs_by_item)
+                await self._embed_and_write(items[middle:], jobs_by_item)
+            else:
+                await self._fail(jobs, str(e))
+            return
+
+        try:
+            await self.supabase.rpc("set_item_embeddings", {
+                "p_items": [{"id": item["id"], "embedding": embedding} for item, embedding in zip(items, embeddings)],
+            }).execute()
+        except Exception as e:
+            await self._fail(jobs, f"Failed to write embeddings: {e}")
+            return
+
+        await self._complete(jobs)
+        self.embedded += len(items)
+        if self.on_embedded is not None:
+            by_user: Dict[str, List[str]] = defaultdict(list)
+            for item in items:
+                by_user[item["user_id"]].append(item["id"])
+            for user_id, item_ids in by_user.items():
+                try:
+                    result = self.on_embedded(user_id, item_ids)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.warning(f"Failed to announce new embeddings for user {user_id}: {e}")
+
+    async def _complete(self, jobs: List[Dict[str, Any]]):
+        self._held.difference_update(job["id"] for job in jobs)
+        try:
+            await self.supabase.from_("ai_processing_jobs").update({
+                "status": "completed", "completed_at": _now(), "locked_at": None, "error_message": None,
+            }).in_("id", [job["id"] for job in jobs]).execute()
+        except Exception as e:
+            # The embeddings are written; the jobs are claimed again after their
+            # lease expires and simply re-embed the same text.
+            logger.warning(f"Failed to mark {len(jobs)} embedding jobs completed: {e}")
+
+    async def _fail(self, jobs: List[Dict[str, Any]], error: str):
+        dead = sum(1 for job in jobs if job.get("attempts", 0) >= self.max_attempts)
+        logger.warning(f"{len(jobs)} embedding jobs failed ({dead} dead-lettered): {error}")
+        self._held.difference_update(job["id"] for job in jobs)
+        try:
+            await self.supabase.rpc("fail_ai_jobs", {
+                "p_ids": [job["id"] for job in jobs], "p_error": error[:1000],
+                "p_max_attempts": self.max_attempts, "p_backoff_seconds": self.backoff_seconds,
+            }).execute()
+        except Exception as e:
+            logger.warning(f"Failed to record failed embedding jobs; they retry when their lease expires: {e}")
+        self.dead_lettered += dead
+        self.retried += len(jobs) - dead
+
+
+def build_worker(supabase, openai_client, cache=None, **overrides) -> IngestionWorker:
+    """An IngestionWorker with the INGESTION_* settings from core.config, overridable per argument."""
+    from core import config
+
+    settings = dict(
+        batch_size=config.INGESTION_BATCH_SIZE,
+        max_wait=config.INGESTION_MAX_WAIT_MS / 1000,
+        max_pending=config.INGESTION_MAX_PENDING,
+        concurrency=config.INGESTION_CONCURRENCY,
+        max_attempts=config.INGESTION_MAX_ATTEMPTS,
+        poll_interval=config.INGESTION_POLL_INTERVAL,
+        lease_seconds=config.INGESTION_LEASE_SECONDS,
+    )
+    settings.update(overrides)
+    return IngestionWorker(supabase, openai_client, cache=cache, **settings)
+
+
+async def requeue_failed(supabase) -> int:
+    rows = (
+        await supabase.from_("ai_processing_jobs")
+        .update({"status": "pending", "attempts": 0, "available_at": _now(), "completed_at": None})
+        .eq("job_type", EMBEDDING_JOB)
+        .eq("status", "failed")
+        .execute()
+    ).data
+    return len(rows or [])
+
+
+async def main(args):
+    import openai
+    from supabase import acreate_client
+
+    from core.config import embedding_cache, supabase_url, supabase_key, services
+    from core.telemetry import configure_logging
+
+    configure_logging(args.log_level)
+    supabase = await acreate_client(supabase_url, supabase_key)
+    if args.requeue_failed:
+        print(f"Requeued {await requeue_failed(supabase)} dead-lettered embedding jobs.")
+        return
+
+    # Retries are disabled because the worker applies its own adaptive, Retry-After driven backoff
+    openai_client = openai.AsyncOpenAI(api_key=services.openai_api_key, max_retries=0)
+    overrides = {
+        name: value for name, value in {
+            "batch_size": args.batch_size,
+            "max_wait": args.max_wait_ms / 1000 if args.max_wait_ms is not None else None,
+            "concurrency": args.concurrency,
+        }.items() if value is not None
+    }
+    on_embedded = None
+    if args.notify_url:
+        import httpx
+
+        http = httpx.AsyncClient(timeout=10)
+
+        async def on_embedded(user_id, item_ids):
+            # Lets the API refresh its local indexes and answer cache
+            await http.post(args.notify_url, json={"user_id": user_id, "item_ids": item_ids})
+
+    worker = build_worker(supabase, openai_client, cache=embedding_cache, on_embedded=on_embedded, **overrides)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    logger.info(f"Ingestion worker started (batch size {worker.batch_size}, window {worker.max_wait * 1000:.0f}ms)")
+    try:
+        await worker.run()
+    finally:
+        embedding_cache.close()
+    logger.info(f"Ingestion worker stopped: {worker.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, help=f"Most items per embedding request (max {MAX_INPUTS_PER_REQUEST}).")
+    parser.add_argument("--max-wait-ms", type=float, help="Longest a job waits for its batch to fill.")
+    parser.add_argument("--concurrency", type=int, help="Maximum batches, and embedding requests, in flight.")
+    parser.add_argument("--notify-url", help="The API's /api/v1/items/changed URL, called for each embedded batch.")
+    parser.add_argument("--requeue-failed", action="store_true", help="Put dead-lettered jobs back in the queue and exit.")
+    parser.add_argument("--log-level", default="INFO")
+    asyncio.run(main(parser.parse_args()))
@@ -1,34 +1,290 @@
 # museboard-ai-service/main.py
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional, Dict
-import json
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional, Dict, Literal, Tuple
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
+import asyncio
+import importlib
+import logging
+import os
+import time
 
 # Make sure your imports align with your project structure
 # from core.config import supabase
-from dspy_modules.chat import ShadowAgent
-from dspy_modules.search import RAG
-from dspy_modules.mission_enhance import MissionEnhancer
-from dspy_modules.onboarding import InterestSuggester
+from core.config import (
+    services, DEFAULT_MATCH_THRESHOLD, DEFAULT_MATCH_COUNT, SEARCH_BATCH_MAX_QUERIES,
+    LOG_LEVEL, ENDPOINT_CONCURRENCY, ENDPOINT_QUEUE_TIMEOUT,
+    CHAT_HISTORY_TOKEN_BUDGET, CHAT_SUMMARY_TOKEN_BUDGET, CHAT_ITEMS_TOKEN_BUDGET,
+    embedding_cache, answer_cache, local_vector_index, local_lexical_index,
+    suggestions_cache, mission_enhance_cache, incomplete_suggestions, INGESTION_WORKER_ENABLED,
+    shared_cache, SHARED_EVENTS_POLL_INTERVAL, WARM_UP_BEFORE_SERVING, lm_deadlines,
+    user_profiles, conversation_store, CURATION_WORKER_ENABLED, COMPILED_PROGRAMS_DIR,
+)
+from core.memo import normalize_key
+from core.context_builder import ContextBuilder, ChatContext
+from core.conversation_store import Conversation
+from core.events import event_bus, ITEMS_CHANGED, CONVERSATIONS_CHANGED
+from core.shared_cache import SharedEventRelay
+from core.concurrency import EndpointLimiter
+from core.deadlines import DeadlineExceeded, fallback_tiers, PATH_HEADER, PATH_PRIMARY, PATH_CACHE, PATH_DEGRADED
+from core.json_stream import StructuredOutputError
+from core.streaming import sse_event, SSE_HEADERS
+from core.telemetry import configure_logging, registry, span, RequestTelemetryMiddleware, RESPONSE_PATHS
+from curation_worker import CURATION_JOB, build_worker as build_curation_worker
 
-app = FastAPI()
+configure_logging(LOG_LEVEL)
+logger = logging.getLogger("museboard")
 
 # --- Initialize DSPy Modules ---
-shadow_agent = ShadowAgent()
-rag_agent = RAG()
-mission_enhancer = MissionEnhancer()
-interest_suggester = InterestSuggester()
+# DSPy, LiteLLM and the OpenAI SDK take seconds to import, so the modules are
+# built on first use (and warmed in the background at startup) rather than
+# at import time. The health check answers in the meantime.
+def _load_agents() -> SimpleNamespace:
+    from dspy_modules.chat import ShadowAgent
+    from dspy_modules.search import RAG
+    from dspy_modules.mission_enhance import MissionEnhancer
+    from dspy_modules.onboarding import InterestSuggester, ContentCurator
+    from dspy_modules.compiled import load_compiled
+
+    shadow_agent = ShadowAgent()
+    mission_enhancer = MissionEnhancer()
+    interest_suggester = InterestSuggester()
+    load_compiled(mission_enhancer, "mission_enhancer", COMPILED_PROGRAMS_DIR)
+    load_compiled(interest_suggester, "interest_suggester", COMPILED_PROGRAMS_DIR)
+    context_builder = ContextBuilder(
+        summarize=shadow_agent.asummarize,
+        history_budget=CHAT_HISTORY_TOKEN_BUDGET,
+        summary_budget=CHAT_SUMMARY_TOKEN_BUDGET,
+        items_budget=CHAT_ITEMS_TOKEN_BUDGET,
+    )
+    # Stored conversations past their turn limit are summarized, never cut
+    conversation_store.fold = context_builder.fold
+    return SimpleNamespace(
+        shadow_agent=shadow_agent,
+        rag_agent=RAG(),
+        mission_enhancer=mission_enhancer,
+        interest_suggester=interest_suggester,
+        content_curator=ContentCurator(),
+        # --- Chat Context Assembly ---
+        context_builder=context_builder,
+    )
+
+async def _build_agents() -> SimpleNamespace:
+    await services.aget("dspy")
+    return await asyncio.to_thread(_load_agents)
+
+services.register("agents", _build_agents)
+
+# Services /ready waits for; everything the endpoints need on their first request
+READINESS_SERVICES = ("dspy", "agents", "async_openai", "async_supabase")
+
+async def get_agents() -> SimpleNamespace:
+    try:
+        return await services.aget("agents")
+    except Exception:
+        raise HTTPException(status_code=503, detail="AI service is not ready.")
+
+# --- LM Deadlines ---
+TIMEOUT_DETAIL = "AI service took too long to respond, please retry."
+
+async def get_fallback_lm():
+    return await services.aget("fallback_lm")
+
+def _tag_path(response: Response, endpoint: str, path: str):
+    """Tells the client (and the metrics) which path produced the response: primary, fast, cache or degraded."""
+    response.headers[PATH_HEADER] = path
+    RESPONSE_PATHS.inc(endpoint, path)
+
+# --- Embedding Ingestion ---
+async def _run_ingestion_worker():
+    try:
+        # Imported off the event loop: the worker pulls in the OpenAI and Supabase SDKs
+        build_worker = (await asyncio.to_thread(importlib.import_module, "ingestion_worker")).build_worker
+        supabase = await services.aget("async_supabase")
+        # The worker applies its own Retry-After driven backoff
+        openai_client = (await services.aget("async_openai")).with_options(max_retries=0)
+        worker = build_worker(
+            supabase, openai_client, cache=embedding_cache,
+            on_embedded=lambda user_id, item_ids: event_bus.emit(ITEMS_CHANGED, user_id, item_ids),
+        )
+        app.state.ingestion_worker = worker
+        await worker.run()
+    except Exception:
+        logger.exception("Ingestion worker failed")
+
+# --- Content Curation ---
+async def _get_content_curator():
+    return (await get_agents()).content_curator
+
+async def _run_curation_worker():
+    try:
+        supabase = await services.aget("async_supabase")
+        worker = build_curation_worker(
+            supabase, _get_content_curator,
+            on_inserted=lambda user_id, item_ids: event_bus.emit(ITEMS_CHANGED, user_id, item_ids),
+        )
+        app.state.curation_worker = worker
+        await worker.run()
+    except Exception:
+        logger.exception("Curation worker failed")
+
+async def _stop_worker(name: str, task: asyncio.Task):
+    worker = getattr(app.state, name, None)
+    if worker is not None:
+        # Finish the jobs already claimed; anything left is reclaimed after its lease
+        worker.stop()
+    try:
+        await asyncio.wait_for(task, timeout=30)
+    except Exception as e:
+        logger.warning(f"{name} did not stop cleanly: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up = asyncio.create_task(services.warm_up(READINESS_SERVICES))
+    if WARM_UP_BEFORE_SERVING:
+        # A worker started by serve.py accepts connections only once ready,
+        # so traffic stays on the other workers while it loads
+        await asyncio.shield(warm_up)
+    ingestion = asyncio.create_task(_run_ingestion_worker()) if INGESTION_WORKER_ENABLED else None
+    curation = asyncio.create_task(_run_curation_worker()) if CURATION_WORKER_ENABLED else None
+    relay = asyncio.create_task(shared_events.run()) if shared_events is not None else None
+    conversations = asyncio.create_task(conversation_store.run())
+    yield
+    warm_up.cancel()
+    # Write the turns still queued before the relay stops telling other workers
+    conversation_store.stop()
+    try:
+        await asyncio.wait_for(conversations, timeout=30)
+    except Exception as e:
+        logger.warning(f"conversation_store did not stop cleanly: {e}")
+    if relay is not None:
+        relay.cancel()
+    if ingestion is not None:
+        await _stop_worker("ingestion_worker", ingestion)
+    if curation is not None:
+        await _stop_worker("curation_worker", curation)
+    # Vectors embedded in the last moments are still queued for the SQLite tier
+    await embedding_cache.aflush()
+    if shared_cache is not None:
+        await shared_cache.aflush()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestTelemetryMiddleware)
+
+# --- Per-endpoint Concurrency Limits ---
+limiter = EndpointLimiter(ENDPOINT_CONCURRENCY, queue_timeout=ENDPOINT_QUEUE_TIMEOUT)
+
+# --- Item Change Subscribers ---
+event_bus.on(ITEMS_CHANGED, answer_cache.invalidate_user)
+event_bus.on(ITEMS_CHANGED, user_profiles.mark_stale)
+if local_vector_index is not None:
+    event_bus.on(ITEMS_CHANGED, local_vector_index.mark_stale)
+if local_lexical_index is not None:
+    event_bus.on(ITEMS_CHANGED, local_lexical_index.mark_stale)
+
+# --- Conversation Change Subscribers ---
+def _drop_stale_conversations(origin_pid: int, conversation_ids: List[str]):
+    # This worker's own copies are the ones just written
+    if origin_pid != os.getpid():
+        conversation_store.invalidate(conversation_ids)
+
+conversation_store.on_persisted = lambda conversation_ids: event_bus.emit(
+    CONVERSATIONS_CHANGED, os.getpid(), conversation_ids,
+)
+event_bus.on(CONVERSATIONS_CHANGED, _drop_stale_conversations)
+
+# With several workers, a notification reaching one worker is relayed to the others
+shared_events = (
+    SharedEventRelay(
+        shared_cache, event_bus, [ITEMS_CHANGED, CONVERSATIONS_CHANGED], poll_interval=SHARED_EVENTS_POLL_INTERVAL,
+    )
+    if shared_cache is not None else None
+)
+
+# --- Metrics ---
+def _collect_cache_stats() -> Dict[str, Dict]:
+    caches = {
+        "embeddings": embedding_cache.stats(),
+        "answers": answer_cache.stats(),
+        "suggestions": suggestions_cache.stats(),
+        "mission_enhance": mission_enhance_cache.stats(),
+        "suggestions_incomplete": incomplete_suggestions.stats(),
+        "profiles": user_profiles.stats(),
+        "conversations": conversation_store.stats(),
+    }
+    if local_vector_index is not None:
+        caches["vector_index"] = local_vector_index.stats()
+    if local_lexical_index is not None:
+        caches["lexical_index"] = local_lexical_index.stats()
+    if shared_cache is not None:
+        caches["shared"] = {
+            **shared_cache.stats(),
+            "events_published": shared_events.published,
+            "events_replayed": shared_events.replayed,
+        }
+    return caches
+
+def _cache_samples():
+    for cache, stats in _collect_cache_stats().items():
+        for stat, value in stats.items():
+            yield (cache, stat), value
+
+registry.gauge_callback(
+    "museboard_cache_stat", "Counters and sizes reported by the service's caches.", ("cache", "stat"), _cache_samples,
+)
+registry.gauge_callback(
+    "museboard_ingestion_stat", "Counters and queue depth of the in-process embedding ingestion worker.", ("stat",),
+    lambda: (((stat,), value) for stat, value in getattr(app.state, "ingestion_worker", None).stats().items())
+    if getattr(app.state, "ingestion_worker", None) is not None else (),
+)
+registry.gauge_callback(
+    "museboard_curation_stat", "Counters of the in-process content curation worker.", ("stat",),
+    lambda: (((stat,), value) for stat, value in getattr(app.state, "curation_worker", None).stats().items())
+    if getattr(app.state, "curation_worker", None) is not None else (),
+)
+registry.gauge_callback(
+    "museboard_deadline_stat", "Calls, hedges and fallbacks made under the LM deadlines.", ("stat",),
+    lambda: (((stat,), value) for stat, value in lm_deadlines.stats().items()),
+)
+registry.gauge_callback(
+    "museboard_endpoint_in_flight", "Requests currently holding an endpoint concurrency slot.", ("endpoint",),
+    lambda: (((endpoint,), limiter.in_flight(endpoint)) for endpoint in ENDPOINT_CONCURRENCY),
+)
 
 # --- Pydantic Models for API Contracts ---
 class ChatRequest(BaseModel):
-    context: Dict
     user_message: str
     conversation_id: str
+    # With a user_id the service builds the context itself, from its profile
+    # of the user and the conversation it keeps server-side (ConversationStore),
+    # so the client only sends the new message
+    user_id: Optional[str] = None
+    # Otherwise the client sends it: mission, totalItems, topCategories, conversationHistory
+    context: Optional[Dict] = None
+
+    @model_validator(mode="after")
+    def _user_or_context(self):
+        if self.user_id is None and self.context is None:
+            raise ValueError("Either user_id or context is required.")
+        return self
 
 class SearchRequest(BaseModel):
     query: str
     user_id: str
+    match_threshold: float = Field(DEFAULT_MATCH_THRESHOLD, ge=-1.0, le=1.0)
+    match_count: int = Field(DEFAULT_MATCH_COUNT, ge=1, le=50)
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=SEARCH_BATCH_MAX_QUERIES)
+    user_id: str
+    match_threshold: float = Field(DEFAULT_MATCH_THRESHOLD, ge=-1.0, le=1.0)
+    match_count: int = Field(DEFAULT_MATCH_COUNT, ge=1, le=50)
+    # "none": sources only (e.g. related-items panels), "separate": one LM call
+    # per query, "combined": one multi-question LM call for the whole batch
+    answer_mode: Literal["none", "separate", "combined"] = "combined"
 
 class MissionEnhanceRequest(BaseModel):
     user_input: str
@@ -37,101 +293,447 @@ class SuggestionRequest(BaseModel):
     mission: str
 
 class ContentCurationRequest(BaseModel):
+    user_id: str
     mission: str
     heroes: Optional[List[str]] = []
     interests: Optional[List[str]] = []
 
+class ItemsChangedRequest(BaseModel):
+    user_id: str
+    item_ids: Optional[List[str]] = []
+
 # --- API Endpoints ---
 
 @app.get("/")
 def health_check():
     return {"status": "ok", "service": "museboard-ai-service"}
 
+@app.get("/ready")
+def readiness_check():
+    """
+    Readiness probe: 200 once the LM, DSPy modules and clients are loaded,
+    503 with per-service status while they are loading or if one failed.
+    """
+    status = services.status(READINESS_SERVICES)
+    ready = all(state == "ready" for state in status.values())
+    return JSONResponse(
+        {"ready": ready, "services": status, "load_ms": {k: round(v * 1000) for k, v in services.load_seconds().items()}},
+        status_code=200 if ready else 503,
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/v1/stats/cache")
+def cache_stats():
+    # Counters are per worker process; "worker" tells which one answered
+    return {**_collect_cache_stats(), "worker": {"pid": os.getpid()}}
+
+@app.get("/api/v1/users/{user_id}/profile")
+async def user_profile(user_id: str, include_centroid: bool = False):
+    """
+    The service's running profile of a user: item counts by content type,
+    top categories, latest items and, on request, the interest centroid.
+    """
+    try:
+        profile = await user_profiles.get_profile(user_id)
+    except Exception as e:
+        logger.error(f"Error in user_profile: {e}")
+        raise HTTPException(status_code=500, detail="AI service error while loading the profile.")
+    return profile.to_dict(include_centroid=include_centroid)
+
+@app.post("/api/v1/items/changed")
+def items_changed(request: ItemsChangedRequest):
+    """
+    Notifies the service that a user's muse_items were created, edited or
+    deleted, so anything cached from their items is refreshed.
+    """
+    event_bus.emit(ITEMS_CHANGED, request.user_id, request.item_ids or [])
+    return {"status": "ok"}
+
+def _chat_inputs(request: ChatRequest, mission: str, chat_context: ChatContext) -> Dict:
+    """Builds ShadowAgent inputs from the mission and the budgeted history."""
+    return {
+        "mission": mission,
+        "question": request.user_message,
+        "recent_items_summary": chat_context.items_summary,
+        "history_summary": chat_context.history,
+    }
+
+async def _build_chat_context(
+    context_builder: ContextBuilder, request: ChatRequest,
+) -> Tuple[str, ChatContext, Optional[Conversation]]:
+    """
+    The mission and budgeted context for a chat turn: from the user's profile
+    and the server-side conversation, or from the client's context. The
+    conversation is returned so the turn can be recorded once answered.
+    """
+    if request.user_id is not None:
+        with span("chat.profile"):
+            profile, conversation = await asyncio.gather(
+                user_profiles.get_profile(request.user_id), conversation_store.get(request.conversation_id),
+            )
+        conversation.item_ids = [item["id"] for item in profile.recent_items()]
+        with span("chat.context"):
+            chat_context = context_builder.build(
+                request.conversation_id, list(conversation.turns), profile.describe(), summary=conversation.summary,
+            )
+        return profile.mission, chat_context, conversation
+
+    user_context = request.context
+    mission = user_context.get('mission', '')
+    history = user_context.get('conversationHistory', [])
+    recent_items_summary = f"User has {user_context.get('totalItems', 0)} items. Recent themes: {', '.join(user_context.get('topCategories', []))}"
+    with span("chat.context"):
+        return mission, context_builder.build(request.conversation_id, history, recent_items_summary), None
+
+def _record_chat_turn(request: ChatRequest, conversation: Optional[Conversation], response: str):
+    # Client-supplied histories are the client's to keep
+    if conversation is not None:
+        conversation_store.record_turn(conversation, request.user_message, response)
+
+def _log_chat_turn(conversation_id: str, chat_context: ChatContext, prediction, started: float, path: str = PATH_PRIMARY):
+    usage = prediction.get_lm_usage() or {}
+    prompt_tokens = sum(u.get("prompt_tokens", 0) or 0 for u in usage.values())
+    logger.info(
+        f"chat conversation={conversation_id} path={path} prompt_tokens={prompt_tokens} "
+        f"history_tokens={chat_context.history_tokens}/{chat_context.raw_history_tokens} "
+        f"recent_turns={chat_context.recent_turns} summarized_turns={chat_context.summarized_turns} "
+        f"latency_ms={(time.perf_counter() - started) * 1000:.0f}"
+    )
+
 @app.post("/api/v1/shadow/chat")
-async def chat_with_shadow(request: ChatRequest):
+async def chat_with_shadow(request: ChatRequest, response: Response):
     # Your existing chat logic
     try:
-        user_context = request.context
-        history_summary = "\n".join([f"{msg.get('role')}: {msg.get('content')}" for msg in user_context.get('conversationHistory', [])])
-        recent_items_summary = f"User has {user_context.get('totalItems', 0)} items. Recent themes: {', '.join(user_context.get('topCategories', []))}"
-        
-        prediction = shadow_agent(
-            mission=user_context.get('mission', ''),
-            question=request.user_message,
-            recent_items_summary=recent_items_summary,
-            history_summary=history_summary
-        )
+        started = time.perf_counter()
+        deadline = lm_deadlines.start("chat")
+        agents = await get_agents()
+        mission, chat_context, conversation = await _build_chat_context(agents.context_builder, request)
+        inputs = _chat_inputs(request, mission, chat_context)
+        tiers = fallback_tiers(lambda fast: agents.shadow_agent.acall(**inputs, fast=fast), await get_fallback_lm())
+        async with limiter.slot("chat"):
+            prediction, path = await deadline.run(tiers)
+        _log_chat_turn(request.conversation_id, chat_context, prediction, started, path)
+        _record_chat_turn(request, conversation, prediction.response)
+        _tag_path(response, "chat", path)
         
         return {"response": prediction.response}
+    except HTTPException:
+        raise
+    except DeadlineExceeded as e:
+        logger.error(f"Error in chat_with_shadow: {e}")
+        raise HTTPException(status_code=504, detail=TIMEOUT_DETAIL)
     except Exception as e:
-        print(f"Error in chat_with_shadow: {e}")
+        logger.error(f"Error in chat_with_shadow: {e}")
         raise HTTPException(status_code=500, detail="AI service error during chat.")
 
 @app.post("/api/v1/shadow/search")
-async def search_museboard(request: SearchRequest):
+async def search_museboard(request: SearchRequest, response: Response):
     # Your existing RAG search logic
     try:
-        prediction = rag_agent(question=request.query, user_id=request.user_id)
+        deadline = lm_deadlines.start("search")
+        agents = await get_agents()
+        async with limiter.slot("search"):
+            prediction = await agents.rag_agent.acall(
+                question=request.query,
+                user_id=request.user_id,
+                match_threshold=request.match_threshold,
+                match_count=request.match_count,
+                deadline=deadline,
+            )
+        _tag_path(response, "search", prediction.path)
         return {"answer": prediction.answer, "sources": prediction.sources}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in search_museboard: {e}")
+        logger.error(f"Error in search_museboard: {e}")
         raise HTTPException(status_code=500, detail="AI service error during search.")
 
+@app.post("/api/v1/shadow/search/batch")
+async def search_museboard_batch(request: BatchSearchRequest, response: Response):
+    """
+    Runs several searches for one user in a single request: one embeddings
+    call for all queries, retrieval for all of them at once and, depending on
+    answer_mode, a single multi-question generation. Results come back in
+    query order. The batch occupies one search slot and has the search
+    deadline, falling back to the fast tier or retrieval-only answers.
+    """
+    try:
+        deadline = lm_deadlines.start("search")
+        agents = await get_agents()
+        async with limiter.slot("search"):
+            prediction = await agents.rag_agent.abatch(
+                request.queries,
+                user_id=request.user_id,
+                match_threshold=request.match_threshold,
+                match_count=request.match_count,
+                answer_mode=request.answer_mode,
+                deadline=deadline,
+            )
+        _tag_path(response, "search_batch", prediction.path)
+        return {"results": prediction.results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in search_museboard_batch: {e}")
+        raise HTTPException(status_code=500, detail="AI service error during search.")
+
+# --- Streaming Endpoints ---
+# Server-Sent Events variants of chat and search. Tokens are sent as the LM
+# produces them ("token" events); search sends its "sources" first, and both
+# finish with a "done" event carrying the same payload as the non-streaming
+# endpoint. Failures after the stream has started arrive as an "error" event.
+
+@app.post("/api/v1/shadow/chat/stream")
+async def chat_with_shadow_stream(request: ChatRequest):
+    started = time.perf_counter()
+    agents = await get_agents()
+    mission, chat_context, conversation = await _build_chat_context(agents.context_builder, request)
+
+    async def events():
+        try:
+            async with limiter.slot("chat"):
+                async for kind, value in agents.shadow_agent.astream(**_chat_inputs(request, mission, chat_context)):
+                    if kind == "token":
+                        yield sse_event("token", {"text": value})
+                    else:
+                        _log_chat_turn(request.conversation_id, chat_context, value, started)
+                        _record_chat_turn(request, conversation, value.response)
+                        yield sse_event("done", {"response": value.response})
+        except HTTPException as e:
+            yield sse_event("error", {"detail": e.detail})
+        except Exception as e:
+            logger.error(f"Error in chat_with_shadow_stream: {e}")
+            yield sse_event("error", {"detail": "AI service error during chat."})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/api/v1/shadow/search/stream")
+async def search_museboard_stream(request: SearchRequest):
+    agents = await get_agents()
+
+    async def events():
+        try:
+            async with limiter.slot("search"):
+                async for kind, value in agents.rag_agent.astream(
+                    question=request.query,
+                    user_id=request.user_id,
+                    match_threshold=request.match_threshold,
+                    match_count=request.match_count,
+                ):
+                    if kind == "sources":
+                        yield sse_event("sources", {"sources": value})
+                    elif kind == "token":
+                        yield sse_event("token", {"text": value})
+                    else:
+                        yield sse_event("done", {"answer": value.answer, "sources": value.sources})
+        except HTTPException as e:
+            yield sse_event("error", {"detail": e.detail})
+        except Exception as e:
+            logger.error(f"Error in search_museboard_stream: {e}")
+            yield sse_event("error", {"detail": "AI service error during search."})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.post("/api/v1/onboarding/mission/enhance")
-async def enhance_mission(request: MissionEnhanceRequest):
+async def enhance_mission(request: MissionEnhanceRequest, response: Response):
     """
     Enhances user input into a clear, inspiring mission statement.
     """
     if not request.user_input or not request.user_input.strip():
         raise HTTPException(status_code=400, detail="User input is required.")
         
+    deadline = lm_deadlines.start("mission_enhance")
+    # Set only when this request made the LM call rather than reusing a result
+    computed = {}
+
+    async def enhance() -> str:
+        agents = await get_agents()
+        tiers = fallback_tiers(
+            lambda fast: agents.mission_enhancer.acall(user_input=request.user_input, fast=fast), await get_fallback_lm(),
+        )
+        async with limiter.slot("mission_enhance"):
+            prediction, computed["path"] = await deadline.run(tiers)
+        return prediction.mission
+
     try:
-        prediction = mission_enhancer(user_input=request.user_input)
-        return {"mission": prediction.mission, "enhanced": True}
+        # A fast-tier mission is only good enough for this request
+        mission = await mission_enhance_cache.get_or_compute(
+            normalize_key(request.user_input), enhance, cacheable=lambda _: computed.get("path") == PATH_PRIMARY,
+        )
+        _tag_path(response, "mission_enhance", computed.get("path", PATH_CACHE))
+        return {"mission": mission, "enhanced": True}
     except Exception as e:
-        print(f"Error in enhance_mission: {e}")
-        # Fallback to input if enhancement fails
+        logger.error(f"Error in enhance_mission: {e}")
+        # Fallback to input if enhancement fails (including when the endpoint is saturated or out of time)
+        _tag_path(response, "mission_enhance", PATH_DEGRADED)
         return {"mission": request.user_input.strip(), "enhanced": False}
 
 @app.post("/api/v1/onboarding/suggestions")
-async def get_inspiration_suggestions(request: SuggestionRequest):
+async def get_inspiration_suggestions(request: SuggestionRequest, response: Response):
     """
     Generates hero and interest suggestions based on a mission statement.
     """
     if not request.mission or not request.mission.strip():
         raise HTTPException(status_code=400, detail="Mission statement is required.")
         
+    deadline = lm_deadlines.start("suggestions")
+    key = normalize_key(request.mission)
+    # Set only when this request made the LM call rather than reusing a result
+    computed = {}
+
+    async def suggest() -> Dict:
+        agents = await get_agents()
+        fresh = await _needs_fresh_suggestions(key)
+        # InterestSuggester is a single Predict already; its fast path only swaps in the fallback LM
+        tiers = fallback_tiers(
+            lambda fast: agents.interest_suggester.acall(mission_statement=request.mission, fresh=fresh),
+            await get_fallback_lm(),
+        )
+        async with limiter.slot("suggestions"):
+            prediction, computed["path"] = await deadline.run(tiers)
+        return _suggestions_payload(prediction)
+
     try:
-        prediction = interest_suggester(mission_statement=request.mission)
-        
-        # Access the single, more reliable JSON output field
-        raw_suggestions = prediction.suggestions_json
-        
-        suggestions = json.loads(raw_suggestions)
-        return {
-            "heroes": suggestions.get("heroes", []),
-            "interests": suggestions.get("interests", []),
-        }
-    except json.JSONDecodeError:
-        # Better error logging to see what the AI returned if it's not valid JSON
-        invalid_output = getattr(prediction, 'suggestions_json', 'N/A')
-        print(f"AI service did not return valid JSON for mission: '{request.mission}'. Received: {invalid_output}")
+        suggestions = await suggestions_cache.get_or_compute(
+            key, suggest,
+            cacheable=lambda suggestions: _suggestions_complete(key, suggestions) and computed.get("path") == PATH_PRIMARY,
+        )
+        _tag_path(response, "suggestions", computed.get("path", PATH_CACHE))
+        return suggestions
+    except HTTPException:
+        raise
+    except DeadlineExceeded as e:
+        logger.error(f"Error in get_inspiration_suggestions: {e}")
+        raise HTTPException(status_code=504, detail=TIMEOUT_DETAIL)
+    except StructuredOutputError as e:
+        logger.warning(f"AI service did not return usable suggestions for mission: '{request.mission}'. {e}")
         raise HTTPException(status_code=500, detail="AI service returned an invalid format.")
     except Exception as e:
-        print(f"Error in get_inspiration_suggestions: {e}")
+        logger.error(f"Error in get_inspiration_suggestions: {e}")
         raise HTTPException(status_code=500, detail="An error occurred while generating suggestions.")
 
-@app.post("/api/v1/onboarding/content/curate")
+@app.post("/api/v1/onboarding/suggestions/stream")
+async def get_inspiration_suggestions_stream(request: SuggestionRequest):
+    """
+    Server-Sent Events variant of /api/v1/onboarding/suggestions: a "hero"
+    or "interest" event for each suggestion as soon as the LM has written
+    it, then "done" with the same payload as the non-streaming endpoint.
+    """
+    if not request.mission or not request.mission.strip():
+        raise HTTPException(status_code=400, detail="Mission statement is required.")
+    key = normalize_key(request.mission)
+
+    async def events():
+        try:
+            suggestions = await suggestions_cache.peek(key)
+            if suggestions is None:
+                agents = await get_agents()
+                fresh = await _needs_fresh_suggestions(key)
+                async with limiter.slot("suggestions"):
+                    async for kind, value in agents.interest_suggester.astream(
+                        mission_statement=request.mission, fresh=fresh,
+                    ):
+                        if kind == "prediction":
+                            suggestions = _suggestions_payload(value)
+                        else:
+                            yield sse_event(kind, value)
+                if _suggestions_complete(key, suggestions):
+                    suggestions_cache.store(key, suggestions)
+            else:
+                for hero in suggestions["heroes"]:
+                    yield sse_event("hero", hero)
+                for interest in suggestions["interests"]:
+                    yield sse_event("interest", interest)
+            yield sse_event("done", suggestions)
+        except HTTPException as e:
+            yield sse_event("error", {"detail": e.detail})
+        except StructuredOutputError as e:
+            logger.warning(f"AI service did not return usable suggestions for mission: '{request.mission}'. {e}")
+            yield sse_event("error", {"detail": "AI service returned an invalid format."})
+        except Exception as e:
+            logger.error(f"Error in get_inspiration_suggestions_stream: {e}")
+            yield sse_event("error", {"detail": "An error occurred while generating suggestions."})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _suggestions_payload(prediction) -> Dict:
+    # `complete` is false when the LM's answer was cut off and only the suggestions before the cut were kept
+    return {
+        "heroes": prediction.heroes,
+        "interests": prediction.interests,
+        "complete": prediction.outcome != "salvaged",
+    }
+
+def _suggestions_complete(key: str, suggestions: Dict) -> bool:
+    # A cut-off answer is served once but not cached, and the mission is
+    # marked so the next request asks the LM again instead of its cache
+    if suggestions.get("complete", True):
+        return True
+    incomplete_suggestions.store(key, True)
+    return False
+
+async def _needs_fresh_suggestions(key: str) -> bool:
+    return await incomplete_suggestions.peek(key) is not None
+
+@app.post("/api/v1/onboarding/content/curate", status_code=202)
 async def curate_content(request: ContentCurationRequest):
-    # Your existing content curation logic
+    """
+    Queues content curation for a user who just finished onboarding and
+    returns the job's ID at once. The curation worker puts the items on the
+    user's Museboard; poll the job for its progress.
+    """
+    try:
+        supabase = await services.aget("async_supabase")
+        response = await supabase.from_("ai_processing_jobs").insert({
+            "job_type": CURATION_JOB,
+            "user_id": request.user_id,
+            "status": "pending",
+            "input_data": {"mission": request.mission, "heroes": request.heroes or [], "interests": request.interests or []},
+        }).execute()
+        job = response.data[0]
+    except Exception as e:
+        logger.error(f"Error in curate_content: {e}")
+        raise HTTPException(status_code=500, detail="AI service error during content curation.")
+    worker = getattr(app.state, "curation_worker", None)
+    if worker is not None:
+        worker.wake()
+    return {"job_id": job["id"], "status": job.get("status") or "pending"}
+
+@app.get("/api/v1/onboarding/content/curate/{job_id}")
+async def curation_status(job_id: str, user_id: str):
+    """
+    Progress of a curation job: its status and the content curated so far.
+    Items appear while the job is still running, as each one is generated.
+    """
     try:
-        # This can be replaced with your ContentCurator DSPy module call later
-        # For now, using the fallback logic is fine
-        fallback_content = [
-            {"type": "quote", "content": "The only way to do great work is to love what you do.", "source": "Steve Jobs", "category": "Passion", "relevance_reason": "Aligns passion with purpose."},
-            {"type": "quote", "content": "Success is not final, failure is not fatal: it is the courage to continue that counts.", "source": "Winston Churchill", "category": "Resilience", "relevance_reason": "Persistence is key."}
-        ]
-        return {"content": fallback_content}
+        supabase = await services.aget("async_supabase")
+        rows = (
+            await supabase.from_("ai_processing_jobs")
+            .select("id, status, result_data, error_message")
+            .eq("id", job_id)
+            .eq("user_id", user_id)
+            .eq("job_type", CURATION_JOB)
+            .limit(1)
+            .execute()
+        ).data
     except Exception as e:
-        print(f"Error in curate_content: {e}")
-        raise HTTPException(status_code=500, detail="AI service error during content curation.")
\ No newline at end of file
+        logger.error(f"Error in curation_status: {e}")
+        raise HTTPException(status_code=500, detail="AI service error while reading the curation job.")
+    if not rows:
+        raise HTTPException(status_code=404, detail="Curation job not found.")
+    job = rows[0]
+    result = job.get("result_data") or {}
+    return {
+        "job_id": job["id"],
+        "status": job.get("status") or "pending",
+        "content": result.get("content", []),
+        "categories": result.get("categories", []),
+        "slices": result.get("slices"),
+        "slices_done": result.get("slices_done", 0),
+        "degraded": result.get("degraded", False),
+        "error": job.get("error_message"),
+    }
@@ -0,0 +1,98 @@
+# museboard-ai-service/serve.py
+
+"""
+Production entry point: runs the API in several worker processes on one port.
+
+Each worker is a separate process with its own event loop, DSPy modules and
+clients, so requests are spread over every core instead of one. Workers
+share caches through files in /dev/shm, created by default when
+there is more than one worker:
+
+- SHARED_CACHE_PATH: onboarding LM results and the items-changed relay
+  (see core/shared_cache.py).
+- EMBEDDING_CACHE_PATH: the embedding cache's SQLite tier.
+- CONVERSATION_STORE_PATH: chat conversations, so a conversation's next
+  turn can land on any worker (see core/conversation_store.py).
+
+Set any of them to an empty string to keep that tier per worker. Local
+vector and lexical indexes are still per worker, so their memory use grows
+with the number of workers.
+
+With several workers, each one loads the LM, DSPy modules and clients before
+it accepts connections, so a new worker takes no traffic until it is ready.
+
+Recycling: with --max-requests, a worker stops accepting connections after
+that many requests, plus a random jitter so workers don't all restart at
+once. It finishes its in-flight requests within --graceful-timeout and
+then exits, and the supervisor starts a fresh worker in its place. Sending
+SIGHUP to the supervisor replaces the workers one at a time (e.g. after a
+deploy). A worker that dies is replaced the same way.
+
+Usage (from museboard-ai-service/):
+    python serve.py --workers 4 --max-requests 10000
+"""
+
+import argparse
+import logging
+import os
+
+from core.config import (
+    SERVE_HOST, SERVE_PORT, SERVE_WORKERS, SERVE_MAX_REQUESTS, SERVE_MAX_REQUESTS_JITTER, SERVE_GRACEFUL_TIMEOUT,
+    LOG_LEVEL,
+)
+from core.shared_cache import default_shared_path
+
+logger = logging.getLogger("museboard.serve")
+
+
+def configure_workers(port: int):
+    """
+    Points every worker at the same cache files, unless they were configured,
+    and has workers load fully before they accept connections. Workers are
+    started as fresh interpreters and read these from the environment.
+    """
+    os.environ.setdefault("SHARED_CACHE_PATH", default_shared_path(f"museboard-{port}-shared.sqlite"))
+    os.environ.setdefault("EMBEDDING_CACHE_PATH", default_shared_path(f"museboard-{port}-embeddings.sqlite"))
+    os.environ.setdefault("CONVERSATION_STORE_PATH", default_shared_path(f"museboard-{port}-conversations.sqlite"))
+    os.environ.setdefault("WARM_UP_BEFORE_SERVING", "true")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="main:app", help="ASGI application to serve.")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS, help="Worker processes (WEB_CONCURRENCY).")
+    parser.add_argument("--max-requests", type=int, default=SERVE_MAX_REQUESTS,
+                        help="Recycle a worker after this many requests (0 = never).")
+    parser.add_argument("--max-requests-jitter", type=int, default=SERVE_MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-timeout", type=int, default=SERVE_GRACEFUL_TIMEOUT,
+                        help="Seconds a stopping worker has to finish its in-flight requests.")
+    parser.add_argument("--log-level", default=LOG_LEVEL.lower())
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+    max_requests = args.max_requests or None
+    if args.workers > 1:
+        configure_workers(args.port)
+    elif max_requests:
+        # A lone worker has no supervisor to replace it, so it would just stop serving
+        logger.warning("--max-requests needs more than one worker; recycling is disabled")
+        max_requests = None
+
+    import uvicorn
+
+    uvicorn.run(
+        args.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        limit_max_requests=max_requests,
+        limit_max_requests_jitter=args.max_requests_jitter,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
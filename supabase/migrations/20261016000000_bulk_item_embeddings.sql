@@ -0,0 +1,28 @@
+-- supabase/migrations/20261016000000_bulk_item_embeddings.sql
+
+-- Bulk embedding writes for the backfill (museboard-ai-service/backfill_embeddings.py)
+-- and the ingestion worker.
+--
+-- Only the embedding and ai_status of rows that still exist are written:
+-- an item edited while its embedding was computed keeps its new content,
+-- and an item deleted in the meantime stays deleted.
+
+-- Writes a batch of embeddings in one statement. p_items is a JSON array of
+-- {"id": <item id>, "embedding": [0.1, ...]}.
+create or replace function public.set_item_embeddings(p_items jsonb)
+returns integer
+language sql
+security definer
+set search_path = public
+as $$
+  with updated as (
+    update public.muse_items m
+       set embedding = r.embedding::text::vector, ai_status = 'completed'
+      from jsonb_to_recordset(p_items) as r(id uuid, embedding jsonb)
+     where m.id = r.id
+    returning 1
+  )
+  select count(*)::integer from updated;
+$$;
+
+revoke execute on function public.set_item_embeddings(jsonb) from public, anon, authenticated;
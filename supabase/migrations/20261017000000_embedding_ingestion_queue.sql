@@ -0,0 +1,153 @@
+-- supabase/migrations/20261017000000_embedding_ingestion_queue.sql
+
+-- Embedding ingestion queue.
+--
+-- New and edited muse_items are queued as 'embedding' jobs in
+-- ai_processing_jobs. The ingestion worker in museboard-ai-service
+-- (ingestion_worker.py) claims them in micro-batches, embeds each batch with
+-- one OpenAI request and writes the vectors back in bulk. This replaces
+-- calling the generate-embedding edge function once per inserted row: the
+-- function is removed and its database webhook dropped below, so every item
+-- is embedded exactly once, by the worker. The API runs the worker in-process
+-- by default (INGESTION_WORKER).
+--
+-- Job lifecycle: pending -> processing -> completed, or back to pending with
+-- an exponential backoff on failure. After the last attempt the job is left
+-- as 'failed' (the dead-letter state) with its error_message, and the item's
+-- ai_status becomes 'failed'. `python ingestion_worker.py --requeue-failed`
+-- puts dead-lettered jobs back in the queue. Embeddings are written with
+-- set_item_embeddings (20261016000000_bulk_item_embeddings.sql).
+
+-- --- Queue columns ---
+
+alter table public.ai_processing_jobs
+  add column if not exists attempts integer not null default 0,
+  add column if not exists available_at timestamptz not null default now(),
+  add column if not exists locked_at timestamptz;
+
+create index if not exists ai_processing_jobs_claim_idx
+  on public.ai_processing_jobs (job_type, available_at)
+  where status in ('pending', 'processing');
+
+-- --- Enqueueing ---
+
+create or replace function public.enqueue_embedding_job()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  if tg_op = 'UPDATE'
+     and new.content is not distinct from old.content
+     and new.description is not distinct from old.description then
+    return new;
+  end if;
+  -- Several edits before the worker gets to an item need only one embedding
+  insert into public.ai_processing_jobs (job_type, item_id, user_id, status)
+  select 'embedding', new.id, new.user_id, 'pending'
+  where not exists (
+    select 1 from public.ai_processing_jobs
+    where job_type = 'embedding' and item_id = new.id and status = 'pending'
+  );
+  return new;
+end;
+$$;
+
+drop trigger if exists muse_items_enqueue_embedding on public.muse_items;
+create trigger muse_items_enqueue_embedding
+  after insert or update of content, description on public.muse_items
+  for each row execute function public.enqueue_embedding_job();
+
+-- The generate-embedding webhook: a trigger on muse_items calling
+-- supabase_functions.http_request with the function's URL. Its name was
+-- chosen in the dashboard, so it is found by what it calls.
+do $$
+declare
+  hook record;
+begin
+  for hook in
+    select t.tgname
+      from pg_trigger t
+      join pg_proc p on p.oid = t.tgfoid
+      join pg_namespace n on n.oid = p.pronamespace
+     where t.tgrelid = 'public.muse_items'::regclass
+       and not t.tgisinternal
+       and n.nspname = 'supabase_functions'
+       and p.proname = 'http_request'
+       and encode(t.tgargs, 'escape') like '%generate-embedding%'
+  loop
+    execute format('drop trigger %I on public.muse_items', hook.tgname);
+  end loop;
+end;
+$$;
+
+-- --- Worker RPCs ---
+
+-- Claims up to p_limit due jobs. Jobs whose lease expired (their worker died
+-- mid-batch) are claimed again. SKIP LOCKED lets several workers share the queue.
+create or replace function public.claim_ai_jobs(p_job_type text, p_limit integer, p_lease_seconds integer default 300)
+returns setof public.ai_processing_jobs
+language sql
+security definer
+set search_path = public
+as $$
+  update public.ai_processing_jobs j
+     set status = 'processing', locked_at = now(), attempts = j.attempts + 1
+   where j.id in (
+     select id from public.ai_processing_jobs
+      where job_type = p_job_type
+        and ((status = 'pending' and available_at <= now())
+          or (status = 'processing' and locked_at < now() - make_interval(secs => p_lease_seconds)))
+      order by available_at
+      limit p_limit
+      for update skip locked
+   )
+  returning j.*;
+$$;
+
+-- Extends the lease of jobs a worker has claimed but not finished yet, so
+-- jobs still waiting in its queue aren't claimed again by another worker.
+create or replace function public.renew_ai_jobs(p_ids uuid[])
+returns integer
+language sql
+security definer
+set search_path = public
+as $$
+  with renewed as (
+    update public.ai_processing_jobs
+       set locked_at = now()
+     where id = any(p_ids) and status = 'processing'
+    returning 1
+  )
+  select count(*)::integer from renewed;
+$$;
+
+-- Returns failed jobs to the queue with an exponential backoff, or
+-- dead-letters them once they have used up their attempts.
+create or replace function public.fail_ai_jobs(p_ids uuid[], p_error text, p_max_attempts integer,
+                                               p_backoff_seconds integer default 10)
+returns void
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  update public.ai_processing_jobs
+     set status = case when attempts >= p_max_attempts then 'failed' else 'pending' end,
+         available_at = now() + make_interval(secs => p_backoff_seconds * power(2, greatest(attempts - 1, 0))),
+         completed_at = case when attempts >= p_max_attempts then now() end,
+         locked_at = null,
+         error_message = p_error
+   where id = any(p_ids);
+
+  update public.muse_items m
+     set ai_status = 'failed'
+    from public.ai_processing_jobs j
+   where j.id = any(p_ids) and j.status = 'failed' and m.id = j.item_id;
+end;
+$$;
+
+revoke execute on function public.claim_ai_jobs(text, integer, integer) from public, anon, authenticated;
+revoke execute on function public.renew_ai_jobs(uuid[]) from public, anon, authenticated;
+revoke execute on function public.fail_ai_jobs(uuid[], text, integer, integer) from public, anon, authenticated;
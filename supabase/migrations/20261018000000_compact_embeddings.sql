@@ -0,0 +1,66 @@
+-- supabase/migrations/20261018000000_compact_embeddings.sql
+
+-- Compact embeddings for search.
+--
+-- Each muse_item gets embedding_compact, a binary code of its embedding: one
+-- sign bit for each of the first 512 components. text-embedding-3 vectors
+-- keep most of their meaning in a prefix (this is what the API's
+-- `dimensions` parameter returns), so the code is a reasonable first pass.
+-- At 64 bytes it is stored inline in the row, while the 6 KB embedding is
+-- stored out of line in TOAST.
+--
+-- match_muse_items_compact ranks a user's items by the Hamming distance of
+-- their codes to the query's, then rescores only the top p_rescore_count at
+-- full precision. The full embedding is read only for those candidates,
+-- not for every row of the user. Results have the same columns and
+-- similarity as match_muse_items, which stays unchanged as the exact path.
+-- The service calls it when COMPACT_EMBEDDINGS=true.
+--
+-- The column is generated from embedding, so every writer keeps it current
+-- without any change: the backfill and the ingestion worker. This needs
+-- pgvector 0.7 or later for binary_quantize and subvector. Adding a stored
+-- generated column rewrites muse_items once.
+
+alter table public.muse_items
+  add column if not exists embedding_compact bit(512)
+  generated always as (binary_quantize(subvector(embedding, 1, 512))::bit(512)) stored;
+
+create or replace function public.match_muse_items_compact(
+  query_embedding vector(1536),
+  match_threshold float,
+  match_count integer,
+  p_user_id uuid,
+  p_rescore_count integer default 40
+)
+returns table (
+  id uuid,
+  user_id uuid,
+  content text,
+  content_type text,
+  description text,
+  source_url text,
+  ai_categories text[],
+  created_at timestamptz,
+  similarity float
+)
+language sql
+stable
+set search_path = public
+as $$
+  with candidates as (
+    select m.id
+      from public.muse_items m
+     where m.user_id = p_user_id
+       and m.deleted_at is null
+       and m.embedding_compact is not null
+     order by m.embedding_compact <~> binary_quantize(subvector(query_embedding, 1, 512))::bit(512)
+     limit greatest(p_rescore_count, match_count)
+  )
+  select m.id, m.user_id, m.content, m.content_type, m.description, m.source_url, m.ai_categories,
+         m.created_at, 1 - (m.embedding <=> query_embedding) as similarity
+    from candidates c
+    join public.muse_items m on m.id = c.id
+   where 1 - (m.embedding <=> query_embedding) >= match_threshold
+   order by m.embedding <=> query_embedding
+   limit match_count;
+$$;